@@ -0,0 +1,165 @@
+from exploitability import Strategy
+from subgame import SubgameSolver
+from utils.public_tree import NodeKind, PublicGame
+from utils.subgame_cache import SubgameCache
+from utils.time_bank import TimeBank, spot_difficulty
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import threading
+import time
+
+
+class PluribusAgent:
+    """
+    Decision maker of the tournament bot. Every decision starts from the
+    blueprint; the time bank decides whether the spot is worth a real-time
+    search and for how long, so cheap spots resolve from lookup and every
+    search ends within the decision's budget.
+    While the opponent acts, which the bank does not charge us for, the agent
+    can ponder: search the spots it will most likely face next in a
+    background thread, so that the next policy() finds them in the cache.
+    - game: the abstract game the blueprint was trained on
+    - blueprint: strategy of both players, as (node, board) -> hands x actions
+    - solver: real-time search, or None to play the blueprint only
+    - bank: the match's time bank
+    - pondering: the background search thread, while one runs
+    """
+
+    def __init__(
+        self,
+        game: PublicGame,
+        blueprint: Strategy,
+        solver: Optional[SubgameSolver] = None,
+        bank: Optional[TimeBank] = None,
+        seed: Optional[int] = None,
+        ponder_actions: int = 2,
+        ponder_seconds: float = 1.0,
+    ):
+        """
+        :param ponder_actions: Most likely opponent actions pondered after.
+        :param ponder_seconds: Search time of each pondered spot.
+        """
+        self.game = game
+        self.blueprint = blueprint
+        self.solver = solver
+        self.bank = bank if bank is not None else TimeBank()
+        self.rng = np.random.default_rng(seed)
+        self.ponder_actions = ponder_actions
+        self.ponder_seconds = ponder_seconds
+        self.ponder_solver: Optional[SubgameSolver] = None
+        self.pondering: Optional[threading.Thread] = None
+
+    def start_hand(self, hand_number: int):
+        self.bank.start_hand(hand_number)
+
+    def policy(
+        self,
+        history: Sequence[str],
+        board: tuple,
+        hand: tuple,
+        pot: Optional[int] = None,
+        stack: Optional[int] = None,
+    ) -> Dict[str, float]:
+        """
+        Distribution over the actions of the public state for hand, from
+        search when the time bank grants a budget and from the blueprint
+        otherwise. The time taken is charged to the bank.
+        :param pot / stack: Actual amounts of the spot, when they differ from
+            the abstract betting's.
+        """
+        start = time.perf_counter()
+        self.stop_pondering()
+        distribution, budget = self.plan(history, board, hand, pot)
+        if budget > 0 and self.solver is not None:
+            distribution = self.solver.action_distribution(
+                history, board, hand, start + budget, pot, stack
+            )
+        self.bank.charge(time.perf_counter() - start)
+        return distribution
+
+    def plan(
+        self,
+        history: Sequence[str],
+        board: tuple,
+        hand: tuple,
+        pot: Optional[int] = None,
+    ) -> Tuple[Dict[str, float], float]:
+        """
+        :return: The blueprint's distribution for hand at the public state, and
+            the seconds of search the time bank grants it (0 for lookup).
+        """
+        node = self.game.locate(history)
+        probs = self.blueprint(node, board)[self.game.hand_index[tuple(sorted(hand))]]
+        if pot is None:
+            pot = sum(node.bets)
+        budget = self.bank.budget(node.street, pot, spot_difficulty(probs))
+        return dict(zip(node.actions, np.asarray(probs).tolist())), budget
+
+    def act(
+        self,
+        history: Sequence[str],
+        board: tuple,
+        hand: tuple,
+        pot: Optional[int] = None,
+        stack: Optional[int] = None,
+    ) -> str:
+        """
+        Sample an action label from policy().
+        """
+        distribution = self.policy(history, board, hand, pot, stack)
+        actions = list(distribution)
+        probs = np.array([distribution[a] for a in actions])
+        return actions[int(self.rng.choice(len(actions), p=probs / probs.sum()))]
+
+    def likely_spots(self, history: Sequence[str], board: tuple) -> List[tuple]:
+        """
+        Histories of our decisions right after the opponent's most likely
+        actions at history, most likely first. An action's likelihood is its
+        blueprint probability summed over the opponent's blueprint range.
+        Spots behind board cards not dealt yet are left out.
+        """
+        node = self.game.locate(history)
+        ranges = self.solver.blueprint_ranges(node, board)
+        mass = ranges[node.player] @ self.blueprint(node, board)
+        spots = []
+        for a in np.argsort(-mass, kind="stable")[: self.ponder_actions]:
+            child = node.children[a]
+            if child.kind == NodeKind.DECISION:
+                spots.append(child.history)
+        return spots
+
+    def ponder(self, history: Sequence[str], board: tuple):
+        """
+        Start pondering while the opponent is to act at history. Results go to
+        the solver's cache, which is created if missing.
+        """
+        if self.solver is None:
+            return
+        self.stop_pondering()
+        if self.solver.cache is None:
+            self.solver.cache = SubgameCache()
+        if self.ponder_solver is None:
+            self.ponder_solver = self.solver.spawn()
+        spots = self.likely_spots(history, board)
+        self.ponder_solver.cancelled = False
+        self.pondering = threading.Thread(
+            target=self._ponder, args=(spots, tuple(board)), daemon=True
+        )
+        self.pondering.start()
+
+    def _ponder(self, spots: List[tuple], board: tuple):
+        for history in spots:
+            if self.ponder_solver.cancelled:
+                return
+            deadline = time.perf_counter() + self.ponder_seconds
+            self.ponder_solver.solve(history, board, deadline)
+
+    def stop_pondering(self):
+        """
+        Cancel pondering, which stops within one traversal. The spot being
+        searched is not cached.
+        """
+        if self.pondering is not None:
+            self.ponder_solver.cancelled = True
+            self.pondering.join()
+            self.pondering = None
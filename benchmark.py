@@ -0,0 +1,125 @@
+"""
+Exploitability versus wall time of each CFR variant on Kuhn poker and Leduc
+hold'em, so solver changes can be measured in seconds instead of hours:
+
+    python benchmark.py --game leduc --seconds 30
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+import dcfr
+import pluribus
+from deep_cfr import DeepCFR
+from exploitability import Strategy, exploitability_mbb
+from utils.baseline import RunningBaseline
+from utils.public_tree import PublicGame
+from utils.toy_games import (
+    KuhnGame,
+    LeducGame,
+    ToyState,
+    state_strategy,
+    tabular_strategy,
+)
+from vector_cfr import VectorCFR
+
+GAMES = {"kuhn": KuhnGame, "leduc": LeducGame}
+
+
+class ToyDCFR(dcfr.PluribusDCFR):
+    """
+    dcfr.PluribusDCFR dealing toy-game hands instead of hold'em ones.
+    """
+
+    def __init__(self, game: PublicGame, **kwargs):
+        super().__init__(**kwargs)
+        self.game = game
+        self.players = [0, 1]
+
+    def initialize_game(self):
+        self.root = ToyState.root(self.game)
+
+
+def dcfr_solver(game: PublicGame, seed: int) -> Callable[[int], Strategy]:
+    solver = ToyDCFR(game)
+    return lambda T: tabular_strategy(game, solver.compute_blueprint_strategy(T))
+
+
+def pluribus_solver(game: PublicGame, seed: int) -> Callable[[int], Strategy]:
+    solver = pluribus.PluribusDCFR(players=[0, 1])
+    solver.root = ToyState.root(game)
+    return lambda T: tabular_strategy(game, solver.compute_blueprint_strategy(T))
+
+
+def vr_solver(game: PublicGame, seed: int) -> Callable[[int], Strategy]:
+    solver = pluribus.PluribusDCFR(players=[0, 1], baseline=RunningBaseline())
+    solver.root = ToyState.root(game)
+    return lambda T: tabular_strategy(game, solver.compute_blueprint_strategy(T))
+
+
+def deep_solver(game: PublicGame, seed: int) -> Callable[[int], Strategy]:
+    num_actions = max(len(node.actions) for node in game.nodes)
+    solver = DeepCFR([0, 1], tempfile.mkdtemp(), num_actions, seed=seed)
+    solver.root = ToyState.root(game)
+    return lambda T: state_strategy(game, solver.compute_blueprint_strategy(T))
+
+
+def vector_solver(game: PublicGame, seed: int) -> Callable[[int], Strategy]:
+    return VectorCFR(game, seed=seed).compute_blueprint_strategy
+
+
+# Each variant builds a solver and returns a function that trains it up to T
+# iterations and returns its average strategy
+VARIANTS: Dict[str, Callable[[PublicGame, int], Callable[[int], Strategy]]] = {
+    "dcfr": dcfr_solver,
+    "pluribus": pluribus_solver,
+    "vr": vr_solver,
+    "vector": vector_solver,
+    "deep": deep_solver,
+}
+
+
+def benchmark(
+    game: PublicGame, variant: str, seconds: float, seed: int = 0
+) -> List[Tuple[int, float, float]]:
+    """
+    Train one variant for about the given training time, measuring the exact
+    exploitability after 1, 2, 4, ... iterations. Evaluation is not timed.
+    :return: (iterations, training seconds, mbb/hand) after each doubling.
+    """
+    random.seed(seed)
+    train = VARIANTS[variant](game, seed)
+    rows = []
+    elapsed = 0.0
+    T = 1
+    while elapsed < seconds:
+        start = time.perf_counter()
+        strategy = train(T)
+        elapsed += time.perf_counter() - start
+        rows.append((T, elapsed, exploitability_mbb(game, strategy)))
+        T *= 2
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--game", choices=sorted(GAMES), default="kuhn")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--variants", nargs="+", choices=sorted(VARIANTS), default=list(VARIANTS)
+    )
+    args = parser.parse_args()
+
+    game = GAMES[args.game]()
+    print(f"{'variant':<10} {'iterations':>10} {'seconds':>9} {'mbb/hand':>10}")
+    for variant in args.variants:
+        for T, elapsed, mbb in benchmark(game, variant, args.seconds, args.seed):
+            print(f"{variant:<10} {T:>10} {elapsed:>9.3f} {mbb:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Entry point of the tournament bot. aipoker's run.py starts every agent with
+multiprocessing.Process(target=bot_class.run), so each match begins with a
+cold start: this module imports only the standard library, run() defers the
+heavy imports and times every phase of the start-up, and tables are mapped
+from artifacts built ahead of time instead of being computed:
+
+    python bot.py artifacts --iterations 2000
+"""
+
+import argparse
+import logging
+import os
+from functools import partial
+from typing import Optional
+
+from utils.startup import Startup
+
+ARTIFACTS = os.environ.get(
+    "PLURIBUS_ARTIFACTS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts"),
+)
+
+
+def make_game(ranks=None):
+    """
+    The abstract game of the blueprint; building and loading must agree on it.
+    :param ranks: The short-deck rank table, for direct-lookup showdowns.
+    """
+    from utils.short_deck import ShortDeckGame
+    from utils.short_deck_tables import ShortDeckEvaluator
+
+    evaluator = ShortDeckEvaluator(ranks) if ranks is not None else None
+    return ShortDeckGame(evaluator=evaluator)
+
+
+def build_agent(directory: str, shared_directory: Optional[str] = None):
+    """
+    The bot's agent, from the artifacts in directory. It is the factory of
+    the server's workers, so it must stay a picklable module-level function.
+    Its tables are attached from segments in shared_directory (by default
+    the host's shared memory), so every bot and worker of the host maps one
+    copy of each.
+    """
+    from agent import PluribusAgent
+    from subgame import SubgameSolver
+    from utils.artifacts import ArtifactStore
+    from utils.shared_tables import SHARED_DIRECTORY
+    from utils.short_deck_tables import RANK_TABLE
+
+    store = ArtifactStore(directory, shared_directory or SHARED_DIRECTORY)
+    game = make_game(store.tables([RANK_TABLE], "short_deck")[RANK_TABLE])
+    blueprint = store.blueprint(game)
+    return PluribusAgent(game, blueprint, SubgameSolver(game, blueprint))
+
+
+def build_discards(directory: str, game):
+    """
+    The discard solver of the bot's game. Preflop it reads the flop equity
+    tables, shared like build_agent's; without them it only discards on the
+    flop.
+    """
+    from utils.artifacts import ArtifactStore
+    from utils.discard import DiscardSolver
+    from utils.shared_tables import SHARED_DIRECTORY
+    from utils.short_deck_tables import FLOP_EQUITY, FLOPS, ShortDeckTables
+
+    store = ArtifactStore(directory, SHARED_DIRECTORY)
+    tables = None
+    if store.exists(FLOPS) and store.exists(FLOP_EQUITY):
+        arrays = store.tables([FLOPS, FLOP_EQUITY], "short_deck_equity")
+        tables = ShortDeckTables(game, game.evaluator, arrays)
+    return DiscardSolver(game.evaluator, tables)
+
+
+def build_artifacts(
+    directory: str, iterations: int, seed: int = 0, equity: bool = True
+) -> str:
+    """
+    Build the evaluator's rank table, the equity and bucket tables, and the
+    blueprint trained with vector CFR in directory, once, ahead of any match.
+    Tables already built are kept.
+    :param equity: Build the equity and bucket tables, which take a minute.
+    :return: The blueprint's path.
+    """
+    from utils.artifacts import BLUEPRINT, ArtifactStore
+    from utils.blueprint import write_vector_blueprint
+    from utils.short_deck_tables import (
+        RANK_TABLE,
+        TABLES,
+        build_rank_table,
+        build_tables,
+    )
+    from vector_cfr import VectorCFR
+
+    store = ArtifactStore(directory)
+    store.build_array(RANK_TABLE, build_rank_table)
+    game = make_game(store.array(RANK_TABLE))
+    if equity and not all(store.exists(name) for name in TABLES):
+        tables = build_tables(game, game.evaluator)
+        for name, table in tables.items():
+            store.build_array(name, lambda table=table: table)
+    solver = VectorCFR(game, seed=seed)
+    solver.compute_blueprint_strategy(iterations)
+    return write_vector_blueprint(store.path(BLUEPRINT), solver)
+
+
+class PluribusBot:
+    """
+    Bot class for aipoker's agent_config.json: run() starts an AgentServer on
+    the artifacts and serves the harness's routes.
+    """
+
+    def __name__(self):
+        return "PluribusBot"
+
+    @classmethod
+    def run(
+        cls,
+        stream: bool = False,
+        port: int = 8000,
+        host: str = "0.0.0.0",
+        player_id: Optional[str] = None,
+        artifacts: str = ARTIFACTS,
+        workers: Optional[int] = None,
+    ):
+        startup = Startup()
+        if player_id is not None:
+            os.environ["PLAYER_ID"] = player_id
+        if stream:
+            logging.basicConfig(level=logging.INFO)
+        with startup.phase("imports"):
+            from server import AgentServer
+            from utils.artifacts import ArtifactStore
+            from utils.env_bridge import EnvBridge
+        with startup.phase("agent"):
+            cache = ArtifactStore(artifacts).subgame_cache()
+            server = AgentServer(partial(build_agent, artifacts), workers, cache)
+            game = server.agent.game
+            server.bridge = EnvBridge(game, build_discards(artifacts, game))
+        with startup.phase("workers"):
+            server.warm()
+        startup.report()
+        server.serve(host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the bot's artifacts.")
+    parser.add_argument("directory", nargs="?", default=ARTIFACTS)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-equity", action="store_true", help="skip the equity and bucket tables"
+    )
+    args = parser.parse_args()
+    print(
+        build_artifacts(args.directory, args.iterations, args.seed, not args.no_equity)
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -22,10 +22,44 @@ infoset: Set[tuple[tuple[Card, Card], History]] = set()
 actions_i: Dict[tuple[tuple[Card, Card], History], info_element] = {}
 
 
+class TraversalFrame:
+    """
+    A decision node of the traversing player whose children are being explored.
+    - node: the game node
+    - infoset: the traverser's infoset at the node
+    - actions: the actions of the infoset, in exploration order
+    - cursor: index of the action currently being explored (-1 before the first)
+    - reach_p / reach_opp: reach probabilities at the node
+    - value: accumulated expected value of the explored actions
+    - action_values: value of each explored action
+    """
+
+    __slots__ = (
+        "node",
+        "infoset",
+        "actions",
+        "cursor",
+        "reach_p",
+        "reach_opp",
+        "value",
+        "action_values",
+    )
+
+    def __init__(self, node, infoset, actions, reach_p, reach_opp):
+        self.node = node
+        self.infoset = infoset
+        self.actions = actions
+        self.cursor = -1
+        self.reach_p = reach_p
+        self.reach_opp = reach_opp
+        self.value = 0.0
+        self.action_values = {}
+
+
 class PluribusDCFR:
-    def __init__(self, infosets, alpha=1.5, beta=0, gamma=2):
+    def __init__(self, infosets=None, alpha=1.5, beta=0, gamma=2):
         """
-        :param infosets: A list of infoset objects or IDs in the game.
+        :param infosets: Infosets to allocate up front; others are allocated on first visit.
         :param alpha: Exponent for discounting positive regrets.
         :param beta:  Exponent for discounting negative regrets.
         :param gamma: Exponent for discounting average-strategy contributions.
@@ -38,17 +72,32 @@ class PluribusDCFR:
         self.regrets = {}
         self.average_strategy = {}
         self.strategy = {}
+        # Infosets whose regrets changed since their strategy was last computed
+        self.dirty_infosets: Set = set()
 
         self.small_blind: int = 5
         self.big_blind: int = 10
 
         self.root: GameNode = None
         self.players: List[Player] = []
-        for I in infosets:
-            self.regrets[I] = {a: 0.0 for a in actions_i[I]}
-            self.average_strategy[I] = {a: 0.0 for a in actions_i[I]}
-            # Initialize current strategy to uniform
-            self.strategy[I] = {a: 1.0 / len(actions_i[I]) for a in actions_i[I]}
+        # Number of finished iterations; further calls continue from here
+        self.iteration: int = 0
+        for I in infosets or []:
+            self.allocate_infoset(I, actions_i[I])
+
+    def allocate_infoset(self, I, actions):
+        self.regrets[I] = {a: 0.0 for a in actions}
+        self.average_strategy[I] = {a: 0.0 for a in actions}
+        # Initialize current strategy to uniform
+        self.strategy[I] = {a: 1.0 / len(actions) for a in actions}
+
+    def visit_infoset(self, h: GameNode, I):
+        """
+        Allocate infoset I on its first visit, with actions from actions_i or the node.
+        """
+        if I not in self.regrets:
+            actions = actions_i[I] if I in actions_i else h.legal_actions()
+            self.allocate_infoset(I, actions)
 
     def initialize_game(self):
         # assert all players have enough stack to call
@@ -100,10 +149,11 @@ class PluribusDCFR:
     def compute_blueprint_strategy(self, T):
         """
         Run DCFR for T iterations, discounting at *every iteration* using alpha, beta, gamma.
+        Training continues from self.iteration, so calling again with a larger T
+        keeps the discounting schedule.
         :param T: Number of iterations.
-        :param players: List of players in the game (including self).
         """
-        for t in range(1, T + 1):
+        for t in range(self.iteration + 1, T + 1):
             # ---- Perform CFR updates (one iteration per player) ----
 
             for p in self.players:
@@ -111,21 +161,8 @@ class PluribusDCFR:
                 self.dcfr_traversal(self.root, p, 1.0, 1.0)
 
             # ---- Apply DCFR discounting to regrets and average strategy ----
-            #   Based on the formulas from the slide:
-            #     positive regrets *= t^alpha / (t^alpha + 1)
-            #     negative regrets *= t^beta / (t^beta + 1)
-            #     average-strategy contribution *= (t / (t + 1))^gamma
-            pos_factor = (t**self.alpha) / (t**self.alpha + 1.0)
-            neg_factor = (t**self.beta) / (t**self.beta + 1.0)
-            avg_factor = (t / (t + 1.0)) ** self.gamma
-
-            for I in self.regrets:
-                for a in self.regrets[I]:
-                    if self.regrets[I][a] > 0:
-                        self.regrets[I][a] *= pos_factor
-                    else:
-                        self.regrets[I][a] *= neg_factor
-                    self.average_strategy[I][a] *= avg_factor
+            self.discount(t)
+            self.iteration = t
 
         # ---- Build the final blueprint strategy by normalizing the average strategy ----
         final_strategy = {}
@@ -144,25 +181,108 @@ class PluribusDCFR:
                 }
         return final_strategy
 
+    def discount(self, t):
+        """
+        Apply DCFR discounting to regrets and average strategy after iteration t.
+        Based on the formulas from the slide:
+            positive regrets *= t^alpha / (t^alpha + 1)
+            negative regrets *= t^beta / (t^beta + 1)
+            average-strategy contribution *= (t / (t + 1))^gamma
+        """
+        pos_factor = (t**self.alpha) / (t**self.alpha + 1.0)
+        neg_factor = (t**self.beta) / (t**self.beta + 1.0)
+        avg_factor = (t / (t + 1.0)) ** self.gamma
+        # Scaling every positive regret of an infoset by the same factor leaves
+        # regret matching unchanged, so discounting keeps cached strategies
+        # valid, unless a tiny positive regret underflows to zero
+        for I in self.regrets:
+            for a in self.regrets[I]:
+                if self.regrets[I][a] > 0:
+                    self.regrets[I][a] *= pos_factor
+                    if self.regrets[I][a] <= 0:
+                        self.dirty_infosets.add(I)
+                else:
+                    self.regrets[I][a] *= neg_factor
+                self.average_strategy[I][a] *= avg_factor
+
     def dcfr_traversal(self, h: GameNode, p: Player, reach_p, reach_opp):
         """
-        Recursively traverse the game tree to update regrets and average strategy.
+        Traverse the game tree to update regrets and average strategy.
+        The traversal keeps an explicit stack of frames for player p's decision
+        nodes instead of recursing; chance and opponent nodes need no frame.
         :param h: Current node (history state).
         :param p: The player for whom we are computing the iteration.
         :param reach_p: Probability contribution of player p reaching this node.
         :param reach_opp: Probability contribution of all other players reaching this node.
         :return: The expected payoff for player p at this node.
         """
-        if h.check_if_terminal():
-            # implement payoff p
-            return h.payoff(p)
+        stack: List[TraversalFrame] = []
+        value = 0.0
+        while True:
+            if h.check_if_terminal():
+                # implement payoff p
+                value = h.payoff(p)
+            elif h.is_chance_node():
+                h = h.next_state(h.sample_action())
+                continue
+            elif h.current_player() == p:
+                # Player p's decision node: explore its actions from a frame
+                I = h.infoset(p)  # get the infoset for player p
+                self.visit_infoset(h, I)
+                self.regret_matching(I)
+                stack.append(
+                    TraversalFrame(h, I, list(self.strategy[I]), reach_p, reach_opp)
+                )
+            else:
+                # Opponent node: sample an action from the strategy
+                opp_infoset = h.infoset(h.current_player())
+                self.visit_infoset(h, opp_infoset)
+                self.regret_matching(opp_infoset)
+                actions = list(self.strategy[opp_infoset].keys())
+                probs = [self.strategy[opp_infoset][a] for a in actions]
+                chosen_a = random.choices(actions, weights=probs, k=1)[0]
+                h = h.next_state(chosen_a)
+                reach_opp *= self.strategy[opp_infoset][chosen_a]
+                continue
 
-        if h.is_chance_node():
-            a = h.sample_action()
-            return self.dcfr_traversal(h.next_state(a), p, reach_p, reach_opp)
+            # Pass the value up until a frame still has an action to explore
+            while stack:
+                frame = stack[-1]
+                strategy = self.strategy[frame.infoset]
+                if frame.cursor >= 0:
+                    a = frame.actions[frame.cursor]
+                    frame.action_values[a] = value
+                    frame.value += strategy[a] * value
+                frame.cursor += 1
+                if frame.cursor < len(frame.actions):
+                    a = frame.actions[frame.cursor]
+                    h = frame.node.next_state(a)
+                    reach_p = frame.reach_p * strategy[a]
+                    reach_opp = frame.reach_opp
+                    break
+                stack.pop()
+                # Update regrets & average strategy
+                I = frame.infoset
+                # Opponent and chance actions were sampled on policy, so the
+                # sampled regret needs no reach_opp weight
+                for a in self.regrets[I]:
+                    regret = frame.action_values[a] - frame.value
+                    self.regrets[I][a] += regret
+                    self.average_strategy[I][a] += frame.reach_p * strategy[a]
+                self.dirty_infosets.add(I)
+                value = frame.value
+            else:
+                return value
 
-        I = h.infoset(p)  # get the infoset for player p
-        # Regret matching to compute the current strategy
+    def regret_matching(self, I):
+        """
+        Compute the current strategy of infoset I from its regrets.
+        The strategy is cached in self.strategy and only recomputed when the
+        regrets of I have been updated since the last call.
+        """
+        if I not in self.dirty_infosets:
+            return
+        self.dirty_infosets.discard(I)
         sum_positive_regrets = sum(max(self.regrets[I][a], 0) for a in self.regrets[I])
         if sum_positive_regrets > 0:
             for a in self.regrets[I]:
@@ -171,50 +291,3 @@ class PluribusDCFR:
             # If all regrets ≤ 0, use uniform strategy
             for a in self.regrets[I]:
                 self.strategy[I][a] = 1.0 / len(self.regrets[I])
-
-        current_player = h.current_player()
-        if current_player == p:
-            # Player p's decision node
-            value = 0.0
-            action_values = {}
-            for a in self.strategy[I]:
-                # Recurse
-                action_values[a] = self.dcfr_traversal(
-                    h.next_state(a), p, reach_p * self.strategy[I][a], reach_opp
-                )
-                value += self.strategy[I][a] * action_values[a]
-
-            # Update regrets & average strategy
-            for a in self.regrets[I]:
-                regret = action_values[a] - value
-                self.regrets[I][a] += reach_opp * regret
-                self.average_strategy[I][a] += reach_p * self.strategy[I][a]
-            return value
-
-        else:
-            # Opponent node: sample an action from the strategy
-            opp_infoset = h.infoset(current_player)
-            sum_positive_opp = sum(
-                max(self.regrets[opp_infoset][a], 0) for a in self.regrets[opp_infoset]
-            )
-            if sum_positive_opp > 0:
-                for a in self.regrets[opp_infoset]:
-                    self.strategy[opp_infoset][a] = (
-                        max(self.regrets[opp_infoset][a], 0) / sum_positive_opp
-                    )
-            else:
-                for a in self.regrets[opp_infoset]:
-                    self.strategy[opp_infoset][a] = 1.0 / len(self.regrets[opp_infoset])
-
-            # Sample an action for the opponent
-            import random
-
-            actions = list(self.strategy[opp_infoset].keys())
-            probs = [self.strategy[opp_infoset][a] for a in actions]
-            chosen_a = random.choices(actions, weights=probs, k=1)[0]
-            return self.dcfr_traversal(
-                h.next_state(chosen_a),
-                p,
-                reach_p,
-                reach_opp * self.strategy[opp_infoset][chosen_a],
-            )
@@ -0,0 +1,323 @@
+from pluribus import TraversalFrame
+from utils.reservoir import ReservoirBuffer
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import os
+import random
+
+
+class MLP:
+    """
+    Small fully connected ReLU network in NumPy, trained with Adam on a
+    weighted squared error over the unmasked outputs. Sized to train on CPU.
+    - weights / biases: parameters of each layer
+    """
+
+    def __init__(
+        self,
+        sizes: Sequence[int],
+        learning_rate: float = 1e-3,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param sizes: Input size, hidden sizes, output size.
+        """
+        rng = np.random.default_rng(seed)
+        self.weights: List[np.ndarray] = [
+            (rng.standard_normal((m, n)) * np.sqrt(2.0 / m)).astype(np.float32)
+            for m, n in zip(sizes[:-1], sizes[1:])
+        ]
+        self.biases: List[np.ndarray] = [
+            np.zeros(n, dtype=np.float32) for n in sizes[1:]
+        ]
+        self.learning_rate = learning_rate
+        self.steps = 0
+        self._first = [np.zeros_like(p) for p in self.parameters]
+        self._second = [np.zeros_like(p) for p in self.parameters]
+
+    @property
+    def parameters(self) -> List[np.ndarray]:
+        return self.weights + self.biases
+
+    def forward(self, x: np.ndarray) -> np.ndarray:
+        last = len(self.weights) - 1
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            x = x @ w + b
+            if i < last:
+                x = np.maximum(x, 0.0)
+        return x
+
+    def train_step(
+        self, x: np.ndarray, y: np.ndarray, mask: np.ndarray, weights: np.ndarray
+    ) -> float:
+        """
+        One Adam step on a batch.
+        :param weights: Per-example loss weights, normalized to mean 1.
+        :return: The batch loss before the step.
+        """
+        activations = [x]
+        last = len(self.weights) - 1
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            x = x @ w + b
+            if i < last:
+                x = np.maximum(x, 0.0)
+            activations.append(x)
+        scale = (weights / weights.mean())[:, None]
+        error = (x - y) * mask
+        loss = float((scale * error**2).sum() / len(x))
+
+        grad = 2.0 * scale * error / len(x)
+        weight_grads, bias_grads = [], []
+        for i in range(last, -1, -1):
+            weight_grads.append(activations[i].T @ grad)
+            bias_grads.append(grad.sum(axis=0))
+            if i > 0:
+                grad = (grad @ self.weights[i].T) * (activations[i] > 0)
+        grads = weight_grads[::-1] + bias_grads[::-1]
+
+        self.steps += 1
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        correction = np.sqrt(1 - beta2**self.steps) / (1 - beta1**self.steps)
+        for p, g, m, v in zip(self.parameters, grads, self._first, self._second):
+            m *= beta1
+            m += (1 - beta1) * g
+            v *= beta2
+            v += (1 - beta2) * g * g
+            p -= self.learning_rate * correction * m / (np.sqrt(v) + eps)
+        return loss
+
+    def nbytes(self) -> int:
+        return 3 * sum(p.nbytes for p in self.parameters)
+
+
+class DeepCFR:
+    """
+    Deep CFR (Brown et al. 2019): instead of regret tables over abstracted
+    infosets, each player has an advantage network that predicts regrets from
+    node features, so no card abstraction is needed. Every iteration runs
+    external-sampling traversals whose sampled regrets and the opponents'
+    strategies go into reservoir buffers; the advantage network of the
+    traverser is then retrained on its buffer, weighting iteration t by t
+    (linear CFR). The average strategy is a policy network fit to the
+    strategy buffer. Buffers are memory-mapped files of fixed capacity, so
+    memory does not grow with the number of infosets.
+    Nodes need the dcfr_traversal interface plus features(player) and
+    legal_actions(); action i of a node uses output i of the networks.
+    """
+
+    def __init__(
+        self,
+        players: list,
+        directory: str,
+        num_actions: int,
+        traversals: int = 100,
+        advantage_capacity: int = 1_000_000,
+        strategy_capacity: int = 1_000_000,
+        hidden: Sequence[int] = (64, 64),
+        train_steps: int = 200,
+        policy_train_steps: int = 1000,
+        batch_size: int = 256,
+        learning_rate: float = 1e-3,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param players: Players to traverse for, as compared with current_player().
+        :param directory: Directory of the memory-mapped reservoir buffers.
+        :param num_actions: Largest number of legal actions at a node.
+        :param traversals: Traversals per player per iteration.
+        :param advantage_capacity: Examples kept in each player's advantage buffer.
+        :param strategy_capacity: Examples kept in the strategy buffer.
+        :param hidden: Hidden layer sizes of the networks.
+        :param train_steps: Batches used to retrain an advantage network each iteration.
+        :param policy_train_steps: Batches used to fit the policy network.
+        """
+        self.players = players
+        self.directory = directory
+        self.num_actions = num_actions
+        self.traversals = traversals
+        self.advantage_capacity = advantage_capacity
+        self.strategy_capacity = strategy_capacity
+        self.hidden = tuple(hidden)
+        self.train_steps = train_steps
+        self.policy_train_steps = policy_train_steps
+        self.batch_size = batch_size
+        self.learning_rate = learning_rate
+        self.rng = np.random.default_rng(seed)
+
+        self.root = None
+        self.iteration: int = 0
+        # Created on the first sample, once the feature size is known
+        self.advantage_buffers: Dict = {}
+        self.strategy_buffer: Optional[ReservoirBuffer] = None
+        self.advantage_nets: Dict = {}
+        self.policy_net: Optional[MLP] = None
+
+    def _seed(self) -> int:
+        return int(self.rng.integers(1 << 31))
+
+    def _network(self, feature_size: int) -> MLP:
+        sizes = (feature_size,) + self.hidden + (self.num_actions,)
+        return MLP(sizes, self.learning_rate, self._seed())
+
+    def _padded(self, values) -> np.ndarray:
+        # Outputs beyond the node's actions are NaN, i.e. masked in the buffers
+        padded = np.full(self.num_actions, np.nan, dtype=np.float32)
+        padded[: len(values)] = values
+        return padded
+
+    def advantage_buffer(self, player, feature_size: int) -> ReservoirBuffer:
+        buffer = self.advantage_buffers.get(player)
+        if buffer is None:
+            buffer = ReservoirBuffer(
+                os.path.join(self.directory, f"advantage-{player}"),
+                self.advantage_capacity,
+                feature_size,
+                self.num_actions,
+                self._seed(),
+            )
+            self.advantage_buffers[player] = buffer
+        return buffer
+
+    def strategy_memory(self, feature_size: int) -> ReservoirBuffer:
+        if self.strategy_buffer is None:
+            self.strategy_buffer = ReservoirBuffer(
+                os.path.join(self.directory, "strategy"),
+                self.strategy_capacity,
+                feature_size,
+                self.num_actions,
+                self._seed(),
+            )
+        return self.strategy_buffer
+
+    def current_strategy(self, player, features: np.ndarray, n: int) -> np.ndarray:
+        """
+        Regret matching on the advantages predicted by player's network; when
+        none is positive, the action with the highest advantage is played.
+        """
+        net = self.advantage_nets.get(player)
+        if net is None:
+            return np.full(n, 1.0 / n)
+        advantages = net.forward(features[None, :])[0, :n].astype(np.float64)
+        positive = np.maximum(advantages, 0.0)
+        total = positive.sum()
+        if total > 0:
+            return positive / total
+        strategy = np.zeros(n)
+        strategy[int(np.argmax(advantages))] = 1.0
+        return strategy
+
+    def compute_blueprint_strategy(self, T: int):
+        """
+        Run Deep CFR up to iteration T, then fit the policy network.
+        :return: The average strategy, see strategy().
+        """
+        for t in range(self.iteration + 1, T + 1):
+            for p in self.players:
+                for _ in range(self.traversals):
+                    self.traverse(self.root, p, t)
+                self.train_advantage(p)
+            self.iteration = t
+        self.train_policy()
+        return self.strategy
+
+    def traverse(self, h, p, t: int) -> float:
+        """
+        External-sampling traversal for player p at iteration t: p's actions
+        are all explored, chance and opponent actions are sampled. Sampled
+        regrets of p's nodes and the opponents' current strategies are added
+        to the buffers. Frames are kept on an explicit stack as in dcfr_traversal.
+        :return: The sampled value of h for player p.
+        """
+        stack: List[TraversalFrame] = []
+        value = 0.0
+        while True:
+            if h.is_terminal():
+                value = h.payoff(p)
+            elif h.is_chance_node():
+                h = h.next_state(h.sample_action())
+                continue
+            elif h.current_player() == p:
+                actions = h.legal_actions()
+                features = h.features(p)
+                strategy = self.current_strategy(p, features, len(actions))
+                stack.append(TraversalFrame(h, features, actions, strategy, 1.0, 1.0))
+            else:
+                q = h.current_player()
+                actions = h.legal_actions()
+                features = h.features(q)
+                strategy = self.current_strategy(q, features, len(actions))
+                memory = self.strategy_memory(len(features))
+                memory.add(features, self._padded(strategy), t)
+                k = random.choices(range(len(actions)), weights=strategy, k=1)[0]
+                h = h.next_state(actions[k])
+                continue
+
+            # Pass the value up until a frame still has an action to explore
+            while stack:
+                frame = stack[-1]
+                if frame.cursor >= 0:
+                    frame.action_values[frame.cursor] = value
+                    frame.value += frame.strategy[frame.cursor] * value
+                frame.cursor += 1
+                if frame.cursor < len(frame.actions):
+                    h = frame.node.next_state(frame.actions[frame.cursor])
+                    break
+                stack.pop()
+                regrets = np.array(frame.action_values) - frame.value
+                buffer = self.advantage_buffer(p, len(frame.infoset))
+                buffer.add(frame.infoset, self._padded(regrets), t)
+                value = frame.value
+            else:
+                return value
+
+    def _fit(self, net: MLP, buffer: ReservoirBuffer, steps: int):
+        for _ in range(steps):
+            net.train_step(*buffer.sample(self.batch_size))
+
+    def train_advantage(self, player):
+        """
+        Retrain player's advantage network from scratch on its buffer.
+        """
+        buffer = self.advantage_buffers.get(player)
+        if buffer is None or len(buffer) == 0:
+            return
+        net = self._network(buffer.features.shape[1])
+        self._fit(net, buffer, self.train_steps)
+        self.advantage_nets[player] = net
+
+    def train_policy(self):
+        """
+        Fit the policy network to the strategy buffer: its average strategy.
+        """
+        buffer = self.strategy_buffer
+        if buffer is None or len(buffer) == 0:
+            return
+        self.policy_net = self._network(buffer.features.shape[1])
+        self._fit(self.policy_net, buffer, self.policy_train_steps)
+
+    def strategy(self, h) -> Dict:
+        """
+        Average strategy of the player to act at h, uniform before any training.
+        """
+        actions = h.legal_actions()
+        n = len(actions)
+        probs = np.full(n, 1.0 / n)
+        if self.policy_net is not None:
+            features = h.features(h.current_player())
+            predicted = self.policy_net.forward(features[None, :])[0, :n]
+            predicted = np.maximum(predicted.astype(np.float64), 0.0)
+            if predicted.sum() > 0:
+                probs = predicted / predicted.sum()
+        return dict(zip(actions, probs.tolist()))
+
+    def nbytes(self) -> int:
+        """
+        Bytes of the reservoir buffers (on disk, paged in on demand) and networks.
+        """
+        buffers = list(self.advantage_buffers.values())
+        if self.strategy_buffer is not None:
+            buffers.append(self.strategy_buffer)
+        nets = list(self.advantage_nets.values())
+        if self.policy_net is not None:
+            nets.append(self.policy_net)
+        return sum(b.nbytes() for b in buffers) + sum(n.nbytes() for n in nets)
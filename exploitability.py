@@ -0,0 +1,107 @@
+from utils.public_tree import NodeKind, PublicGame, PublicNode
+from typing import Callable, Dict, Optional
+import numpy as np
+
+# strategy(node, board) -> probabilities of shape (hands, actions) for the
+# player acting at node, as returned by VectorCFR.average_strategy
+Strategy = Callable[[PublicNode, tuple], np.ndarray]
+
+
+def best_response_values(
+    game: PublicGame,
+    strategy: Strategy,
+    p: int,
+    samples: Optional[int] = None,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """
+    Counterfactual value of each of player p's hands when p best-responds to
+    the other player's strategy. The opponent's range is propagated down the
+    public tree as one vector, so a best response costs one walk of the tree
+    per board instead of one per deal.
+    :param samples: Board outcomes to sample at each chance node, or None to
+        enumerate them all (exact, for small games). A sampled best response
+        sees the sampled runouts, so it overestimates and tightens as samples grow.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    # Outcomes drawn for each visible board, shared by every chance node on that
+    # board so that p's actions are compared on the same sampled runouts
+    draws: Dict[tuple, list] = {}
+
+    def outcomes_of(board: tuple, street: int) -> list:
+        outcomes = draws.get(board)
+        if outcomes is None:
+            outcomes = game.street_outcomes(board, street)
+            if samples is not None and samples < len(outcomes):
+                picks = rng.choice(len(outcomes), size=samples, replace=False)
+                outcomes = [outcomes[i] for i in picks]
+            draws[board] = outcomes
+        return outcomes
+
+    def values(node: PublicNode, opp_reach: np.ndarray, board: tuple) -> np.ndarray:
+        if node.is_terminal():
+            return game.terminal_values(node, p, opp_reach, board)
+        if node.kind == NodeKind.CHANCE:
+            child = node.children[0]
+            outcomes = outcomes_of(board, child.street)
+            total = np.zeros(game.num_hands)
+            for outcome in outcomes:
+                total += values(child, opp_reach, outcome)
+            return total / len(outcomes)
+        if node.player == p:
+            # Every hand of p picks its best action given the public state
+            best = values(node.children[0], opp_reach, board)
+            for child in node.children[1:]:
+                best = np.maximum(best, values(child, opp_reach, board))
+            return best
+        probs = strategy(node, board)
+        total = np.zeros(game.num_hands)
+        for a, child in enumerate(node.children):
+            total += values(child, opp_reach * probs[:, a], board)
+        return total
+
+    return values(game.root, np.ones(game.num_hands), ())
+
+
+def best_response_value(
+    game: PublicGame,
+    strategy: Strategy,
+    p: int,
+    samples: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> float:
+    """
+    :return: Player p's expected winnings per hand, in chips, when best-responding.
+    """
+    rng = np.random.default_rng(seed)
+    values = best_response_values(game, strategy, p, samples, rng)
+    return float(values.sum() / game.num_pairs)
+
+
+def exploitability(
+    game: PublicGame,
+    strategy: Strategy,
+    samples: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> float:
+    """
+    Average of the two best-response values, in chips per hand: how much a
+    best-responding opponent wins per hand, averaged over both seats. Zero
+    exactly at a Nash equilibrium of the game.
+    """
+    return (
+        best_response_value(game, strategy, 0, samples, seed)
+        + best_response_value(game, strategy, 1, samples, seed)
+    ) / 2
+
+
+def exploitability_mbb(
+    game: PublicGame,
+    strategy: Strategy,
+    samples: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> float:
+    """
+    Exploitability in milli-big-blinds per hand.
+    """
+    return 1000.0 * exploitability(game, strategy, samples, seed) / game.big_blind
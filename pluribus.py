@@ -10,7 +10,17 @@ from utils.poker_tree import (
     ActionType,
     HandEvaluator,
 )
-from typing import List, Dict
+from utils.regret_storage import RegretStorage
+from utils.out_of_core import OutOfCoreRegretStorage
+from utils.checkpoint import write_checkpoint, latest_checkpoint
+from utils.blueprint import write_blueprint
+from utils.telemetry import REGRET_MATCHING, ProfiledNode, Telemetry
+from utils.baseline import RunningBaseline, SampledFrame
+from contextlib import nullcontext
+from typing import Callable, Hashable, List, Dict, Optional
+import numpy as np
+import json
+import os
 import random
 
 
@@ -29,21 +39,62 @@ class Pluribus(Player):
         super().__init__(stack=stack)
         self.regrets = {}
         self.average_strategy = {}
-        self.strategy = {}
+        # Not self.strategy, which would shadow the strategy() method
+        self.current_strategy = {}
         for key, value in infoset.items():
             self.regrets[key] = {a: 0.0 for a in value.actions}
             self.average_strategy[key] = {a: 0.0 for a in value.actions}
             # Initialize current strategy to uniform
-            self.strategy[key] = {a: 1.0 / len(value.actions) for a in value.actions}
+            self.current_strategy[key] = {
+                a: 1.0 / len(value.actions) for a in value.actions
+            }
 
     def strategy(self, history: History):
-        return random.choice(
-            infoset[(self.cards, history)].actions,
-            weights=[
-                self.strategy[(self.cards, history)][a]
-                for a in infoset[(self.cards, history)].actions
-            ],
-        )
+        actions = infoset[(self.cards, history)].actions
+        probs = self.current_strategy[(self.cards, history)]
+        return random.choices(actions, weights=[probs[a] for a in actions], k=1)[0]
+
+
+class TraversalFrame:
+    """
+    A decision node of the traversing player whose children are being explored.
+    - node: the game node
+    - infoset: index of the traverser's infoset in the regret storage
+    - actions: the actions of the infoset, in exploration order
+    - strategy: the current strategy of the infoset, aligned with actions
+    - cursor: index of the action currently being explored (-1 before the first)
+    - reach_p / reach_opp: reach probabilities at the node
+    - value: accumulated expected value of the explored actions
+    - action_values: value of each action, None until it is explored
+    - prune: whether negative-regret actions may be skipped at this node
+    """
+
+    __slots__ = (
+        "node",
+        "infoset",
+        "actions",
+        "strategy",
+        "cursor",
+        "reach_p",
+        "reach_opp",
+        "value",
+        "action_values",
+        "prune",
+    )
+
+    def __init__(
+        self, node, infoset, actions, strategy, reach_p, reach_opp, prune=False
+    ):
+        self.node = node
+        self.infoset = infoset
+        self.actions = actions
+        self.strategy = strategy
+        self.cursor = -1
+        self.reach_p = reach_p
+        self.reach_opp = reach_opp
+        self.value = 0.0
+        self.action_values = [None] * len(actions)
+        self.prune = prune
 
 
 class PluribusDCFR:
@@ -55,9 +106,31 @@ class PluribusDCFR:
         alpha: float = 1.5,
         beta: float = 0,
         gamma: float = 2,
+        prune_after: Optional[int] = None,
+        prune_threshold: float = -300.0,
+        prune_explore: float = 0.05,
+        regret_dtype: str = "float64",
+        average_dtype: str = "float64",
+        regret_floor: Optional[float] = None,
+        storage_dir: Optional[str] = None,
+        cache_infosets: int = 1_000_000,
+        pin_infoset: Optional[Callable[[Hashable], bool]] = None,
+        telemetry: Optional[Telemetry] = None,
+        baseline: Optional[RunningBaseline] = None,
     ):
         """
         :param players: A list of Pluribus players.
+        :param prune_after: Iteration after which negative-regret pruning starts, or None to never prune.
+        :param prune_threshold: Actions whose regret is below this value are skipped by pruned traversals.
+        :param prune_explore: Probability that a traversal after the warm-up explores every action anyway.
+        :param regret_dtype: Storage type of regrets: float64, float32, float16 or int32.
+        :param average_dtype: Storage type of the average strategy: float64, float32, float16 or uint16.
+        :param regret_floor: Lower bound on regrets; int32 storage defaults to the Pluribus floor.
+        :param storage_dir: Directory for disk-backed tables, or None to keep every table in memory.
+        :param cache_infosets: Infosets kept in memory when the tables are disk-backed.
+        :param pin_infoset: Predicate on infoset keys that are never spilled to disk, e.g. early streets.
+        :param telemetry: Periodic JSON-lines report of speed, memory and hot-path timings, or None.
+        :param baseline: VR-MCCFR baseline values for sampled opponent nodes, or None.
         """
         self.players = players
         self.small_blind: int = small_blind
@@ -65,12 +138,42 @@ class PluribusDCFR:
         self.alpha: float = alpha
         self.beta: float = beta
         self.gamma: float = gamma
+        self.prune_after: Optional[int] = prune_after
+        self.prune_threshold: float = prune_threshold
+        self.prune_explore: float = prune_explore
         self.history: History = History([])
         self.dealer: Player = Player(dealer=True)
         self.history: History = History([])
         self.deck: List[Card] = []
         self.root: GameNode = GameNode(self.dealer, 0, 0, 0)
 
+        self.storage_dir: Optional[str] = storage_dir
+        self.cache_infosets: int = cache_infosets
+        self.pin_infoset = pin_infoset
+
+        # Regrets, average strategy and cached current strategy of every infoset.
+        # Rows are allocated when training first visits an infoset.
+        options = dict(
+            regret_dtype=regret_dtype,
+            average_dtype=average_dtype,
+            regret_floor=regret_floor,
+        )
+        if storage_dir is None:
+            self.storage = RegretStorage(**options)
+        else:
+            self.storage = OutOfCoreRegretStorage(
+                storage_dir, cache_infosets=cache_infosets, pin=pin_infoset, **options
+            )
+        # Number of finished iterations, carried over by checkpoints
+        self.iteration: int = 0
+        self.telemetry: Optional[Telemetry] = telemetry
+        self.baseline: Optional[RunningBaseline] = baseline
+        # Finished coarse run that new infosets inherit from, see warm_start
+        self.coarse_storage: Optional[RegretStorage] = None
+        self.coarse_parent: Optional[Callable[[Hashable], Optional[Hashable]]] = None
+        self.map_action: Optional[Callable] = None
+        self.warm_scale: float = 1.0
+
     def initialize_game(self):
         # assert all players have enough stack to call
         for player in self.players:
@@ -118,119 +221,327 @@ class PluribusDCFR:
         self.players[-2].make_actions(small_blind)
         self.players[-1].make_actions(big_blind)
 
-    def compute_blueprint_strategy(self, T):
+    def compute_blueprint_strategy(
+        self,
+        T,
+        checkpoint_dir: Optional[str] = None,
+        checkpoint_every: int = 100,
+    ):
         """
         Run DCFR for T iterations, discounting at *every iteration* using alpha, beta, gamma.
+        Training continues from self.iteration, so a run restored with
+        load_checkpoint picks up at the saved iteration.
         :param T: Number of iterations.
+        :param checkpoint_dir: Directory for periodic checkpoints, or None to disable them.
+        :param checkpoint_every: Iterations between checkpoints.
         """
-        for t in range(1, T + 1):
-            # ---- Perform CFR updates (one iteration per player) ----
-            for p in self.players:
-                self.dcfr_traversal(self.root, p, 1.0, 1.0)
-
-            # ---- Apply DCFR discounting to regrets and average strategy ----
-            #   Based on the formulas from the slide:
-            #     positive regrets *= t^alpha / (t^alpha + 1)
-            #     negative regrets *= t^beta / (t^beta + 1)
-            #     average-strategy contribution *= (t / (t + 1))^gamma
-            pos_factor = (t**self.alpha) / (t**self.alpha + 1.0)
-            neg_factor = (t**self.beta) / (t**self.beta + 1.0)
-            avg_factor = (t / (t + 1.0)) ** self.gamma
-
-            for I in self.regrets:
-                for a in self.regrets[I]:
-                    if self.regrets[I][a] > 0:
-                        self.regrets[I][a] *= pos_factor
-                    else:
-                        self.regrets[I][a] *= neg_factor
-                    self.average_strategy[I][a] *= avg_factor
+        # Telemetry wraps the root and the storage's regret matching in timers for
+        # this call only; without it the traversal runs on the bare objects
+        telemetry = self.telemetry
+        root = self.root
+        profiling = nullcontext()
+        if telemetry is not None:
+            telemetry.start(self.iteration)
+            root = ProfiledNode(self.root, telemetry)
+            profiling = telemetry.patch(
+                self.storage, "current_strategy", REGRET_MATCHING
+            )
+        with profiling:
+            for t in range(self.iteration + 1, T + 1):
+                # ---- Perform CFR updates (one iteration per player) ----
+                for p in self.players:
+                    # Pluribus-style pruning: after the warm-up, most traversals skip
+                    # actions with very negative regret; the rest explore everything.
+                    prune = (
+                        self.prune_after is not None
+                        and t > self.prune_after
+                        and random.random() >= self.prune_explore
+                    )
+                    self.dcfr_traversal(root, p, 1.0, 1.0, prune=prune)
+
+                # ---- Apply DCFR discounting to regrets and average strategy ----
+                #   Based on the formulas from the slide:
+                #     positive regrets *= t^alpha / (t^alpha + 1)
+                #     negative regrets *= t^beta / (t^beta + 1)
+                #     average-strategy contribution *= (t / (t + 1))^gamma
+                pos_factor = (t**self.alpha) / (t**self.alpha + 1.0)
+                neg_factor = (t**self.beta) / (t**self.beta + 1.0)
+                avg_factor = (t / (t + 1.0)) ** self.gamma
+                # Scaling every positive regret of an infoset by the same factor
+                # leaves regret matching unchanged, so discounting keeps cached
+                # strategies valid.
+                self.storage.discount(pos_factor, neg_factor, avg_factor)
+
+                self.iteration = t
+                if telemetry is not None:
+                    telemetry.iteration_done(t, self.storage)
+                if checkpoint_dir is not None and t % checkpoint_every == 0:
+                    self.save_checkpoint(checkpoint_dir)
 
         # ---- Build the final blueprint strategy by normalizing the average strategy ----
+        # (infosets without positive mass fall back to uniform)
         final_strategy = {}
-        for I in self.average_strategy:
-            total = sum(self.average_strategy[I][a] for a in self.average_strategy[I])
-            if total > 0:
-                final_strategy[I] = {
-                    a: self.average_strategy[I][a] / total
-                    for a in self.average_strategy[I]
-                }
-            else:
-                # If no positive mass, fall back to uniform
-                num_actions = len(self.average_strategy[I])
-                final_strategy[I] = {
-                    a: 1.0 / num_actions for a in self.average_strategy[I]
-                }
+        for i, I in enumerate(self.storage.keys):
+            probs = self.storage.average_strategy(i)
+            final_strategy[I] = dict(zip(self.storage.actions_of(i), probs.tolist()))
         return final_strategy
 
-    def dcfr_traversal(self, h, p, reach_p, reach_opp):
+    def export_blueprint(
+        self,
+        path: str,
+        min_reach: float = 0.0,
+        uniform_tolerance: Optional[float] = None,
+    ):
         """
-        Recursively traverse the game tree to update regrets and average strategy.
-        :param h: Current node (history state).
-        :param p: The player for whom we are computing the iteration.
-        :param reach_p: Probability contribution of player p reaching this node.
-        :param reach_opp: Probability contribution of all other players reaching this node.
-        :return: The expected payoff for player p at this node.
+        Write the average strategy to a compact blueprint file that the agent
+        memory-maps with utils.blueprint.BlueprintReader.
+        :param min_reach: Drop infosets reached less than this fraction of the most reached one.
+        :param uniform_tolerance: Drop infosets whose average strategy is this close to uniform.
         """
-        if h.is_terminal():
-            return h.payoff(p)
+        write_blueprint(
+            self.storage, path, min_reach=min_reach, uniform_tolerance=uniform_tolerance
+        )
 
-        if h.is_chance_node():
-            a = h.sample_action()
-            return self.dcfr_traversal(h.next_state(a), p, reach_p, reach_opp)
+    def warm_start(
+        self,
+        coarse,
+        parent: Callable[[Hashable], Optional[Hashable]],
+        map_action: Optional[Callable[[object, list], Optional[int]]] = None,
+        scale: float = 1.0,
+        iteration: Optional[int] = None,
+    ):
+        """
+        Start from a finished run on a coarser action or bucket abstraction.
+        When training first visits an infoset, its regrets and average strategy
+        are copied from its coarse parent action by action, so the fine run
+        starts from the coarse solution instead of uniform. Not checkpointed:
+        call it again after load_checkpoint to keep warm-starting new infosets.
+        :param coarse: RegretStorage of the coarse run, or a checkpoint directory
+            (or a directory of checkpoints, whose latest is used).
+        :param parent: Maps a fine infoset key to its coarse infoset key, or None.
+        :param map_action: Maps (fine action, coarse actions) to the index of the
+            coarse action it inherits from, or None; defaults to equal actions.
+        :param scale: Factor on the inherited regrets and averages; below 1 the
+            fine run moves away from the coarse solution sooner.
+        :param iteration: Iterations the coarse tables hold, read from the
+            checkpoint by default. Training continues the discounting schedule
+            from there (pass a larger T to compute_blueprint_strategy);
+            restarting it at 1 would discount the inherited tables away at once.
+        """
+        if isinstance(coarse, str):
+            path = latest_checkpoint(coarse) or coarse
+            coarse = RegretStorage.load(path)
+            if iteration is None:
+                with open(os.path.join(path, "trainer.json")) as f:
+                    iteration = json.load(f)["iteration"]
+        self.iteration = iteration or 0
+        self.coarse_storage = coarse
+        self.coarse_parent = parent
+        self.map_action = map_action
+        self.warm_scale = scale
 
-        I = h.infoset(p)  # get the infoset for player p
-        # Regret matching to compute the current strategy
-        sum_positive_regrets = sum(max(self.regrets[I][a], 0) for a in self.regrets[I])
-        if sum_positive_regrets > 0:
-            for a in self.regrets[I]:
-                self.strategy[I][a] = max(self.regrets[I][a], 0) / sum_positive_regrets
-        else:
-            # If all regrets ≤ 0, use uniform strategy
-            for a in self.regrets[I]:
-                self.strategy[I][a] = 1.0 / len(self.regrets[I])
-
-        current_player = h.current_player()
-        if current_player == p:
-            # Player p's decision node
-            value = 0.0
-            action_values = {}
-            for a in self.strategy[I]:
-                # Recurse
-                action_values[a] = self.dcfr_traversal(
-                    h.next_state(a), p, reach_p * self.strategy[I][a], reach_opp
+    def inherit_infoset(self, i: int, key, actions: list):
+        """
+        Copy the coarse parent's regrets and average strategy into new infoset i.
+        """
+        coarse = self.coarse_storage
+        parent_key = self.coarse_parent(key)
+        j = None if parent_key is None else coarse.lookup(parent_key)
+        if j is None:
+            return
+        coarse_actions = coarse.actions_of(j)
+        coarse_regrets = coarse.regret_row(j)
+        coarse_average = coarse.average_row(j)
+        regrets = np.zeros(len(actions))
+        average = np.zeros(len(actions))
+        for a, action in enumerate(actions):
+            if self.map_action is not None:
+                k = self.map_action(action, coarse_actions)
+            elif action in coarse_actions:
+                k = coarse_actions.index(action)
+            else:
+                k = None
+            if k is not None:
+                regrets[a] = coarse_regrets[k]
+                average[a] = coarse_average[k]
+        self.storage.add_regrets(i, self.warm_scale * regrets)
+        self.storage.add_average(i, self.warm_scale * average)
+
+    def save_checkpoint(self, checkpoint_dir: str) -> str:
+        """
+        Atomically write regrets, average strategy, infoset index, iteration count
+        and RNG state to a new checkpoint under checkpoint_dir.
+        :return: The path of the checkpoint.
+        """
+
+        def write(directory):
+            self.storage.save(directory)
+            with open(os.path.join(directory, "trainer.json"), "w") as f:
+                json.dump(
+                    {"iteration": self.iteration, "random_state": random.getstate()},
+                    f,
                 )
-                value += self.strategy[I][a] * action_values[a]
 
-            # Update regrets & average strategy
-            for a in self.regrets[I]:
-                regret = action_values[a] - value
-                self.regrets[I][a] += reach_opp * regret
-                self.average_strategy[I][a] += reach_p * self.strategy[I][a]
-            return value
+        path = write_checkpoint(checkpoint_dir, self.iteration, write)
+        self.storage.mark_saved(path)
+        return path
 
+    def load_checkpoint(self, checkpoint_dir: str) -> bool:
+        """
+        Resume from the latest checkpoint under checkpoint_dir. The tables are
+        memory-mapped rather than read back into Python objects; disk-backed
+        training copies them into storage_dir first.
+        :return: Whether a checkpoint was found.
+        """
+        path = latest_checkpoint(checkpoint_dir)
+        if path is None:
+            return False
+        if self.storage_dir is None:
+            self.storage = RegretStorage.load(path)
         else:
-            # Opponent node: sample an action from the strategy
-            opp_infoset = h.infoset(current_player)
-            sum_positive_opp = sum(
-                max(self.regrets[opp_infoset][a], 0) for a in self.regrets[opp_infoset]
+            self.storage = OutOfCoreRegretStorage.load(
+                path,
+                self.storage_dir,
+                cache_infosets=self.cache_infosets,
+                pin=self.pin_infoset,
             )
-            if sum_positive_opp > 0:
-                for a in self.regrets[opp_infoset]:
-                    self.strategy[opp_infoset][a] = (
-                        max(self.regrets[opp_infoset][a], 0) / sum_positive_opp
+        with open(os.path.join(path, "trainer.json")) as f:
+            state = json.load(f)
+        self.iteration = state["iteration"]
+        version, internal_state, gauss_next = state["random_state"]
+        random.setstate((version, tuple(internal_state), gauss_next))
+        return True
+
+    def dcfr_traversal(self, h, p, reach_p, reach_opp, prune: bool = False):
+        """
+        Traverse the game tree to update regrets and average strategy.
+        The traversal keeps an explicit stack of frames for player p's decision
+        nodes instead of recursing, so deep raise wars cannot hit the recursion
+        limit; chance and opponent nodes are sampled and need no frame, except
+        that opponent nodes get a SampledFrame when a baseline is in use.
+        :param h: Current node (history state).
+        :param p: The player for whom we are computing the iteration.
+        :param reach_p: Probability contribution of player p reaching this node.
+        :param reach_opp: Probability contribution of all other players reaching this node.
+        :param prune: Skip player p's actions whose regret is below prune_threshold.
+        :return: The expected payoff for player p at this node.
+        """
+        stack: List[TraversalFrame] = []
+        value = 0.0
+        while True:
+            if h.is_terminal():
+                value = h.payoff(p)
+            elif h.is_chance_node():
+                h = h.next_state(h.sample_action())
+                continue
+            elif h.current_player() == p:
+                # Player p's decision node: explore its actions from a frame
+                i = self.infoset_index(h, p)  # get the infoset for player p
+                strategy = self.storage.current_strategy(i).tolist()
+                # Never prune on the river, where every subtree is shallow
+                can_prune = prune and h.get_stage() != Stage.RIVER
+                stack.append(
+                    TraversalFrame(
+                        h,
+                        i,
+                        self.storage.actions_of(i),
+                        strategy,
+                        reach_p,
+                        reach_opp,
+                        can_prune,
                     )
+                )
             else:
-                for a in self.regrets[opp_infoset]:
-                    self.strategy[opp_infoset][a] = 1.0 / len(self.regrets[opp_infoset])
-
-            # Sample an action for the opponent
-
-            actions = list(self.strategy[opp_infoset].keys())
-            probs = [self.strategy[opp_infoset][a] for a in actions]
-            chosen_a = random.choices(actions, weights=probs, k=1)[0]
-            return self.dcfr_traversal(
-                h.next_state(chosen_a),
-                p,
-                reach_p,
-                reach_opp * self.strategy[opp_infoset][chosen_a],
-            )
+                # Opponent node: sample an action from the strategy
+                j = self.infoset_index(h, h.current_player())
+                probs = self.storage.current_strategy(j).tolist()
+                k = random.choices(range(len(probs)), weights=probs, k=1)[0]
+                actions = self.storage.actions_of(j)
+                if self.baseline is not None:
+                    stack.append(SampledFrame((p, h.infoset(p)), actions, probs, k))
+                h = h.next_state(actions[k])
+                reach_opp *= probs[k]
+                continue
+
+            # Pass the value up until a frame still has an action to explore
+            while stack:
+                frame = stack[-1]
+                if type(frame) is SampledFrame:
+                    stack.pop()
+                    value = frame.corrected_value(self.baseline, value)
+                    continue
+                if frame.cursor >= 0:
+                    frame.action_values[frame.cursor] = value
+                    frame.value += frame.strategy[frame.cursor] * value
+                h = self.next_child(frame)
+                if h is not None:
+                    reach_p = frame.reach_p * frame.strategy[frame.cursor]
+                    reach_opp = frame.reach_opp
+                    break
+                stack.pop()
+                value = self.update_infoset(frame)
+            else:
+                return value
+
+    def infoset_index(self, h, player) -> int:
+        """
+        Storage index of the player's infoset at h, allocating its row on the first visit.
+        Actions come from the global infoset table when it lists the infoset,
+        otherwise from the node. With warm_start, new rows inherit from the coarse run.
+        """
+        key = h.infoset(player)
+        i = self.storage.lookup(key)
+        if i is None:
+            entry = infoset.get(key)
+            actions = entry.actions if entry is not None else h.legal_actions()
+            i = self.storage.add_infoset(key, actions)
+            if self.coarse_storage is not None:
+                self.inherit_infoset(i, key, actions)
+        return i
+
+    def next_child(self, frame: "TraversalFrame"):
+        """
+        Move the frame's cursor to its next explored action.
+        :return: The child node reached by that action, or None when the frame is done.
+        """
+        regrets = self.storage.regret_row(frame.infoset) if frame.prune else None
+        while frame.cursor + 1 < len(frame.actions):
+            frame.cursor += 1
+            action = frame.actions[frame.cursor]
+            if (
+                regrets is not None
+                and regrets[frame.cursor] < self.prune_threshold
+                and not self.ends_hand(frame.node, action)
+            ):
+                # Skip the subtree unbuilt; its regret is left untouched
+                continue
+            return frame.node.next_state(action)
+        return None
+
+    @staticmethod
+    def ends_hand(node, action) -> bool:
+        """
+        Whether action at node reaches a terminal node, through the node's
+        is_terminal_action when it has one rather than building the child.
+        """
+        is_terminal_action = getattr(node, "is_terminal_action", None)
+        if is_terminal_action is not None:
+            return is_terminal_action(action)
+        return node.next_state(action).is_terminal()
+
+    def update_infoset(self, frame: "TraversalFrame"):
+        """
+        Update regrets of explored actions & average strategy once every child of the frame is done.
+        :return: The expected payoff for player p at the frame's node.
+        """
+        # Opponent and chance actions were sampled on policy, so the sampled
+        # regret is already an unbiased counterfactual regret; weighting it by
+        # reach_opp as well would count the opponent's reach twice
+        regrets = np.array(
+            [0.0 if v is None else v - frame.value for v in frame.action_values]
+        )
+        self.storage.add_regrets(frame.infoset, regrets)
+        self.storage.add_average(
+            frame.infoset, frame.reach_p * np.array(frame.strategy)
+        )
+        return frame.value
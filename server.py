@@ -0,0 +1,268 @@
+"""
+Server mode of the tournament bot. The event loop only parses requests,
+looks up the blueprint and keeps the time bank; searches, pondering and other
+heavy work run in a persistent pool of worker processes, so observations are
+handled while the pool computes and every core of the machine is used.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from agent import PluribusAgent
+from utils.subgame_cache import SubgameCache, public_state_key
+
+# Agent of a pool worker, built once when the worker starts, and the barrier
+# every worker and the server meet at in AgentServer.warm
+_worker: Optional[PluribusAgent] = None
+_barrier: Any = None
+
+
+def _init_worker(factory: Callable[[], PluribusAgent], barrier):
+    global _worker, _barrier
+    _worker = factory()
+    _barrier = barrier
+    # The server owns the cache; workers only search
+    if _worker.solver is not None:
+        _worker.solver.cache = None
+
+
+def worker_agent() -> PluribusAgent:
+    """
+    The warmed-up agent of the current pool worker, for functions passed to
+    AgentServer.run that need the blueprint or tables.
+    """
+    return _worker
+
+
+def _ready() -> int:
+    # Holding the worker until all have arrived sends each its own task
+    _barrier.wait()
+    return os.getpid()
+
+
+def _search(history: tuple, board: tuple, deadline: float) -> np.ndarray:
+    # perf_counter is a system-wide monotonic clock, so deadlines hold across processes
+    return _worker.solver.solve(history, board, deadline).astype(np.float32)
+
+
+class AgentServer:
+    """
+    A PluribusAgent served without blocking the event loop. The server's own
+    agent makes blueprint lookups and keeps the time bank and the cache of
+    solved subgames; each pool worker builds its own agent from the same
+    factory when it starts, so blueprints and tables are loaded before the
+    first request. Tables attached from shared segments or opened with mmap,
+    like VectorBlueprint, exist once in memory however many workers map them.
+    - agent: the server process's agent
+    - pool: the worker processes
+    - cache: solved subgames, in canonical suits
+    - inflight: pondered searches still running, by cache key
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], PluribusAgent],
+        workers: Optional[int] = None,
+        cache: Optional[SubgameCache] = None,
+        bridge: Any = None,
+        margin: float = 0.01,
+    ):
+        """
+        :param factory: Builds an agent with a solver; it must be picklable
+            where processes are spawned rather than forked.
+        :param workers: Worker processes, by default one per core but one.
+        :param bridge: Converts harness observations for app(), like
+            utils.env_bridge.EnvBridge: start_hand(hand_number),
+            spot(observation) -> (history, board, hand, pot, stack) or None,
+            default_action(observation) when there is no spot,
+            discard_action(observation) -> action or None, asked first,
+            opponent_spot(observation) -> (history, board) or None, and
+            action(observation, label) -> (action type, amount, discard).
+        :param margin: Seconds before a decision's deadline at which the worker
+            stops searching, for its result to reach the server in time.
+        """
+        self.agent = factory()
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.cache = cache if cache is not None else SubgameCache()
+        self.bridge = bridge
+        self.margin = margin
+        self._barrier = multiprocessing.Barrier(self.workers + 1)
+        self.pool = ProcessPoolExecutor(
+            self.workers, initializer=_init_worker, initargs=(factory, self._barrier)
+        )
+        self.inflight: Dict[tuple, asyncio.Future] = {}
+        self.hand_number: Optional[int] = None
+
+    def warm(self) -> List[int]:
+        """
+        Start every worker and build its agent now rather than on the first
+        request.
+        :return: The process ids of the workers.
+        """
+        futures = [self.pool.submit(_ready) for _ in range(self.workers)]
+        self._barrier.wait()
+        return sorted(f.result() for f in futures)
+
+    def close(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+    async def run(self, fn: Callable, *args):
+        """
+        Run fn(*args) in a worker; fn can use worker_agent().
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    def _store(self, key: tuple, hands: np.ndarray, future: asyncio.Future):
+        self.inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        strategy = future.result()
+        canonical = np.empty_like(strategy)
+        canonical[hands] = strategy
+        self.cache.put(key, canonical)
+
+    def _dispatch(
+        self, history: tuple, board: tuple, deadline: float, key: tuple, hands
+    ) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.pool, _search, history, board, deadline)
+        self.inflight[key] = future
+        future.add_done_callback(partial(self._store, key, hands))
+        return future
+
+    async def decide(
+        self,
+        history: Sequence[str],
+        board: tuple,
+        hand: tuple,
+        pot: Optional[int] = None,
+        stack: Optional[int] = None,
+    ) -> Dict[str, float]:
+        """
+        PluribusAgent.policy() with the search in a worker. A spot being
+        pondered is awaited until the deadline rather than searched again.
+        """
+        start = time.perf_counter()
+        distribution, budget = self.agent.plan(history, board, hand, pot)
+        if budget > 0:
+            game = self.agent.game
+            node = game.locate(history)
+            key, cards = public_state_key(game, node, board, pot, stack)
+            if key not in self.cache and key not in self.inflight:
+                # Pondering keys spots by the abstract amounts, which real bets
+                # only approximate; the search runs on the abstract tree either way
+                pondered, _ = public_state_key(game, node, board)
+                if pondered in self.cache or pondered in self.inflight:
+                    key = pondered
+            hands = game.hand_permutation(cards)
+            canonical = self.cache.get(key)
+            if canonical is None:
+                deadline = start + budget
+                future = self.inflight.get(key)
+                if future is None:
+                    history = tuple(history)
+                    stop = deadline - self.margin
+                    future = self._dispatch(history, board, stop, key, hands)
+                try:
+                    timeout = max(0.0, deadline - time.perf_counter())
+                    await asyncio.wait_for(asyncio.shield(future), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                canonical = self.cache.get(key)
+            if canonical is not None:
+                row = canonical[hands[game.hand_index[tuple(sorted(hand))]]]
+                distribution = dict(zip(node.actions, row.astype(float).tolist()))
+        self.agent.bank.charge(time.perf_counter() - start)
+        return distribution
+
+    def ponder(self, history: Sequence[str], board: tuple):
+        """
+        While the opponent is to act at history, search our likely next spots
+        (see PluribusAgent.likely_spots) that are not cached yet, each in its
+        own worker. One worker is left free for our next decision.
+        Must be called from the event loop; results are cached as they arrive.
+        """
+        game = self.agent.game
+        board = tuple(board)
+        spots = self.agent.likely_spots(history, board)[: max(1, self.workers - 1)]
+        for spot in spots:
+            key, cards = public_state_key(game, game.locate(spot), board)
+            if key in self.cache or key in self.inflight:
+                continue
+            deadline = time.perf_counter() + self.agent.ponder_seconds
+            self._dispatch(spot, board, deadline, key, game.hand_permutation(cards))
+
+    def _start_hand(self, info: Optional[dict]):
+        hand_number = (info or {}).get("hand_number")
+        if hand_number is not None and hand_number != self.hand_number:
+            self.hand_number = hand_number
+            self.agent.start_hand(hand_number)
+            self.bridge.start_hand(hand_number)
+
+    async def act(self, observation: dict, info: Optional[dict] = None) -> tuple:
+        """
+        Answer a harness get_action request through the bridge.
+        """
+        self._start_hand(info)
+        start = time.perf_counter()
+        discard = await asyncio.to_thread(self.bridge.discard_action, observation)
+        self.agent.bank.charge(time.perf_counter() - start)
+        if discard is not None:
+            return discard
+        spot = self.bridge.spot(observation)
+        if spot is None:
+            return self.bridge.default_action(observation)
+        distribution = await self.decide(*spot)
+        actions = list(distribution)
+        probs = np.array([distribution[a] for a in actions])
+        k = int(self.agent.rng.choice(len(actions), p=probs / probs.sum()))
+        return self.bridge.action(observation, actions[k])
+
+    def observe(self, observation: dict, info: Optional[dict] = None):
+        """
+        Handle a harness observation: ponder if the opponent is to act.
+        """
+        self._start_hand(info)
+        spot = self.bridge.opponent_spot(observation)
+        if spot is not None:
+            self.ponder(*spot)
+
+    def app(self):
+        """
+        FastAPI application with the harness's routes (see aipoker's
+        agents/agent.py), whose handlers never block the event loop.
+        """
+        # Only the server needs FastAPI, which the tournament image provides
+        from fastapi import Body, FastAPI
+
+        app = FastAPI()
+
+        @app.get("/get_action")
+        async def get_action(request: dict = Body(...)) -> dict:
+            action = await self.act(request["observation"], request.get("info"))
+            return {"action": action}
+
+        @app.post("/post_observation")
+        async def post_observation(request: dict = Body(...)) -> None:
+            if not request.get("terminated"):
+                self.observe(request["observation"], request.get("info"))
+
+        return app
+
+    def serve(self, host: str = "0.0.0.0", port: int = 8000):
+        """
+        Serve app() until stopped; call warm() first so that the first
+        request does not wait for the workers.
+        """
+        import uvicorn
+
+        uvicorn.run(
+            self.app(), host=host, port=port, log_level="info", access_log=False
+        )
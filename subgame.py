@@ -0,0 +1,282 @@
+from exploitability import Strategy
+from utils.public_tree import CALL, CHECK, FOLD, RAISE, NodeKind, PublicGame, PublicNode
+from utils.subgame_cache import SubgameCache, public_state_key
+from vector_cfr import VectorCFR, regret_matching
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import time
+
+
+def biased_strategy(blueprint: Strategy, labels: Sequence[str], factor: float = 5.0):
+    """
+    The blueprint with the probability of every action whose label starts
+    with one of labels multiplied by factor, then renormalized.
+    """
+
+    def probabilities(node: PublicNode, board: tuple) -> np.ndarray:
+        probs = np.array(blueprint(node, board), dtype=np.float64)
+        boosted = [a for a, label in enumerate(node.actions) if label[0] in labels]
+        probs[:, boosted] *= factor
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    return probabilities
+
+
+def continuation_strategies(blueprint: Strategy, factor: float = 5.0) -> List[Strategy]:
+    """
+    Pluribus' continuation strategies: the blueprint and its versions biased
+    toward folding, toward checking or calling, and toward raising.
+    """
+    return [
+        blueprint,
+        biased_strategy(blueprint, (FOLD,), factor),
+        biased_strategy(blueprint, (CHECK, CALL), factor),
+        biased_strategy(blueprint, (RAISE,), factor),
+    ]
+
+
+class SubgameSolver(VectorCFR):
+    """
+    Real-time depth-limited search from the current public state. The
+    subgame is rooted at the node reached by the public history; both
+    players' ranges there are their blueprint reach probabilities along that
+    line. Decision nodes of the searched streets get fresh vector CFR tables;
+    at the end of the last searched street each player picks, for every
+    hand, one of the continuation strategies to play for the rest of the game,
+    and values below are rolled out on the sampled runout of the iteration.
+    Iterations run until a wall-clock deadline, so the search is anytime.
+    With a cache, solved root strategies are stored under the canonical
+    public state and a repeated spot is answered without searching.
+    """
+
+    def __init__(
+        self,
+        game: PublicGame,
+        blueprint: Strategy,
+        continuations: Optional[Sequence[Strategy]] = None,
+        streets: int = 1,
+        alpha: float = 1.5,
+        beta: float = 0,
+        gamma: float = 2,
+        seed: Optional[int] = None,
+        cache: Optional[SubgameCache] = None,
+    ):
+        """
+        :param blueprint: Strategy of both players, for the ranges at the root.
+        :param continuations: Strategies the players choose from at the leaves,
+            by default only the blueprint. k continuations cost k^2 rollouts per leaf.
+        :param streets: Betting rounds searched, counting the current one.
+        :param cache: Cache of solved subgames shared between searches.
+        """
+        super().__init__(game, alpha, beta, gamma, seed)
+        self.cache = cache
+        self.blueprint = blueprint
+        self.continuations: List[Strategy] = list(continuations or [blueprint])
+        self.streets = streets
+        self.root: PublicNode = game.root
+        self.board: tuple = ()
+        self.ranges: List[np.ndarray] = [np.ones(game.num_hands)] * 2
+        # Street of the first decision nodes left to the continuation strategies
+        self.leaf_street: int = streets
+        # Longest traversal of the current search, the margin kept before the deadline
+        self.slowest: float = 0.0
+        # Set from another thread to end the current search early, uncached
+        self.cancelled: bool = False
+
+    def spawn(self, seed: Optional[int] = None) -> "SubgameSolver":
+        """
+        A solver with the same settings and cache, for searching concurrently.
+        """
+        return SubgameSolver(
+            self.game,
+            self.blueprint,
+            self.continuations,
+            self.streets,
+            self.alpha,
+            self.beta,
+            self.gamma,
+            seed,
+            self.cache,
+        )
+
+    def visible(self, node: PublicNode, board: tuple) -> tuple:
+        return board[: self.game.revealed(node.street)]
+
+    def blueprint_ranges(self, node: PublicNode, board: tuple) -> List[np.ndarray]:
+        """
+        Each player's reach probability of every hand at node under the blueprint.
+        """
+        ranges = [np.ones(self.game.num_hands), np.ones(self.game.num_hands)]
+        current = self.game.root
+        for label in node.history:
+            if current.kind == NodeKind.DECISION:
+                a = current.actions.index(label)
+                probs = self.blueprint(current, self.visible(current, board))
+                ranges[current.player] = ranges[current.player] * probs[:, a]
+                current = current.children[a]
+            else:
+                current = current.children[0]
+        return ranges
+
+    def reset(self, history: Sequence[str], board: tuple):
+        """
+        Root a new subgame at the public state of history on board, dropping
+        the tables of the previous search.
+        """
+        root = self.game.locate(history)
+        if len(board) != self.game.revealed(root.street):
+            raise ValueError(f"Board {board} does not match street {root.street}")
+        self.root = root
+        self.board = tuple(board)
+        self.ranges = self.blueprint_ranges(root, board)
+        self.leaf_street = root.street + self.streets
+        self.tables.clear()
+        self.iteration = 0
+        self.log_pos, self.log_neg, self.log_avg = [0.0], [0.0], [0.0]
+        self.slowest = 0.0
+
+    def solve(
+        self,
+        history: Sequence[str],
+        board: tuple,
+        deadline: float,
+        pot: Optional[int] = None,
+        stack: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Search the subgame of the public state until the deadline. A traversal
+        is only started if the longest one so far still fits before it, so the
+        search returns on time unless its first traversal alone overruns.
+        :param deadline: time.perf_counter() value to return by.
+        :param pot / stack: Actual amounts of the spot, for the cache key.
+        :return: Strategy of every hand of the player to act, see root_strategy.
+        """
+        self.reset(history, board)
+        if self.cache is not None:
+            key, cards = public_state_key(self.game, self.root, self.board, pot, stack)
+            # Row hands[h] of a canonical strategy is hand h on the actual board
+            hands = self.game.hand_permutation(cards)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached[hands]
+        strategy = self.search(deadline)
+        if self.cache is not None and not self.cancelled:
+            canonical = np.empty_like(strategy)
+            canonical[hands] = strategy
+            self.cache.put(key, canonical)
+        return strategy
+
+    def search(self, deadline: float) -> np.ndarray:
+        """
+        Run iterations on the current subgame until the deadline.
+        """
+        t = 0
+        while True:
+            t += 1
+            for p in (0, 1):
+                start = time.perf_counter()
+                if start + self.slowest > deadline or self.cancelled:
+                    return self.root_strategy()
+                board = self.game.sample_board(self.rng, self.board)
+                self.traverse(self.root, p, self.ranges, board)
+                self.slowest = max(self.slowest, time.perf_counter() - start)
+            self.discount(t)
+
+    def action_distribution(
+        self,
+        history: Sequence[str],
+        board: tuple,
+        hand: tuple,
+        deadline: float,
+        pot: Optional[int] = None,
+        stack: Optional[int] = None,
+    ) -> Dict[str, float]:
+        """
+        Search until the deadline and return the distribution over the root's
+        actions of the player to act, holding hand.
+        """
+        strategy = self.solve(history, board, deadline, pot, stack)
+        row = strategy[self.game.hand_index[tuple(sorted(hand))]]
+        return dict(zip(self.root.actions, row.tolist()))
+
+    def root_strategy(self) -> np.ndarray:
+        """
+        Average strategy at the root, with the blueprint for hands the search
+        has not reached.
+        """
+        blueprint = np.array(self.blueprint(self.root, self.board), dtype=np.float64)
+        table = self.tables.get(self.public_key(self.root, self.board))
+        if table is None:
+            return blueprint
+        totals = table.average.sum(axis=1, keepdims=True)
+        safe = np.where(totals > 0, totals, 1.0)
+        return np.where(totals > 0, table.average / safe, blueprint)
+
+    def traverse(
+        self, node: PublicNode, p: int, reach: List[np.ndarray], board: tuple
+    ) -> np.ndarray:
+        if node.kind == NodeKind.CHANCE and node.street + 1 >= self.leaf_street:
+            return self.leaf_values(node, p, reach, board)
+        return super().traverse(node, p, reach, board)
+
+    def leaf_values(
+        self, node: PublicNode, p: int, reach: List[np.ndarray], board: tuple
+    ) -> np.ndarray:
+        """
+        Value of a leaf for player p, whose hands each pick a continuation
+        strategy against the opponent's current mix of them. p's choice is
+        updated with regret matching like any decision.
+        """
+        k = len(self.continuations)
+        if k == 1:
+            strategies = [self.continuations[0]] * 2
+            return self.rollout(node, p, reach, board, strategies)
+        key = self.public_key(node, board)
+        q = 1 - p
+        own = self.keyed_table(key + (p,), k)
+        opponent = self.keyed_table(key + (q,), k)
+        own_strategy = regret_matching(own.regrets)
+        opponent_strategy = regret_matching(opponent.regrets)
+        action_values = np.zeros((self.game.num_hands, k))
+        for i in range(k):
+            for j in range(k):
+                strategies = [None, None]
+                strategies[p] = self.continuations[i]
+                strategies[q] = self.continuations[j]
+                child_reach = [reach[0], reach[1]]
+                child_reach[q] = reach[q] * opponent_strategy[:, j]
+                action_values[:, i] += self.rollout(
+                    node, p, child_reach, board, strategies
+                )
+        value = (own_strategy * action_values).sum(axis=1)
+        own.regrets += action_values - value[:, None]
+        own.average += reach[p][:, None] * own_strategy
+        return value
+
+    def rollout(
+        self,
+        node: PublicNode,
+        p: int,
+        reach: List[np.ndarray],
+        board: tuple,
+        strategies: List[Strategy],
+    ) -> np.ndarray:
+        """
+        Counterfactual value of player p's hands below node when each player
+        q plays strategies[q], on the board already sampled.
+        """
+        if node.is_terminal():
+            return self.game.terminal_values(node, p, reach[1 - p], board)
+        if node.kind == NodeKind.CHANCE:
+            return self.rollout(node.children[0], p, reach, board, strategies)
+        q = node.player
+        probs = strategies[q](node, self.visible(node, board))
+        value = np.zeros(self.game.num_hands)
+        for a, child in enumerate(node.children):
+            if q == p:
+                value += probs[:, a] * self.rollout(child, p, reach, board, strategies)
+            else:
+                child_reach = [reach[0], reach[1]]
+                child_reach[q] = reach[q] * probs[:, a]
+                value += self.rollout(child, p, child_reach, board, strategies)
+        return value
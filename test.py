@@ -12,6 +12,64 @@ from utils.poker_tree import (
     HandRank,
     HandEvaluator,
 )
+from pluribus import PluribusDCFR, info_element, infoset
+from utils.regret_storage import RegretStorage
+from utils.out_of_core import OutOfCoreRegretStorage
+from utils.blueprint import BlueprintReader, write_blueprint
+from utils.short_deck import ShortDeckGame, hand_strength, STRAIGHT, PAIR
+from vector_cfr import VectorCFR
+from exploitability import best_response_value, exploitability
+from utils.toy_games import (
+    KuhnGame,
+    LeducGame,
+    ToyState,
+    state_strategy,
+    tabular_strategy,
+)
+from utils.reservoir import ReservoirBuffer
+from deep_cfr import DeepCFR
+from subgame import SubgameSolver, continuation_strategies
+from utils.subgame_cache import SubgameCache, public_state_key
+from utils.time_bank import TimeBank, spot_difficulty
+from agent import PluribusAgent
+from server import AgentServer
+from utils.blueprint import VectorBlueprint, write_vector_blueprint
+from utils.artifacts import ArtifactStore
+from utils.shared_tables import SharedTables, attach, fingerprint, write_segment
+from utils.discard import DiscardSolver
+from utils.env_bridge import (
+    CALL_ACTION,
+    CHECK_ACTION,
+    DISCARD_ACTION,
+    RAISE_ACTION,
+    EnvBridge,
+)
+from utils.short_deck_tables import (
+    FLOP_BUCKETS,
+    FLOP_EQUITY,
+    FLOPS,
+    ShortDeckEvaluator,
+    ShortDeckTables,
+    canonical_flops,
+    equity_buckets,
+)
+from utils.startup import Startup, process_age
+from bot import build_agent, build_artifacts
+from utils.telemetry import Telemetry
+from utils.baseline import RunningBaseline, SampledFrame
+from benchmark import ToyDCFR
+import dcfr
+import os
+import numpy as np
+import tempfile
+import random
+import asyncio
+import glob
+import json
+import subprocess
+import sys
+import time
+from itertools import combinations
 
 
 def test_player_initialization():
@@ -761,6 +819,999 @@ def test_game_tree_checkout():
     assert player2.get_stack() == 600
 
 
+def test_negative_regret_pruning():
+    visited = []
+    built = []
+
+    class Spot:
+        """
+        Player 0 folds, calls or raises, then player 1 checks; nodes the
+        traversal builds and steps into are recorded.
+        """
+
+        def __init__(self, stage, path=()):
+            self.stage = stage
+            self.path = path
+
+        def is_terminal(self):
+            return self.path == ("f",) or len(self.path) == 2
+
+        def is_chance_node(self):
+            visited.append(self.path)
+            return False
+
+        def current_player(self):
+            return 0 if not self.path else 1
+
+        def get_stage(self):
+            return self.stage
+
+        def infoset(self, player):
+            return ("spot", self.stage, self.path)
+
+        def next_state(self, action):
+            built.append(self.path + (action,))
+            return Spot(self.stage, self.path + (action,))
+
+        def is_terminal_action(self, action):
+            return action == "f"
+
+        def payoff(self, player):
+            return {("f",): -1.0, ("c", "x"): 0.5, ("r", "x"): 2.0}[self.path]
+
+    actions = {(): ["f", "c", "r"], ("c",): ["x"], ("r",): ["x"]}
+    keys = []
+    for stage in (Stage.FLOP, Stage.RIVER):
+        for path, menu in actions.items():
+            keys.append(("spot", stage, path))
+            infoset[keys[-1]] = info_element(menu)
+    try:
+        for stage, prune, explored in (
+            # Every regret is below the threshold: only the fold, which ends
+            # the hand, is explored
+            (Stage.FLOP, True, [()]),
+            # The river is never pruned, nor are unpruned traversals
+            (Stage.RIVER, True, [(), ("c",), ("r",)]),
+            (Stage.FLOP, False, [(), ("c",), ("r",)]),
+        ):
+            trainer = PluribusDCFR(players=[0, 1], prune_threshold=1.0)
+            visited.clear()
+            built.clear()
+            trainer.dcfr_traversal(Spot(stage), 0, 1.0, 1.0, prune=prune)
+            assert visited == explored
+            if stage == Stage.FLOP and prune:
+                # Pruned subtrees are skipped without building their root
+                assert built == [("f",)]
+    finally:
+        for key in keys:
+            del infoset[key]
+
+
+def test_traversal_survives_deep_raise_chains():
+    class Chain:
+        """
+        Players raise in turn up to depth plies; player 0 may call instead.
+        """
+
+        def __init__(self, depth, path=()):
+            self.depth = depth
+            self.path = path
+
+        def is_terminal(self):
+            return self.path[-1:] == ("c",) or len(self.path) == self.depth
+
+        check_if_terminal = is_terminal
+
+        def is_chance_node(self):
+            return False
+
+        def current_player(self):
+            return len(self.path) % 2
+
+        def get_stage(self):
+            return Stage.FLOP
+
+        def infoset(self, player):
+            return ("chain", self.path)
+
+        def legal_actions(self):
+            return ["r", "c"] if self.current_player() == 0 else ["r"]
+
+        def next_state(self, action):
+            return Chain(self.depth, self.path + (action,))
+
+        def payoff(self, player):
+            # The caller wins pots of one raise in three
+            raises = len(self.path)
+            value = -raises if raises % 3 else raises
+            return value if player == 0 else -value
+
+    # Values and regrets of one iteration, as the recursive traversal left them
+    recursive = {(): -0.3125, ("r",) * 2: -4.625, ("r",) * 4: -1.25, ("r",) * 6: -0.5}
+    random.seed(0)
+    trainers = [PluribusDCFR(players=[0, 1]), dcfr.PluribusDCFR()]
+    for trainer in trainers:
+        values = [trainer.dcfr_traversal(Chain(8), p, 1.0, 1.0) for p in (0, 1)]
+        assert values == [-1.3125, 1]
+    storage = trainers[0].storage
+    for path, regret in recursive.items():
+        row = storage.regret_row(storage.lookup(("chain", path)))
+        assert row.tolist() == [regret, -regret]
+        assert trainers[1].regrets[("chain", path)] == {"r": regret, "c": -regret}
+
+    # Deeper than the recursion limit would let a recursive traversal go
+    depth = sys.getrecursionlimit() + 100
+    last = ("chain", ("r",) * (depth - 1))
+    trainers = [PluribusDCFR(players=[0, 1]), dcfr.PluribusDCFR()]
+    for trainer in trainers:
+        for p in (0, 1):
+            trainer.dcfr_traversal(Chain(depth), p, 1.0, 1.0)
+    assert trainers[0].storage.lookup(last) is not None
+    assert last in trainers[1].regrets
+
+
+def test_dcfr_strategy_cache():
+    def matched(regrets):
+        positive = {a: max(r, 0.0) for a, r in regrets.items()}
+        total = sum(positive.values())
+        return {a: r / total if total > 0 else 0.5 for a, r in positive.items()}
+
+    game = KuhnGame()
+    random.seed(0)
+    solver = ToyDCFR(game)
+    solver.compute_blueprint_strategy(10)
+    state = ToyState(game, None).next_state(((0,), (2,)))
+    I = state.infoset(0)
+    solver.regret_matching(I)
+    cached = dict(solver.strategy[I])
+    assert cached == matched(solver.regrets[I])
+
+    # A clean infoset returns its cached strategy without looking at regrets
+    regrets = solver.regrets[I]
+    solver.regrets[I] = {"k": 1.0, "r2": -1.0}
+    solver.regret_matching(I)
+    assert solver.strategy[I] == cached
+    solver.regrets[I] = regrets
+
+    # A regret update marks it dirty, and the next lookup recomputes it
+    solver.dcfr_traversal(state, 0, 1.0, 1.0)
+    assert I in solver.dirty_infosets
+    solver.regret_matching(I)
+    assert I not in solver.dirty_infosets
+    assert solver.strategy[I] == matched(solver.regrets[I]) != cached
+
+    # Discounting scales positive regrets alike and keeps the strategy clean,
+    # unless a positive regret underflows to zero
+    solver.discount(11)
+    assert I not in solver.dirty_infosets
+    solver.regrets[I] = {"k": 5e-324, "r2": -1.0}
+    solver.dirty_infosets.add(I)
+    solver.regret_matching(I)
+    assert solver.strategy[I] == {"k": 1.0, "r2": 0.0}
+    # The first iteration's discount halves positive regrets
+    solver.discount(1)
+    assert I in solver.dirty_infosets
+    solver.regret_matching(I)
+    assert solver.strategy[I] == {"k": 0.5, "r2": 0.5}
+
+
+def test_regret_storage_int32_saturates_at_floor():
+    storage = RegretStorage(regret_dtype="int32", regret_floor=-5.0)
+    i = storage.add_infoset("I", ["fold", "call"])
+    storage.add_regrets(i, np.array([-100.0, 2.5]))
+    assert storage.regret_row(i).tolist() == [-5.0, 2.5]
+    storage.add_regrets(i, np.array([0.0, 1e9]))
+    assert storage.regrets[storage.row(i)][1] == np.iinfo(np.int32).max
+
+    # Only the positive regret counts in regret matching
+    assert storage.current_strategy(i).tolist() == [0.0, 1.0]
+
+
+def test_regret_storage_int32_discount_keeps_cached_strategies():
+    storage = RegretStorage(regret_dtype="int32")
+    for k in range(1, 20):
+        i = storage.add_infoset(("I", k), ["fold", "call", "raise"])
+        storage.add_regrets(i, np.array([k, 2.0 * k, -k]))
+    tiny = storage.add_infoset("tiny", ["fold", "call"])
+    storage.add_regrets(tiny, np.array([1.0, 1 / storage.regret_scale]))
+    for i in range(len(storage)):
+        storage.current_strategy(i)
+    storage.discount(0.4, 0.5, 0.9)
+    # Discounting scales regrets, so cached strategies stay valid
+    assert not storage.dirty[:tiny].any()
+    for i in range(tiny):
+        assert np.allclose(storage.current_strategy(i), [1 / 3, 2 / 3, 0.0])
+    # but a positive regret rounded to zero leaves the support
+    assert storage.dirty[tiny]
+    assert storage.current_strategy(tiny).tolist() == [1.0, 0.0]
+
+
+def test_regret_storage_uint16_average_rescales():
+    storage = RegretStorage(average_dtype="uint16", average_scale=1000.0, seed=0)
+    i = storage.add_infoset("I", ["fold", "call", "raise"])
+    for _ in range(200):
+        storage.add_average(i, np.array([0.5, 0.25, 0.25]))
+    assert storage.average[storage.row(i)].max() <= np.iinfo(np.uint16).max
+    assert np.allclose(storage.average_strategy(i), [0.5, 0.25, 0.25], atol=0.01)
+
+
+def test_regret_storage_save_load():
+    storage = RegretStorage(regret_dtype="int32", average_dtype="uint16")
+    for k in range(10):
+        i = storage.add_infoset(("I", k), ["check", "raise"])
+        storage.add_regrets(i, np.array([k, -k], dtype=float))
+    with tempfile.TemporaryDirectory() as directory:
+        storage.save(directory)
+        loaded = RegretStorage.load(directory)
+        i = loaded.lookup(("I", 7))
+        assert i == 7
+        assert loaded.regret_row(i).tolist() == [7.0, -7.0]
+        assert loaded.lookup(("I", 10)) is None
+        # New infosets extend the loaded tables
+        j = loaded.add_infoset(("I", 10), ["check", "raise"])
+        assert j == 10
+        assert loaded.keys[-2:] == [("I", 9), ("I", 10)]
+
+
+def test_out_of_core_storage_matches_in_memory():
+    with tempfile.TemporaryDirectory() as directory:
+        memory = RegretStorage()
+        disk = OutOfCoreRegretStorage(
+            directory, cache_infosets=2, pin=lambda key: key[1] == 0, capacity=1
+        )
+        for t in range(1, 4):
+            for k in range(6):
+                for storage in (memory, disk):
+                    i = storage.add_infoset(("I", k), ["fold", "call", "raise"])
+                    storage.add_regrets(i, np.array([t, -k, k - t], dtype=float))
+                    storage.add_average(i, storage.current_strategy(i))
+            for storage in (memory, disk):
+                storage.discount(t / (t + 1.0), 0.5, 0.9)
+        assert disk.stats()["evictions"] > 0
+        assert disk.stats()["pinned_infosets"] == 1
+        disk.flush()
+        for i in range(6):
+            assert np.allclose(memory.regret_row(i), disk.regret_row(i))
+            assert np.allclose(memory.average_strategy(i), disk.average_strategy(i))
+
+
+def test_out_of_core_index_stays_on_disk():
+    with tempfile.TemporaryDirectory() as directory:
+        storage = OutOfCoreRegretStorage(
+            os.path.join(directory, "tables"), cache_infosets=8, cache_keys=16
+        )
+        keys = [("I", k, "x" * (k % 7)) for k in range(3000)]
+        for k, key in enumerate(keys):
+            assert storage.add_infoset(key, ["fold", "call"]) == k
+        # Only the hot keys stay in memory; the rest are probed on disk
+        assert len(storage.index) == 16 and storage.disk_index.size >= 6000
+        assert [storage.lookup(key) for key in keys] == list(range(3000))
+        assert storage.lookup(("I", 3000, "")) is None and len(storage.index) == 16
+        assert storage.keys == keys
+        # The memory estimate counts the cached keys
+        resident = storage.nbytes()
+        storage.index.clear()
+        assert storage.nbytes() < resident
+
+        # A resumed storage indexes the checkpoint's keys on disk as well
+        checkpoint = os.path.join(directory, "checkpoint")
+        os.makedirs(checkpoint)
+        storage.save(checkpoint)
+        resumed = OutOfCoreRegretStorage.load(
+            checkpoint, os.path.join(directory, "resumed"), cache_keys=4
+        )
+        assert resumed.lookup(keys[1234]) == 1234 and len(resumed.index) == 1
+        assert resumed.add_infoset(("new",), ["fold"]) == 3000
+        assert resumed.keys[-2:] == [keys[-1], ("new",)]
+
+
+def test_blueprint_export_and_lookup():
+    storage = RegretStorage()
+    for k in range(50):
+        i = storage.add_infoset(("I", k), ["fold", "call", "raise"])
+        storage.add_average(i, np.array([k, 1.0, 2.0]))
+    storage.add_infoset(("empty",), ["check", "raise"])
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "blueprint.bin")
+        write_blueprint(storage, path)
+        reader = BlueprintReader(path)
+        assert len(reader) == 51
+        for k in range(50):
+            strategy = reader.strategy(("I", k))
+            assert list(strategy) == ["fold", "call", "raise"]
+            assert abs(sum(strategy.values()) - 1.0) < 1e-9
+            expected = storage.average_strategy(k)
+            assert np.allclose(list(strategy.values()), expected, atol=1 / 255)
+        assert reader.strategy(("empty",)) == {"check": 128 / 255, "raise": 127 / 255}
+        assert reader.strategy(("I", 50)) is None
+        reader.close()
+
+
+def test_blueprint_compaction_falls_back_to_parent():
+    storage = RegretStorage()
+    i = storage.add_infoset(("bucket", 0), ["fold", "call"])
+    storage.add_average(i, np.array([90.0, 10.0]))
+    i = storage.add_infoset(("bucket", 0, "rare"), ["fold", "call"])
+    storage.add_average(i, np.array([0.0, 1.0]))
+    i = storage.add_infoset(("bucket", 1), ["fold", "call"])
+    storage.add_average(i, np.array([51.0, 49.0]))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "blueprint.bin")
+        write_blueprint(storage, path, min_reach=0.05, uniform_tolerance=0.05)
+        reader = BlueprintReader(
+            path, parent=lambda key: key[:2] if len(key) > 2 else None
+        )
+        assert len(reader) == 1
+        # Rarely reached: answered by its parent
+        rare = reader.strategy(("bucket", 0, "rare"), ["fold", "call"])
+        assert rare == reader.strategy(("bucket", 0))
+        # Entries answer by label, and only for the menu they were stored with
+        swapped = reader.strategy(("bucket", 0, "rare"), ["call", "fold"])
+        assert list(swapped) == ["call", "fold"] and swapped == rare
+        other = reader.strategy(("bucket", 0, "rare"), ["check", "bet"])
+        assert other == {"check": 0.5, "bet": 0.5}
+        # Near uniform: answered by the uniform default
+        uniform = reader.strategy(("bucket", 1), ["fold", "call"])
+        assert uniform == {"fold": 0.5, "call": 0.5}
+        assert reader.strategy(("bucket", 1)) is None
+        reader.close()
+
+
+def test_short_deck_hand_strength():
+    def card(name):
+        return "23456789A".index(name[0]) + 9 * "dhs".index(name[1])
+
+    def strength(names):
+        return hand_strength([card(n) for n in names.split()])
+
+    # 6-7-8-9-A is not a straight; A-2-3-4-5 is
+    assert strength("6d 7h 8s 9d Ah") >> 20 == 0
+    assert strength("Ad 2h 3s 4d 5h") >> 20 == STRAIGHT
+    assert strength("5d 6h 7s 8d 9h") > strength("Ad 2h 3s 4d 5h")
+    assert strength("Ad Ah 2s 3d 5h 7s 8d") >> 20 == PAIR
+    assert strength("Ad Ah 2s 3d 5h 7s 8d") == strength("As Ah 2s 3d 5h 7s 8h")
+
+
+def test_vector_cfr_short_deck_iteration():
+    game = ShortDeckGame()
+    assert game.num_hands == 351
+    assert game.root.actions == ["f", "c", "r6", "r100"]
+    solver = VectorCFR(game, seed=0)
+    strategy = solver.compute_blueprint_strategy(2)
+    assert solver.iteration == 2
+    probs = strategy(game.root, ())
+    assert probs.shape == (351, 4)
+    assert np.allclose(probs.sum(axis=1), 1.0)
+
+
+def test_exploitability_kuhn():
+    game = KuhnGame()
+
+    def uniform(node, board):
+        return np.full((game.num_hands, len(node.actions)), 1.0 / len(node.actions))
+
+    # Uniform play in Kuhn poker is exploitable for 11/24 chips per hand
+    assert np.isclose(exploitability(game, uniform), 11 / 24)
+    solver = VectorCFR(game, seed=0)
+    strategy = solver.compute_blueprint_strategy(200)
+    assert exploitability(game, strategy) < 0.01
+    # The game is worth -1/18 to player 0 at equilibrium
+    assert abs(best_response_value(game, strategy, 0) + 1 / 18) < 0.01
+
+
+def test_toy_games_node_interface():
+    game = LeducGame()
+    state = ToyState.root(game)
+    assert state.is_chance_node()
+    # Jack against queen; each ante is 1 and first-round raises are 2
+    state = state.next_state(((0,), (2,)))
+    assert state.current_player() == 0
+    assert state.legal_actions() == ["k", "r3"]
+    state = state.next_state("k").next_state("k")
+    assert state.is_chance_node()
+    # The board jack pairs player 0
+    state = state.next_state((1,))
+    assert state.infoset(0) == ((0,), (1,), ("k", "k", "/"))
+    state = state.next_state("r5").next_state("c")
+    assert state.check_if_terminal()
+    assert state.payoff(0) == 5 and state.payoff(1) == -5
+
+    random.seed(0)
+    kuhn = KuhnGame()
+    solver = PluribusDCFR(players=[0, 1])
+    solver.root = ToyState.root(kuhn)
+    strategy = tabular_strategy(kuhn, solver.compute_blueprint_strategy(1000))
+    assert exploitability(kuhn, strategy) < 0.15
+
+
+def test_training_telemetry():
+    game = KuhnGame()
+    strategies = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "telemetry.jsonl")
+        for telemetry in (None, Telemetry(path, every=10)):
+            random.seed(0)
+            solver = PluribusDCFR(players=[0, 1], telemetry=telemetry)
+            solver.root = ToyState.root(game)
+            strategies.append(solver.compute_blueprint_strategy(25))
+        telemetry.close()
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+    # Instrumentation does not change training, and is removed afterwards
+    assert strategies[0] == strategies[1]
+    assert "current_strategy" not in vars(solver.storage)
+    assert [r["iteration"] for r in records] == [10, 20]
+    record = records[-1]
+    assert record["infosets"] == 12
+    assert record["nodes_per_iteration"] > 0
+    assert record["terminal_evaluations"] > 0
+    sections = ("chance_sampling", "infoset_keying", "regret_matching", "next_state")
+    for section in sections:
+        assert record["seconds"][section] > 0
+
+
+def test_reservoir_buffer_is_bounded():
+    with tempfile.TemporaryDirectory() as directory:
+        buffer = ReservoirBuffer(directory, 10, 3, 2, seed=0)
+        for i in range(100):
+            buffer.add(np.full(3, i), np.array([i, np.nan]), weight=i)
+        assert len(buffer) == 10 and buffer.seen == 100
+        assert isinstance(buffer.features, np.memmap)
+        # Later examples displace earlier ones uniformly
+        assert buffer.weights.max() >= 50
+        features, targets, masks, weights = buffer.sample(4)
+        assert features.shape == (4, 3)
+        assert masks[:, 0].all() and not masks[:, 1].any()
+        assert (targets[:, 0] == weights).all()
+
+
+def test_deep_cfr_kuhn():
+    random.seed(0)
+    game = KuhnGame()
+    with tempfile.TemporaryDirectory() as directory:
+        solver = DeepCFR([0, 1], directory, 2, traversals=50, seed=0)
+        solver.root = ToyState.root(game)
+        strategy = solver.compute_blueprint_strategy(8)
+        assert len(solver.strategy_buffer) > 0
+        assert exploitability(game, state_strategy(game, strategy)) < 0.2
+
+
+def test_vr_mccfr_baseline():
+    baseline = RunningBaseline(decay=1.0)
+    baseline.update("I", "k", 1.0)
+    baseline.update("I", "r", 3.0)
+    # With exact baselines the estimate is the expectation whatever is sampled
+    for chosen, value in ((0, 1.0), (1, 3.0)):
+        frame = SampledFrame("I", ["k", "r"], [0.5, 0.5], chosen)
+        assert frame.corrected_value(baseline, value) == 2.0
+
+    random.seed(0)
+    game = KuhnGame()
+    solver = PluribusDCFR(players=[0, 1], baseline=RunningBaseline())
+    solver.root = ToyState.root(game)
+    strategy = tabular_strategy(game, solver.compute_blueprint_strategy(1000))
+    assert len(solver.baseline) > 0
+    assert exploitability(game, strategy) < 0.1
+
+    class Dealt(ToyState):
+        """
+        Leduc with the hands and board fixed, so only sampled actions add noise.
+        """
+
+        __slots__ = ()
+
+        def sample_action(self):
+            return ((1,), (3,)) if self.node is None else (4,)
+
+        def next_state(self, action):
+            state = super().next_state(action)
+            return Dealt(state.game, state.node, state.hands, state.board)
+
+    # Root value estimates on the same seeds, without and with the baseline
+    game = LeducGame()
+    variances = []
+    for baseline in (lambda: None, RunningBaseline):
+        total = 0.0
+        for seed in range(5):
+            random.seed(seed)
+            solver = PluribusDCFR(players=[0, 1], baseline=baseline())
+            solver.root = ToyState.root(game)
+            solver.compute_blueprint_strategy(200)
+            values = [
+                solver.dcfr_traversal(Dealt(game, None), 0, 1.0, 1.0)
+                for _ in range(200)
+            ]
+            total += np.var(values)
+        variances.append(total)
+    assert variances[1] < 0.5 * variances[0]
+
+
+def test_sampled_regrets_are_unweighted():
+    # Opponent actions are sampled on policy, so a sampled regret weighted by
+    # reach_opp again is biased: both trainers then stay above 0.045 on Kuhn
+    # after 4000 iterations
+    game = KuhnGame()
+    for seed in (0, 1):
+        random.seed(seed)
+        solver = PluribusDCFR(players=[0, 1])
+        solver.root = ToyState.root(game)
+        strategy = tabular_strategy(game, solver.compute_blueprint_strategy(4000))
+        assert exploitability(game, strategy) < 0.025
+        random.seed(seed)
+        solver = ToyDCFR(game)
+        strategy = tabular_strategy(game, solver.compute_blueprint_strategy(4000))
+        assert exploitability(game, strategy) < 0.025
+
+
+def test_warm_start_from_coarse_buckets():
+    game = LeducGame()
+
+    def bucket(key):
+        # Jacks and queens share a bucket before the board is dealt
+        hand, board, history = key
+        rank = hand[0] // 2
+        if board:
+            return "paired" if board[0] // 2 == rank else rank, history
+        return min(rank, 1), history
+
+    class BucketedState(ToyState):
+        __slots__ = ()
+
+        def infoset(self, player):
+            return bucket(super().infoset(player))
+
+        def next_state(self, action):
+            state = super().next_state(action)
+            return BucketedState(state.game, state.node, state.hands, state.board)
+
+    random.seed(0)
+    coarse = PluribusDCFR(players=[0, 1])
+    coarse.root = BucketedState(game, None)
+    coarse.compute_blueprint_strategy(2000)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        coarse.save_checkpoint(directory)
+        for warm in (False, True):
+            random.seed(1)
+            fine = PluribusDCFR(players=[0, 1])
+            fine.root = ToyState.root(game)
+            if warm:
+                fine.warm_start(directory, bucket)
+                assert fine.iteration == 2000
+            strategy = fine.compute_blueprint_strategy(fine.iteration + 200)
+            results.append(exploitability(game, tabular_strategy(game, strategy)))
+            del fine
+    cold, warm = results
+    assert warm < 0.6 * cold
+
+
+def test_subgame_search_meets_deadline():
+    game = KuhnGame()
+
+    def uniform(node, board):
+        return np.full((game.num_hands, len(node.actions)), 1.0 / len(node.actions))
+
+    solver = SubgameSolver(game, uniform, seed=0)
+    start = time.perf_counter()
+    distribution = solver.action_distribution((), (), (1,), start + 0.2)
+    assert time.perf_counter() - start < 0.25
+    assert solver.iteration > 0
+    # A queen never opens with a bet at equilibrium
+    assert distribution["k"] > 0.95
+    assert np.isclose(sum(distribution.values()), 1.0)
+
+    # Leduc flop subgames with continuation strategies at the leaves
+    game = LeducGame()
+    blueprint = VectorCFR(game, seed=0).compute_blueprint_strategy(20)
+    solver = SubgameSolver(game, blueprint, continuation_strategies(blueprint), seed=0)
+    for history, board in ((("k",), ()), (("r3", "c", "/"), (2,))):
+        start = time.perf_counter()
+        strategy = solver.solve(history, board, start + 0.2)
+        assert time.perf_counter() - start < 0.25
+        assert np.allclose(strategy.sum(axis=1), 1.0)
+    try:
+        solver.solve(("k", "k", "/"), (), time.perf_counter() + 0.1)
+        assert False, "the flop needs its board card"
+    except ValueError:
+        pass
+
+
+def test_subgame_cache_reuses_isomorphic_spots():
+    game = LeducGame()
+    blueprint = VectorCFR(game, seed=0).compute_blueprint_strategy(20)
+    cache = SubgameCache(capacity=2)
+    solver = SubgameSolver(game, blueprint, seed=0, cache=cache)
+    history = ("r3", "c", "/")
+    solved = solver.solve(history, (2,), time.perf_counter() + 0.1)
+    # Board 3 is board 2 with the suits swapped, and so are the hands
+    start = time.perf_counter()
+    reused = solver.solve(history, (3,), start + 1.0)
+    assert time.perf_counter() - start < 0.1
+    assert (cache.hits, cache.misses) == (1, 1)
+    swapped = [game.hand_index[(card ^ 1,)] for card in range(game.num_cards)]
+    assert np.allclose(reused[swapped], solved)
+
+    solver.solve(("k", "k", "/"), (2,), time.perf_counter() + 0.05)
+    solver.solve(("k", "r3", "c", "/"), (2,), time.perf_counter() + 0.05)
+    assert len(cache) == 2 and cache.misses == 3
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "subgames.npz")
+        cache.save(path)
+        loaded = SubgameCache(path=path)
+        assert list(loaded.entries) == list(cache.entries)
+        for key, strategy in cache.entries.items():
+            assert np.array_equal(loaded.get(key), strategy)
+
+
+def test_time_bank_schedules_within_the_bank():
+    bank = TimeBank(total=50.0, num_hands=200)
+    assert spot_difficulty([1.0, 0.0, 0.0]) == 0.0
+    assert np.isclose(spot_difficulty([0.5, 0.5]), 1.0)
+    # Clear-cut spots come from lookup
+    assert bank.budget(0, 3, difficulty=0.0) == 0.0
+    for hand_number in range(200):
+        bank.start_hand(hand_number)
+        for street in range(hand_number % 4 + 1):
+            budget = bank.budget(street, 4 * (street + 1))
+            assert budget <= bank.max_budget
+            bank.charge(budget)
+    assert bank.used <= bank.total
+    # Most of the bank is actually spent
+    assert bank.used > 0.5 * bank.total
+
+    game = LeducGame()
+    blueprint = VectorCFR(game, seed=0).compute_blueprint_strategy(20)
+    solver = SubgameSolver(game, blueprint, seed=0)
+    bank = TimeBank(total=2.0, num_hands=10, street_weights=(1.0, 1.0))
+    agent = PluribusAgent(game, blueprint, solver, bank, seed=0)
+    agent.start_hand(0)
+    start = time.perf_counter()
+    distribution = agent.policy(("r3", "c", "/"), (2,), (3,))
+    assert time.perf_counter() - start < 0.5
+    assert solver.iteration > 0
+    assert np.isclose(sum(distribution.values()), 1.0)
+    # The blueprint is nearly certain with this hand, so it is not searched
+    node = game.locate(("r3", "c", "/"))
+    distribution = agent.policy(("r3", "c", "/"), (2,), (1,))
+    assert np.allclose(list(distribution.values()), blueprint(node, (2,))[1])
+    assert agent.act(("r3", "c", "/"), (2,), (3,)) in distribution
+    assert bank.used < bank.total
+
+
+def test_pondering_warms_the_next_decision():
+    game = LeducGame()
+    blueprint = VectorCFR(game, seed=0).compute_blueprint_strategy(20)
+    solver = SubgameSolver(game, blueprint, seed=0)
+    agent = PluribusAgent(game, blueprint, solver, ponder_seconds=0.1, seed=0)
+    # The opponent acts after our check; a check ends the round, a raise does not
+    spots = agent.likely_spots(("k",), ())
+    assert ("k", "r3") in spots and ("k", "k") not in spots
+    agent.ponder(("k",), ())
+    agent.pondering.join()
+    assert len(solver.cache) == len(spots)
+
+    agent.bank = TimeBank(total=100.0, num_hands=10)
+    start = time.perf_counter()
+    distribution = agent.policy(("k", "r3"), (), (2,))
+    assert time.perf_counter() - start < 0.05
+    assert solver.cache.hits == 1
+    assert np.isclose(sum(distribution.values()), 1.0)
+
+    # A decision cancels pondering in progress, which caches nothing
+    agent.ponder_seconds = 10.0
+    solver.cache.entries.clear()
+    agent.ponder(("k",), ())
+    time.sleep(0.05)
+    agent.stop_pondering()
+    assert agent.pondering is None and len(solver.cache) == 0
+
+
+def test_agent_server_offloads_search_to_workers():
+    game = LeducGame()
+    trainer = VectorCFR(game, seed=0)
+    trainer.compute_blueprint_strategy(20)
+    directory = tempfile.mkdtemp()
+    path = write_vector_blueprint(os.path.join(directory, "blueprint"), trainer)
+    # A rewrite is a new version, with its own index; the one in use stays
+    first = VectorBlueprint(path, game)
+    write_vector_blueprint(path, trainer)
+    latest = VectorBlueprint(path, game)
+    assert latest.path != first.path and os.path.isdir(first.path)
+    assert np.array_equal(latest.probs, first.probs)
+
+    def factory():
+        blueprint = VectorBlueprint(path, game)
+        solver = SubgameSolver(game, blueprint, seed=0)
+        bank = TimeBank(total=20.0, num_hands=10, street_weights=(1.0, 1.0))
+        return PluribusAgent(game, blueprint, solver, bank, ponder_seconds=0.2)
+
+    server = AgentServer(factory, workers=2)
+    try:
+        assert len(server.warm()) == 2
+
+        async def play():
+            # The event loop keeps serving while a worker searches
+            task = asyncio.ensure_future(server.decide(("r3", "c", "/"), (2,), (3,)))
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            assert time.perf_counter() - start < 0.1
+            distribution = await task
+            assert np.isclose(sum(distribution.values()), 1.0)
+            # The searched strategy arrived in time and was played
+            (canonical,) = server.cache.entries.values()
+            assert np.allclose(list(distribution.values()), canonical[3])
+
+            server.ponder(("k",), ())
+            assert ("k", "r3") in [key[1] for key in server.inflight]
+            await asyncio.gather(*server.inflight.values())
+            hits = server.cache.hits
+            await server.decide(("k", "r3"), (), (3,))
+            assert server.cache.hits == hits + 1
+
+            # A real raise the abstraction only approximates gives another pot
+            # bucket; the pondered search of the abstract spot still answers it
+            server.cache = SubgameCache()
+            server.ponder(("k",), ())
+            pondered = set(server.inflight)
+            node = server.agent.game.locate(("k", "r3"))
+            pot = 2 * sum(node.bets) + 1
+            assert public_state_key(server.agent.game, node, (), pot)[0] not in pondered
+            await server.decide(("k", "r3"), (), (3,), pot)
+            await asyncio.gather(*server.inflight.values())
+            assert set(server.cache.entries) == pondered
+
+        asyncio.run(play())
+    finally:
+        server.close()
+
+
+def test_cold_start_maps_prebuilt_artifacts():
+    # Importing the bot entry point or the abstraction code neither loads
+    # NumPy nor configures logging
+    check = (
+        "import logging, sys; import bot, utils.infor_abstraction; "
+        "assert 'server' not in sys.modules and not logging.getLogger().handlers"
+    )
+    subprocess.run([sys.executable, "-c", check], check=True)
+
+    startup = Startup()
+    with startup.phase("imports"):
+        pass
+    report = startup.report()
+    assert report["total"] >= report["imports"] >= 0.0
+    assert process_age() is not None
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = ArtifactStore(directory)
+        try:
+            store.array("ranks.npy")
+            assert False, "missing artifacts are not computed on load"
+        except FileNotFoundError:
+            pass
+        store.build_array("ranks.npy", lambda: np.arange(10, dtype=np.int16))
+        ranks = store.array("ranks.npy")
+        assert not ranks.flags.writeable and ranks[9] == 9
+
+        build_artifacts(directory, iterations=1, equity=False)
+        agent = build_agent(directory, directory)
+        distribution, budget = agent.plan((), (), (0, 1))
+        assert np.isclose(sum(distribution.values()), 1.0)
+
+
+def test_shared_tables_attach_one_current_copy():
+    def rebuild():
+        raise AssertionError("a published segment is attached, not rebuilt")
+
+    with tempfile.TemporaryDirectory() as directory:
+        shared = os.path.join(directory, "shm")
+        os.makedirs(shared)
+        store = ArtifactStore(directory, shared)
+        store.build_array("ranks.npy", lambda: np.arange(10, dtype=np.int16))
+        ranks = store.tables(["ranks.npy"], "eval")["ranks.npy"]
+        assert not ranks.flags.writeable and ranks[9] == 9
+        (segment,) = glob.glob(os.path.join(shared, "*.seg"))
+        name = os.path.basename(segment).rsplit("-", 1)[0]
+        digest = fingerprint("", [store.path("ranks.npy")])
+        tables = attach(name, digest, rebuild, shared)
+        assert tables["ranks.npy"][3] == 3
+
+        # Rebuilt artifacts never attach the old segment, which is removed
+        os.remove(store.path("ranks.npy"))
+        store.build_array("ranks.npy", lambda: np.arange(20, dtype=np.int16))
+        later = time.time() + 10
+        os.utime(store.path("ranks.npy"), (later, later))
+        assert len(store.tables(["ranks.npy"], "eval")["ranks.npy"]) == 20
+        assert glob.glob(os.path.join(shared, "*.seg")) != [segment]
+        assert ranks[9] == 9
+        try:
+            SharedTables(segment, digest)
+            assert False, "stale segments are removed"
+        except FileNotFoundError:
+            pass
+        stale = write_segment(os.path.join(shared, "old.seg"), {"x": ranks}, digest)
+        try:
+            SharedTables(stale, fingerprint("", [store.path("ranks.npy")]))
+            assert False, "stale segments are never attached"
+        except ValueError:
+            pass
+
+
+def test_env_bridge_tracks_engine_observations():
+    bridge = EnvBridge(ShortDeckGame())
+
+    def observation(my_bet, opp_bet, street=0, board=(), valid=(1, 1, 0, 1, 1)):
+        community = list(board) + [-1] * (5 - len(board))
+        return {
+            "street": street,
+            "my_cards": [9, 0],
+            "community_cards": community,
+            "my_bet": my_bet,
+            "opp_bet": opp_bet,
+            "opp_discarded_card": -1,
+            "opp_drawn_card": -1,
+            "min_raise": 2,
+            "max_raise": 100 - max(my_bet, opp_bet),
+            "valid_actions": list(valid),
+        }
+
+    # We are the small blind and raise the pot
+    history, board, hand, pot, stack = bridge.spot(observation(1, 2))
+    assert (history, board, hand, pot, stack) == ((), (), (0, 9), 3, 98)
+    assert bridge.action(observation(1, 2), "r6") == (RAISE_ACTION, 4, -1)
+    assert bridge.opponent_spot(observation(6, 2)) == (("r6",), ())
+    # The opponent calls, then bets 14 into 12 after our check
+    flop = (26, 3, 12)
+    checked = observation(6, 6, 1, flop, valid=(1, 1, 1, 0, 1))
+    assert bridge.spot(checked)[:2] == (("r6", "c", "/"), (3, 12, 26))
+    assert bridge.action(checked, "f") == (CHECK_ACTION, 0, -1)
+    assert bridge.opponent_spot(observation(6, 6, 1, flop))[0][-1] == "k"
+    history, _, _, pot, stack = bridge.spot(observation(6, 20, 1, flop))
+    assert history == ("r6", "c", "/", "k", "r18") and (pot, stack) == (26, 80)
+    (node_id, key_board), row = bridge.infoset_key(observation(6, 20, 1, flop))
+    assert node_id == bridge.game.locate(history).id and key_board == (3, 12, 26)
+    assert bridge.game.hands[row] == (0, 9)
+
+    # Re-raises beyond the abstraction fall back to our latest spot
+    assert bridge.action(observation(6, 20, 1, flop), "r54") == (RAISE_ACTION, 40, -1)
+    bridge.opponent_spot(observation(60, 20, 1, flop))
+    shoved = observation(60, 100, 1, flop, valid=(1, 0, 0, 1, 1))
+    assert bridge.spot(shoved)[0] == history
+    assert bridge.action(shoved, "c") == (CALL_ACTION, 0, -1)
+    runout = observation(100, 100, 2, flop + (5,), valid=(1, 0, 1, 0, 0))
+    assert bridge.spot(runout) is None
+    assert bridge.default_action(runout) == (CHECK_ACTION, 0, -1)
+
+    # A new hand as the big blind; the opponent discarded 4 and drew 13
+    opening = observation(2, 1)
+    opening.update(opp_discarded_card=4, opp_drawn_card=13)
+    assert bridge.opponent_spot(opening) == ((), ()) and bridge.position == 1
+    hands = np.array(bridge.game.hands)[bridge.opponent_range(opening)]
+    assert len(hands) == 23 and (hands == 13).any(axis=1).all()
+    assert not np.isin(hands, [0, 4, 9]).any()
+
+
+def test_short_deck_evaluator_tables():
+    evaluator = ShortDeckEvaluator()
+    rng = np.random.default_rng(0)
+    hands = np.array([rng.choice(27, 7, replace=False) for _ in range(300)])
+    ranks = evaluator.rank(hands)
+    strengths = np.array([hand_strength(list(h)) for h in hands])
+    assert ((ranks[:, None] < ranks) == (strengths[:, None] < strengths)).all()
+
+    # Equity against every compatible opponent hand, ties counting half
+    board = (0, 4, 13, 17, 26)
+    river = evaluator.hand_ranks(np.array([board]))[0]
+    equity = evaluator.equity(river[None, :])[0]
+    cards = evaluator.hand_cards
+    for h in rng.choice(len(cards), 20, replace=False):
+        if river[h] == 0:
+            assert equity[h] == 0.0
+            continue
+        rivals = [
+            o
+            for o in range(len(cards))
+            if river[o] and not set(cards[o]) & set(cards[h])
+        ]
+        wins = sum(river[o] < river[h] for o in rivals)
+        ties = sum(river[o] == river[h] for o in rivals)
+        assert np.isclose(equity[h], (wins + ties / 2) / len(rivals))
+    game = ShortDeckGame(evaluator=evaluator)
+    live = game._live(board)
+    lookup, direct = game.strengths(board, live), ShortDeckGame().strengths(board, live)
+    order = np.argsort(lookup[live], kind="stable")
+    assert (order == np.argsort(direct[live], kind="stable")).all()
+
+    # Flop entries are found through the flop's isomorphism class
+    flops, of_flop = canonical_flops(game)
+    assert len(flops) == 573 and len(of_flop) == 2925
+    flop = (5, 14, 19)
+    tables = {
+        FLOPS: flops,
+        FLOP_EQUITY: np.zeros((len(flops), game.num_hands), np.float32),
+        FLOP_BUCKETS: np.zeros((len(flops), game.num_hands), np.int16),
+    }
+    canonical = tuple(int(c) for c in flops[of_flop[flop]])
+    tables[FLOP_EQUITY][of_flop[flop]] = evaluator.runout_equity(canonical)
+    lookups = ShortDeckTables(game, evaluator, tables)
+    expected = evaluator.runout_equity(flop)
+    for hand in [(0, 9), (8, 26), (3, 12)]:
+        assert np.isclose(lookups.equity(hand, flop), expected[game.hand_index[hand]])
+    turn = evaluator.runout_equity(flop + (7,))[game.hand_index[(0, 9)]]
+    # Averaged over the rivers that miss the hand
+    rivers = np.array([flop + (7, c) for c in range(27) if c not in flop + (7, 0, 9)])
+    by_river = evaluator.equity(evaluator.hand_ranks(rivers))
+    assert np.isclose(turn, by_river[:, game.hand_index[(0, 9)]].mean())
+    assert np.isclose(lookups.equity((0, 9), flop + (7,)), turn)
+    buckets = equity_buckets(expected, expected > 0, 4)
+    assert (np.bincount(buckets[expected > 0]) >= 60).all()
+    assert (buckets[expected == 0] == -1).all()
+
+
+def test_discard_solver_enumerates_draws():
+    evaluator = ShortDeckEvaluator()
+    solver = DiscardSolver(evaluator)
+    cards = evaluator.hand_cards
+    hand, turn, dead, held = (3, 12), (0, 10, 20, 5), (7,), (8,)
+
+    def equity(ours, runout):
+        # Showdown score of ours against every possible opponent hand
+        ranks = evaluator.hand_ranks(np.array([turn + runout]))[0]
+        out = set(hand) | set(ours) | set(dead)
+        rivals = [
+            o
+            for o in range(len(cards))
+            if ranks[o] and not out & set(cards[o]) and held[0] in cards[o]
+        ]
+        mine = ranks[solver.pair_index[ours]]
+        return np.mean([(ranks[o] < mine) + (ranks[o] == mine) / 2 for o in rivals])
+
+    deck = [c for c in range(27) if c not in hand + turn + dead + held]
+    expected = [np.mean([equity(hand, (r,)) for r in deck])]
+    for i in range(2):
+        draws = [(hand[1 - i], d, r) for d in deck for r in deck if r != d]
+        expected.append(np.mean([equity(k[:2], k[2:]) for k in draws]))
+    result = solver.equities(hand, turn, dead=dead, held=held)
+    assert np.allclose(result, expected)
+    best = int(np.argmax(result[1:]))
+    keep = result[1 + best] <= result[0] + solver.margin
+    assert solver.decide(hand, turn, dead=dead, held=held) == (-1 if keep else best)
+
+    # Keeping on the flop is the hand's runout equity; every option of the
+    # flop, all draws and runouts, is one batch of milliseconds
+    flop = (0, 10, 20)
+    start = time.perf_counter()
+    result = solver.equities(hand, flop)
+    assert time.perf_counter() - start < 0.25
+    runout = evaluator.runout_equity(flop)[solver.pair_index[hand]]
+    assert np.isclose(result[0], runout)
+
+    # Preflop options average the flop table over every flop of the deck
+    game = ShortDeckGame(evaluator=evaluator)
+    flops, _ = canonical_flops(game)
+    rng = np.random.default_rng(0)
+    table = rng.random((len(flops), game.num_hands)).astype(np.float32)
+    lookups = ShortDeckTables(game, evaluator, {FLOPS: flops, FLOP_EQUITY: table})
+    solver = DiscardSolver(evaluator, lookups)
+    deck = [c for c in range(27) if c not in (26, 1, 7)]
+    keep = np.mean([lookups.equity((1, 26), f) for f in combinations(deck, 3)])
+    assert np.isclose(solver.equities((26, 1), dead=(7,))[0], keep)
+
+    # The bridge asks the solver only while discarding is legal
+    bridge = EnvBridge(game, solver)
+    observation = {
+        "my_cards": [26, 1],
+        "community_cards": [-1] * 5,
+        "opp_discarded_card": 7,
+        "opp_drawn_card": -1,
+        "valid_actions": [1, 1, 0, 1, 1],
+    }
+    card = solver.decide((26, 1), dead=(7,))
+    action = bridge.discard_action(observation)
+    assert action == (None if card < 0 else (DISCARD_ACTION, 0, card))
+    observation["valid_actions"][DISCARD_ACTION] = 0
+    assert bridge.discard_action(observation) is None
+
+
 if __name__ == "__main__":
     test_player_initialization()
     test_player_betting()
@@ -775,3 +1826,34 @@ if __name__ == "__main__":
     test_game_tree_get_action_from_player()
     test_game_tree_next_node()
     test_game_tree_checkout()
+    test_negative_regret_pruning()
+    test_traversal_survives_deep_raise_chains()
+    test_dcfr_strategy_cache()
+    test_regret_storage_int32_saturates_at_floor()
+    test_regret_storage_int32_discount_keeps_cached_strategies()
+    test_regret_storage_uint16_average_rescales()
+    test_regret_storage_save_load()
+    test_out_of_core_storage_matches_in_memory()
+    test_out_of_core_index_stays_on_disk()
+    test_blueprint_export_and_lookup()
+    test_blueprint_compaction_falls_back_to_parent()
+    test_short_deck_hand_strength()
+    test_vector_cfr_short_deck_iteration()
+    test_exploitability_kuhn()
+    test_toy_games_node_interface()
+    test_training_telemetry()
+    test_reservoir_buffer_is_bounded()
+    test_deep_cfr_kuhn()
+    test_vr_mccfr_baseline()
+    test_sampled_regrets_are_unweighted()
+    test_warm_start_from_coarse_buckets()
+    test_subgame_search_meets_deadline()
+    test_subgame_cache_reuses_isomorphic_spots()
+    test_time_bank_schedules_within_the_bank()
+    test_pondering_warms_the_next_decision()
+    test_agent_server_offloads_search_to_workers()
+    test_cold_start_maps_prebuilt_artifacts()
+    test_shared_tables_attach_one_current_copy()
+    test_env_bridge_tracks_engine_observations()
+    test_short_deck_evaluator_tables()
+    test_discard_solver_enumerates_draws()
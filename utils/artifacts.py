@@ -0,0 +1,105 @@
+import hashlib
+import os
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+from utils.blueprint import VECTOR_PROBS, VectorBlueprint, vector_blueprint_version
+from utils.shared_tables import attach, fingerprint
+from utils.subgame_cache import SubgameCache
+
+BLUEPRINT = "blueprint"
+SUBGAME_CACHE = "subgames.npz"
+
+
+class ArtifactStore:
+    """
+    Directory of files built ahead of time (blueprint, evaluator and bucket
+    tables, solved subgames) that a bot maps read-only when it starts rather
+    than computing them. Mapped files are paged in on first touch and shared
+    by every process that maps them.
+    - directory: where the artifacts live
+    - shared_directory: where tables are published as shared segments for
+      every process of the host (see utils.shared_tables), or None to map the
+      artifact files themselves
+    """
+
+    def __init__(self, directory: str, shared_directory: Optional[str] = None):
+        self.directory = directory
+        self.shared_directory = shared_directory
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def array(self, name: str) -> np.ndarray:
+        """
+        Read-only memory map of the .npy artifact name.
+        :raises FileNotFoundError: If it was not built.
+        """
+        path = self.path(name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Artifact {path} is missing; build it first")
+        return np.load(path, mmap_mode="r")
+
+    def build_array(self, name: str, build: Callable[[], np.ndarray]) -> str:
+        """
+        Write the .npy artifact name from build() unless it exists; the file
+        only appears once complete.
+        :return: Its path.
+        """
+        path = self.path(name)
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                np.save(f, build())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+        return path
+
+    def tables(
+        self, names: Sequence[str], segment: str, version: str = ""
+    ) -> Dict[str, np.ndarray]:
+        """
+        Read-only arrays of the .npy artifacts names. With a shared directory
+        they are copied once per host into the shared segment segment, which
+        every later caller attaches; the segment is rebuilt whenever one of
+        the files or version changes.
+        :param version: Anything else the tables depend on.
+        :raises FileNotFoundError: If one was not built.
+        """
+        if self.shared_directory is None:
+            return {name: self.array(name) for name in names}
+        paths = [self.path(name) for name in names]
+        for path in paths:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Artifact {path} is missing; build it first")
+        # Stores in different directories must not replace each other's segments
+        store = hashlib.sha256(os.path.realpath(self.directory).encode())
+        segment = f"{segment}-{store.hexdigest()[:8]}"
+        shared = attach(
+            segment,
+            fingerprint(version, paths),
+            lambda: {name: self.array(name) for name in names},
+            self.shared_directory,
+        )
+        return {name: shared[name] for name in names}
+
+    def blueprint(self, game, board_abstraction=None) -> VectorBlueprint:
+        """
+        The mapped blueprint, written by write_vector_blueprint to BLUEPRINT.
+        """
+        version = vector_blueprint_version(self.path(BLUEPRINT))
+        probs = os.path.relpath(os.path.join(version, VECTOR_PROBS), self.directory)
+        return VectorBlueprint(
+            version, game, board_abstraction, self.tables([probs], "blueprint")[probs]
+        )
+
+    def subgame_cache(self, capacity: int = 10_000) -> SubgameCache:
+        """
+        The subgame cache persisted in the store, empty if none was saved.
+        """
+        return SubgameCache(capacity, self.path(SUBGAME_CACHE))
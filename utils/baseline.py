@@ -0,0 +1,69 @@
+from typing import Callable, Dict, Hashable, Optional
+
+
+class RunningBaseline:
+    """
+    Baseline values for variance-reduced MCCFR (Schmid et al. 2019): the
+    expected value of taking each action at an infoset, tracked as an
+    exponential running average of the values traversals observed.
+    Subtracting it from sampled values keeps the estimates unbiased while
+    removing most of the noise of the sampled actions.
+    - decay: weight of a new observation in the running average
+    - prior: initial value of unseen (key, action) pairs, e.g. from hand strength
+    """
+
+    def __init__(
+        self,
+        decay: float = 0.5,
+        prior: Optional[Callable[[Hashable, Hashable], float]] = None,
+    ):
+        self.decay = decay
+        self.prior = prior
+        self.values: Dict[tuple, float] = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def value(self, key: Hashable, action: Hashable) -> float:
+        value = self.values.get((key, action))
+        if value is None:
+            return self.prior(key, action) if self.prior is not None else 0.0
+        return value
+
+    def update(self, key: Hashable, action: Hashable, value: float):
+        old = self.value(key, action)
+        self.values[(key, action)] = old + self.decay * (value - old)
+
+
+class SampledFrame:
+    """
+    An opponent node whose action was sampled, kept on the traversal stack
+    so the value passing back through it can be corrected with the baseline.
+    - key: baseline key of the node, from the traverser's point of view
+    - actions: the actions of the node
+    - strategy: the sampling probabilities, aligned with actions
+    - chosen: index of the sampled action
+    """
+
+    __slots__ = ("key", "actions", "strategy", "chosen")
+
+    def __init__(self, key, actions, strategy, chosen):
+        self.key = key
+        self.actions = actions
+        self.strategy = strategy
+        self.chosen = chosen
+
+    def corrected_value(self, baseline: RunningBaseline, value: float) -> float:
+        """
+        Control-variate estimate of the node's value from the sampled action's
+        value: E_sigma[b] + (v - b(chosen)). Since actions are sampled from
+        the strategy itself, no importance weight is needed. The baseline is
+        then moved toward v.
+        """
+        expected = 0.0
+        for a, prob in zip(self.actions, self.strategy):
+            expected += prob * baseline.value(self.key, a)
+        action = self.actions[self.chosen]
+        corrected = expected + value - baseline.value(self.key, action)
+        baseline.update(self.key, action, value)
+        return corrected
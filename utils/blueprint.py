@@ -0,0 +1,435 @@
+import numpy as np
+import mmap
+import os
+import pickle
+import struct
+from functools import partial
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from utils.checkpoint import latest_checkpoint, list_checkpoints, write_checkpoint
+from utils.regret_storage import RegretStorage, stable_hash
+
+
+BLUEPRINT_MAGIC = b"PLBLUEPR"
+BLUEPRINT_VERSION = 1
+
+# magic, version, reserved, then infoset and entry counts, hash table size,
+# and the byte offset of every section (the menu table also records its length)
+HEADER = struct.Struct("<8sII11Q")
+
+# Probabilities are stored as uint8 numerators over this denominator
+PROBABILITY_SCALE = 255
+
+# Files of each version of a vector blueprint
+VECTOR_PROBS = "probs.npy"
+VECTOR_INDEX = "index"
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _slot_hash(h: int) -> int:
+    # Hash 0 marks an empty slot
+    return h if h != 0 else 1
+
+
+def quantize_probabilities(average: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """
+    Normalize consecutive rows of average-strategy mass and round them to uint8
+    numerators that sum to exactly PROBABILITY_SCALE per row (largest remainder).
+    Rows without mass become uniform.
+    :param average: Average-strategy mass of the rows, concatenated.
+    :param sizes: Number of actions of each row.
+    """
+    sizes = sizes.astype(np.int64)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    rows = np.repeat(np.arange(len(sizes)), sizes)
+    mass = average.astype(np.float64)
+    totals = np.add.reduceat(mass, starts)
+    empty = totals <= 0
+    probs = np.where(
+        empty[rows], 1.0 / sizes[rows], mass / np.where(empty, 1.0, totals)[rows]
+    )
+    scaled = probs * PROBABILITY_SCALE
+    units = np.floor(scaled).astype(np.int64)
+    missing = PROBABILITY_SCALE - np.add.reduceat(units, starts)
+    # Within each row, hand the missing units to the largest remainders
+    order = np.lexsort((units - scaled, rows))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order)) - starts[rows[order]]
+    units += rank < missing[rows]
+    return units.astype(np.uint8)
+
+
+def _chunks(storage: RegretStorage, chunk_infosets: int):
+    """
+    Yield (start, stop, average mass of the rows) over consecutive row ranges.
+    """
+    for start in range(0, storage.num_infosets, chunk_infosets):
+        stop = min(start + chunk_infosets, storage.num_infosets)
+        first = int(storage.offsets[start])
+        last = int(storage.offsets[stop - 1]) + int(storage.sizes[stop - 1])
+        yield start, stop, storage.average[first:last]
+
+
+def compaction_mask(
+    storage: RegretStorage,
+    min_reach: float = 0.0,
+    uniform_tolerance: Optional[float] = None,
+    chunk_infosets: int = 1 << 16,
+) -> np.ndarray:
+    """
+    Choose the infosets worth exporting. The average-strategy mass of a row is the
+    discounted sum of its owner's reach, so rows with little mass were rarely
+    reached; rows whose average is close to uniform add nothing over the
+    fallback policy of the reader.
+    :param min_reach: Drop rows whose mass is below this fraction of the largest row mass.
+    :param uniform_tolerance: Drop rows whose probabilities are all within this of uniform.
+    :return: Boolean mask over the infosets of storage.
+    """
+    storage.flush()
+    n = storage.num_infosets
+    keep = np.ones(n, dtype=np.bool_)
+    totals = np.zeros(n, dtype=np.float64)
+    for start, stop, average in _chunks(storage, chunk_infosets):
+        sizes = storage.sizes[start:stop].astype(np.int64)
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        mass = average.astype(np.float64)
+        totals[start:stop] = np.add.reduceat(mass, starts)
+        if uniform_tolerance is not None:
+            rows = np.repeat(np.arange(stop - start), sizes)
+            total = np.where(totals[start:stop] > 0, totals[start:stop], 1.0)
+            deviation = np.abs(mass / total[rows] - 1.0 / sizes[rows])
+            # Rows without mass count as uniform
+            deviation[totals[start:stop][rows] <= 0] = 0.0
+            largest = np.maximum.reduceat(deviation, starts)
+            keep[start:stop] &= largest > uniform_tolerance
+    if n and min_reach > 0:
+        keep &= totals >= min_reach * totals.max()
+    return keep
+
+
+def write_blueprint(
+    storage: RegretStorage,
+    path: str,
+    min_reach: float = 0.0,
+    uniform_tolerance: Optional[float] = None,
+    chunk_infosets: int = 1 << 16,
+):
+    """
+    Export the average strategy of the infosets in storage to a compact binary
+    blueprint: an open-addressing hash table over stable key hashes, uint8 action
+    probabilities and the shared action-menu table. Infosets dropped by
+    compaction_mask are answered by the reader's fallback. The file is written
+    to a temporary name and renamed into place.
+    """
+    keep = compaction_mask(storage, min_reach, uniform_tolerance, chunk_infosets)
+    rows = np.flatnonzero(keep)
+    n = len(rows)
+    sizes = storage.sizes[rows].astype(np.int64)
+    entries = int(sizes.sum())
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+    hashes = storage.hashes[rows].astype(np.uint64)
+    hashes[hashes == 0] = 1
+    if len(np.unique(hashes)) != n:
+        raise ValueError("Infoset key hashes collide; cannot export blueprint")
+
+    # Linear-probing table at most half full
+    table_size = 1
+    while table_size < 2 * n:
+        table_size *= 2
+    mask = table_size - 1
+    slots = np.zeros(table_size, dtype=np.uint64)
+    slot_rows = np.zeros(table_size, dtype=np.uint32)
+    # Insert in rounds: every pending row probes its next slot and the first
+    # claimant of each free slot takes it
+    pending = np.arange(n)
+    probe = hashes & np.uint64(mask)
+    while len(pending):
+        wanted = probe[pending]
+        free = slots[wanted] == 0
+        claimed, first = np.unique(wanted[free], return_index=True)
+        winners = pending[free][first]
+        slots[claimed] = hashes[winners]
+        slot_rows[claimed] = winners
+        placed = np.zeros(len(pending), dtype=np.bool_)
+        placed[np.flatnonzero(free)[first]] = True
+        pending = pending[~placed]
+        probe[pending] = (probe[pending] + np.uint64(1)) & np.uint64(mask)
+
+    menus = pickle.dumps(storage.menus, protocol=pickle.HIGHEST_PROTOCOL)
+    sections = [
+        ("slots", table_size * 8),
+        ("slot_rows", table_size * 4),
+        ("offsets", n * 8),
+        ("sizes", n),
+        ("menu_ids", n * 4),
+        ("probs", entries),
+        ("menus", len(menus)),
+    ]
+    at = {}
+    position = HEADER.size
+    for name, size in sections:
+        position = _align(position)
+        at[name] = position
+        position += size
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(
+            HEADER.pack(
+                BLUEPRINT_MAGIC,
+                BLUEPRINT_VERSION,
+                0,
+                n,
+                entries,
+                table_size,
+                *(at[name] for name, _ in sections),
+                len(menus),
+            )
+        )
+
+        def section(name, data: bytes):
+            f.write(b"\0" * (at[name] - f.tell()))
+            f.write(data)
+
+        section("slots", slots.astype("<u8").tobytes())
+        section("slot_rows", slot_rows.astype("<u4").tobytes())
+        section("offsets", offsets.astype("<u8").tobytes())
+        section("sizes", sizes.astype(np.uint8).tobytes())
+        section("menu_ids", storage.menu_ids[rows].astype("<u4").tobytes())
+        section("probs", b"")
+        for start, stop, average in _chunks(storage, chunk_infosets):
+            chunk_keep = keep[start:stop]
+            probs = quantize_probabilities(average, storage.sizes[start:stop])
+            f.write(probs[np.repeat(chunk_keep, storage.sizes[start:stop])].tobytes())
+        section("menus", menus)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class BlueprintReader:
+    """
+    Memory-mapped view of a blueprint written by write_blueprint. Opening the file
+    only reads the header and the menu table; each lookup probes the hash table
+    in place and touches a handful of pages.
+    Infosets missing from the file (never visited or compacted away) are answered
+    by their nearest exported parent with the same action menu, then by a
+    uniform policy over the actions the caller passes.
+    - num_infosets: number of infosets in the blueprint
+    - parent: maps an infoset key to a coarser key, or None at the top
+    """
+
+    def __init__(
+        self,
+        path: str,
+        parent: Optional[Callable[[Hashable], Optional[Hashable]]] = None,
+    ):
+        self.path = path
+        self.parent = parent
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            _,
+            self.num_infosets,
+            num_entries,
+            table_size,
+            slots_at,
+            slot_rows_at,
+            offsets_at,
+            sizes_at,
+            menu_ids_at,
+            probs_at,
+            menus_at,
+            menus_len,
+        ) = HEADER.unpack_from(self.buffer, 0)
+        if magic != BLUEPRINT_MAGIC:
+            raise ValueError(f"{path} is not a blueprint file")
+        if version != BLUEPRINT_VERSION:
+            raise ValueError(
+                f"Blueprint version {version} is not supported (expected {BLUEPRINT_VERSION})"
+            )
+        n = self.num_infosets
+        view = self.view = memoryview(self.buffer)
+        self.mask = table_size - 1
+        # memoryview casts index straight to Python ints, which keeps probing cheap
+        self.slots = view[slots_at : slots_at + table_size * 8].cast("Q")
+        self.slot_rows = view[slot_rows_at : slot_rows_at + table_size * 4].cast("I")
+        self.offsets = view[offsets_at : offsets_at + n * 8].cast("Q")
+        self.sizes = view[sizes_at : sizes_at + n]
+        self.menu_ids = view[menu_ids_at : menu_ids_at + n * 4].cast("I")
+        self.probs = np.frombuffer(
+            self.buffer, dtype=np.uint8, count=num_entries, offset=probs_at
+        )
+        self.menus = pickle.loads(self.buffer[menus_at : menus_at + menus_len])
+
+    def __len__(self):
+        return self.num_infosets
+
+    def __contains__(self, key):
+        return self.lookup(key) is not None
+
+    def lookup(self, key: Hashable) -> Optional[int]:
+        """
+        :return: The row of key in the blueprint, or None if it was not exported.
+        """
+        h = _slot_hash(stable_hash(key))
+        s = h & self.mask
+        while True:
+            stored = self.slots[s]
+            if stored == h:
+                return self.slot_rows[s]
+            if stored == 0:
+                return None
+            s = (s + 1) & self.mask
+
+    def probabilities(
+        self, key: Hashable, actions: Optional[list] = None
+    ) -> Optional[Tuple[list, np.ndarray]]:
+        """
+        :param actions: The legal actions at key; enables the parent and uniform
+            fallbacks. Entries stored with another menu are misses.
+        :return: The action menu of key and its probabilities, in the order of
+        actions when given, or None if key is unknown and no fallback applies.
+        """
+        while key is not None:
+            i = self.lookup(key)
+            if i is not None:
+                o = self.offsets[i]
+                probs = self.probs[o : o + self.sizes[i]] / PROBABILITY_SCALE
+                menu = list(self.menus[self.menu_ids[i]])
+                if actions is None:
+                    return menu, probs
+                # Stored entries answer only for the same actions, by label
+                if len(menu) == len(actions) and set(menu) == set(actions):
+                    return list(actions), probs[[menu.index(a) for a in actions]]
+            if actions is None or self.parent is None:
+                break
+            key = self.parent(key)
+        if actions is None:
+            return None
+        return list(actions), np.full(len(actions), 1.0 / len(actions))
+
+    def strategy(self, key: Hashable, actions: Optional[list] = None) -> Optional[Dict]:
+        """
+        :param actions: The legal actions at key; enables the parent and uniform fallbacks.
+        :return: The blueprint strategy of key as {action: probability}, like
+        compute_blueprint_strategy, or None if key is unknown.
+        """
+        found = self.probabilities(key, actions)
+        if found is None:
+            return None
+        actions, probs = found
+        return dict(zip(actions, probs.tolist()))
+
+    def close(self):
+        for name in ("slots", "slot_rows", "offsets", "sizes", "menu_ids", "view"):
+            getattr(self, name).release()
+        self.probs = None
+        self.buffer.close()
+
+
+def _write_vector_files(solver, directory: str):
+    offsets: Dict[Hashable, int] = {}
+    size = 0
+    for key, table in solver.tables.items():
+        offsets[key] = size
+        size += table.average.size
+    probs = np.lib.format.open_memmap(
+        os.path.join(directory, VECTOR_PROBS),
+        mode="w+",
+        dtype=np.float32,
+        shape=(size,),
+    )
+    for key, table in solver.tables.items():
+        totals = table.average.sum(axis=1, keepdims=True)
+        uniform = 1.0 / table.average.shape[1]
+        strategy = np.where(
+            totals > 0, table.average / np.where(totals > 0, totals, 1.0), uniform
+        )
+        probs[offsets[key] : offsets[key] + table.average.size] = strategy.ravel()
+    probs.flush()
+    del probs
+    with open(os.path.join(directory, VECTOR_INDEX), "wb") as f:
+        pickle.dump(offsets, f)
+
+
+def write_vector_blueprint(path: str, solver) -> str:
+    """
+    Export the average strategy of a VectorCFR solver for VectorBlueprint:
+    every table normalized to float32 probabilities and concatenated in
+    VECTOR_PROBS (.npy), with the offset of each table's public key pickled in
+    VECTOR_INDEX. Both files are written to a new version directory under path,
+    which a pointer then names (see utils.checkpoint), so readers always open a
+    probability file and the index written with it. The previous version is
+    kept for readers still opening it.
+    :return: path.
+    """
+    versions = list_checkpoints(path)
+    version = int(versions[-1].split("-")[1]) + 1 if versions else 0
+    write_checkpoint(path, version, partial(_write_vector_files, solver))
+    return path
+
+
+def vector_blueprint_version(path: str) -> str:
+    """
+    The version directory of the blueprint at path: path itself if it is one,
+    else the latest written there.
+    :raises FileNotFoundError: If no blueprint was written to path.
+    """
+    if os.path.exists(os.path.join(path, VECTOR_INDEX)):
+        return path
+    version = latest_checkpoint(path)
+    if version is None:
+        raise FileNotFoundError(f"No blueprint was written to {path}")
+    return version
+
+
+class VectorBlueprint:
+    """
+    Memory-mapped average strategy written by write_vector_blueprint, usable
+    wherever a (node, board) -> hands x actions strategy is expected. The
+    probabilities stay in the page cache, so processes that open the same
+    file share one physical copy. Public states without a table play uniformly.
+    - offsets: start of each public key's table in probs
+    """
+
+    def __init__(
+        self,
+        path: str,
+        game,
+        board_abstraction: Optional[Callable[[int, tuple], Hashable]] = None,
+        probs: Optional[np.ndarray] = None,
+    ):
+        """
+        :param path: Where the blueprint was written, or one of its versions
+            (see vector_blueprint_version).
+        :param board_abstraction: The one the solver was trained with.
+        :param probs: The probabilities of that version when already mapped
+            elsewhere, e.g. from a shared segment (see utils.shared_tables).
+        """
+        self.path = vector_blueprint_version(path)
+        self.game = game
+        self.board_abstraction = board_abstraction
+        if probs is None:
+            probs = np.load(os.path.join(self.path, VECTOR_PROBS), mmap_mode="r")
+        self.probs = probs
+        with open(os.path.join(self.path, VECTOR_INDEX), "rb") as f:
+            self.offsets: Dict[Hashable, int] = pickle.load(f)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __call__(self, node, board: tuple) -> np.ndarray:
+        visible = tuple(board[: self.game.revealed(node.street)])
+        if self.board_abstraction is not None:
+            visible = self.board_abstraction(node.street, visible)
+        offset = self.offsets.get((node.id, visible))
+        shape = (self.game.num_hands, len(node.actions))
+        if offset is None:
+            return np.full(shape, 1.0 / len(node.actions))
+        return self.probs[offset : offset + shape[0] * shape[1]].reshape(shape)
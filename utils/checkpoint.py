@@ -0,0 +1,83 @@
+import os
+import shutil
+from typing import Callable, List, Optional
+
+
+LATEST_FILE = "LATEST"
+
+
+def _fsync_directory(directory: str):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_checkpoint(
+    root: str, iteration: int, write: Callable[[str], None], keep: int = 2
+) -> str:
+    """
+    Atomically write a checkpoint directory under root.
+    write(directory) fills a temporary directory, which is synced and renamed to
+    ckpt-<iteration>; only then is the LATEST pointer replaced, so a crash at any
+    point leaves the previous checkpoint intact.
+    :param keep: Number of most recent checkpoints to keep.
+    :return: The path of the new checkpoint.
+    """
+    os.makedirs(root, exist_ok=True)
+    name = f"ckpt-{iteration:012d}"
+    final = os.path.join(root, name)
+    tmp = final + ".tmp"
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp)
+    os.makedirs(tmp)
+    write(tmp)
+    for file_name in os.listdir(tmp):
+        fd = os.open(os.path.join(tmp, file_name), os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    _fsync_directory(tmp)
+    if os.path.exists(final):
+        shutil.rmtree(final)
+    os.rename(tmp, final)
+
+    latest_tmp = os.path.join(root, LATEST_FILE + ".tmp")
+    with open(latest_tmp, "w") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(latest_tmp, os.path.join(root, LATEST_FILE))
+    _fsync_directory(root)
+
+    for old in list_checkpoints(root)[:-keep]:
+        shutil.rmtree(os.path.join(root, old))
+    return final
+
+
+def list_checkpoints(root: str) -> List[str]:
+    """
+    Names of the finished checkpoints under root, oldest first.
+    """
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name
+        for name in os.listdir(root)
+        if name.startswith("ckpt-") and not name.endswith(".tmp")
+    )
+
+
+def latest_checkpoint(root: str) -> Optional[str]:
+    """
+    :return: The path of the checkpoint LATEST points to, or None if there is none.
+    """
+    try:
+        with open(os.path.join(root, LATEST_FILE)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    path = os.path.join(root, name)
+    return path if os.path.isdir(path) else None
@@ -0,0 +1,169 @@
+from itertools import combinations
+from typing import Optional, Sequence
+
+import numpy as np
+
+from utils.short_deck import NUM_CARDS
+from utils.short_deck_tables import FLOP_EQUITY, ShortDeckEvaluator, ShortDeckTables
+
+
+class DiscardSolver:
+    """
+    Equity of keeping both hole cards against discarding either one for a
+    card drawn from the deck, the tournament's DISCARD action. Every option is
+    evaluated in one batch: on the flop and turn, each replacement draw,
+    every way to complete the board and every opponent hand are enumerated
+    and compared through the evaluator's rank table; preflop, the flop equity
+    table is read for every draw and flop. A decision takes milliseconds, so
+    the solver serves both as an abstraction feature (see gain()) and live.
+    - evaluator: the short-deck evaluator
+    - tables: the equity tables, needed preflop only
+    - margin: equity a discard must gain over keeping to be chosen, since
+      the engine shows the drawn card to the opponent
+    """
+
+    def __init__(
+        self,
+        evaluator: ShortDeckEvaluator,
+        tables: Optional[ShortDeckTables] = None,
+        margin: float = 0.02,
+    ):
+        self.evaluator = evaluator
+        self.tables = tables
+        self.margin = margin
+        cards = evaluator.hand_cards
+        # pair_index[a, b]: the hand holding a and b
+        self.pair_index = np.full((NUM_CARDS, NUM_CARDS), -1, dtype=np.int64)
+        self.pair_index[cards[:, 0], cards[:, 1]] = np.arange(len(cards))
+        self.pair_index[cards[:, 1], cards[:, 0]] = np.arange(len(cards))
+        self.hand_masks = (1 << cards).sum(axis=1)
+        if tables is not None:
+            game = tables.game
+            flops = list(combinations(range(NUM_CARDS), 3))
+            self.flop_masks = np.array([sum(1 << c for c in f) for f in flops])
+            # Class of every flop, and where each hand sits in its class's row
+            entries = [game.canonical_board(flop) for flop in flops]
+            self.flop_classes = np.array([tables.classes[c] for c, _ in entries])
+            maps = np.stack([mapped for _, mapped in entries])
+            first, second = maps[:, cards[:, 0]], maps[:, cards[:, 1]]
+            self.flop_hands = self.pair_index[first, second]
+
+    def supports(self, board: tuple) -> bool:
+        """
+        Whether options can be evaluated on board: preflop needs the tables.
+        """
+        return bool(board) or self.tables is not None
+
+    def _candidates(self, hand: Sequence[int], deck: np.ndarray):
+        """
+        The hands of every option and the option of each: 0 keeps hand,
+        1 + i replaces hand[i] with a card of deck.
+        """
+        options = [np.array([self.pair_index[hand[0], hand[1]]])]
+        for i in range(2):
+            options.append(self.pair_index[hand[1 - i], deck])
+        option = np.concatenate([np.full(len(o), k) for k, o in enumerate(options)])
+        return np.concatenate(options), option
+
+    def equities(
+        self,
+        hand: Sequence[int],
+        board: tuple = (),
+        dead: Sequence[int] = (),
+        held: Sequence[int] = (),
+        opponent: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Showdown equity of each option against the opponent's range.
+        :param hand: Our two cards, in the engine's order.
+        :param board: The visible board: none, the flop or the turn.
+        :param dead: Cards out of the deck and of the opponent's hand, like
+            its discard.
+        :param held: Cards known to be in the opponent's hand, like its draw.
+        :param opponent: Weights of the opponent's hands, by default uniform;
+            preflop the table's uniform range is used.
+        :return: [keep, discard hand[0], discard hand[1]].
+        """
+        known = list(hand) + list(board) + list(dead) + list(held)
+        deck = np.array([c for c in range(NUM_CARDS) if c not in known])
+        candidates, option = self._candidates(hand, deck)
+        if not board:
+            values, valid = self._preflop(candidates, known)
+        else:
+            values, valid = self._postflop(
+                candidates, deck, board, known, held, opponent
+            )
+        # Every valid (board, draw) pair of an option is equally likely
+        totals = (values * valid).sum(axis=0)
+        counts = valid.sum(axis=0)
+        return np.bincount(option, totals, 3) / np.bincount(option, counts, 3)
+
+    def _preflop(self, candidates: np.ndarray, known: list):
+        """
+        Flop equity of every candidate hand on every flop of the deck, read
+        from the tables.
+        :return: (values, valid), shape (flops, candidates).
+        """
+        if self.tables is None:
+            raise ValueError("Preflop discards need the equity tables")
+        # Flops from the deck left after the option's draw
+        known_mask = sum(1 << c for c in set(known))
+        flops = np.flatnonzero((self.flop_masks & known_mask) == 0)
+        masks = self.flop_masks[flops]
+        valid = (masks[:, None] & self.hand_masks[candidates]) == 0
+        rows = self.flop_classes[flops][:, None]
+        columns = self.flop_hands[flops][:, candidates]
+        return self.tables.tables[FLOP_EQUITY][rows, columns].astype(np.float64), valid
+
+    def _postflop(self, candidates, deck, board, known, held, opponent):
+        """
+        Showdown equity of every candidate hand against the opponent's range on
+        every completion of board.
+        :return: (values, valid), shape (runouts, candidates).
+        """
+        runouts = np.array(
+            [board + cards for cards in combinations(deck.tolist(), 5 - len(board))]
+        )
+        ranks = self.evaluator.hand_ranks(runouts)
+        weights = np.ones(len(self.hand_masks)) if opponent is None else opponent
+        # The opponent holds none of our cards, the board or the dead cards,
+        # and every card it is known to hold
+        out_mask = sum(1 << c for c in set(known) - set(held))
+        weights = weights * ((self.hand_masks & out_mask) == 0)
+        for card in held:
+            weights = weights * ((self.hand_masks >> card) & 1)
+        possible = np.flatnonzero(weights > 0)
+        # Hands the runout blocks rank above every hand, beating none
+        theirs = ranks[:, possible]
+        blocked = np.iinfo(theirs.dtype).max
+        theirs[theirs == 0] = blocked
+        ours = ranks[:, candidates]
+        # Weight of each opponent hand against each option's hand, 0 when they
+        # share a card such as the draw
+        apart = (self.hand_masks[candidates][:, None] & self.hand_masks[possible]) == 0
+        apart = (apart * weights[possible]).astype(np.float32)
+        live = (theirs < blocked).astype(np.float32)
+        total = live @ apart.T
+        # Twice the showdown score: 2 per win, 1 per tie
+        score = (theirs[:, None, :] < ours[:, :, None]).astype(np.float32)
+        score += theirs[:, None, :] <= ours[:, :, None]
+        values = np.einsum("rkh,kh->rk", score, apart) / np.maximum(2 * total, 1e-12)
+        valid = (ours > 0) & (total > 0)
+        return values, valid
+
+    def decide(self, hand: Sequence[int], board: tuple = (), **known) -> int:
+        """
+        The engine's card_to_discard: the index in hand of the card to
+        discard, or -1 to keep both. Keyword arguments as in equities().
+        """
+        equity = self.equities(hand, board, **known)
+        best = int(np.argmax(equity[1:]))
+        return best if equity[1 + best] > equity[0] + self.margin else -1
+
+    def gain(self, hand: Sequence[int], board: tuple = (), **known) -> float:
+        """
+        Equity the best discard adds to keeping, 0 if none does: a feature
+        for card abstraction.
+        """
+        equity = self.equities(hand, board, **known)
+        return max(0.0, float(equity[1:].max() - equity[0]))
@@ -0,0 +1,343 @@
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from utils.discard import DiscardSolver
+from utils.public_tree import (
+    CALL,
+    CHECK,
+    FOLD,
+    RAISE,
+    NodeKind,
+    PublicNode,
+    raise_label,
+)
+from utils.short_deck import NUM_CARDS, ShortDeckGame
+
+# The engine's action types (PokerEnv.ActionType)
+FOLD_ACTION = 0
+RAISE_ACTION = 1
+CHECK_ACTION = 2
+CALL_ACTION = 3
+DISCARD_ACTION = 4
+
+# Cards the engine has not dealt or does not show
+HIDDEN = -1
+
+
+class EnvBridge:
+    """
+    Converts aipoker PokerEnv observations into the state of a ShortDeckGame:
+    the public history of abstract action labels, the board, the hand and its
+    index, and the opponent hands still possible. Card ints are the engine's
+    own (suit * 9 + rank), so cards index precomputed tables directly and no
+    card objects are built per decision.
+    The betting history is rebuilt from consecutive observations, which the
+    harness sends before every action of a hand (get_action to the player to
+    act, post_observation to the other). Real raises map to the abstract raise
+    of nearest pot fraction. Once the real betting leaves the abstract tree,
+    e.g. after more raises than it allows, decisions fall back to the latest
+    abstract spot of the same player on the street.
+    - game: the abstract game
+    - history: abstract labels of the current hand
+    - node: the abstract node reached, not always a decision
+    - position: our player in the game (0 small blind), None before a hand
+    - dead: the opponent's discard, known not to be in its hand
+    - opponent_card: the card the opponent drew, which the engine shows
+    - discards: decides the DISCARD action, None to never discard
+    """
+
+    def __init__(
+        self,
+        game: Optional[ShortDeckGame] = None,
+        discards: Optional[DiscardSolver] = None,
+    ):
+        self.game = game if game is not None else ShortDeckGame()
+        self.discards = discards
+        hands = self.game.hands
+        # hand_table[a][b]: index of the hand {a, b}, -1 if a == b
+        self.hand_table: List[List[int]] = [[-1] * NUM_CARDS for _ in range(NUM_CARDS)]
+        for i, (a, b) in enumerate(hands):
+            self.hand_table[a][b] = self.hand_table[b][a] = i
+        # flop_table[a * 729 + b * 27 + c]: the flop as the game's sorted tuple
+        self.flop_table: List[Optional[tuple]] = [None] * NUM_CARDS**3
+        for a in range(NUM_CARDS):
+            for b in range(NUM_CARDS):
+                for c in range(NUM_CARDS):
+                    if len({a, b, c}) == 3:
+                        flop = tuple(sorted((a, b, c)))
+                        self.flop_table[(a * NUM_CARDS + b) * NUM_CARDS + c] = flop
+        self.card_tuples = [(c,) for c in range(NUM_CARDS)]
+        # hands_with[c, h]: hand h holds card c
+        self.hands_with = self.game.card_hands > 0
+        self.hands_without = ~self.hands_with
+        self._range = np.ones(self.game.num_hands, dtype=np.bool_)
+        self.start_hand()
+
+    def start_hand(self, hand_number: Optional[int] = None):
+        """
+        Forget the previous hand; the next observation starts a new one.
+        """
+        self.hand_number = hand_number
+        self.history: List[str] = []
+        self.node: PublicNode = self.game.root
+        self._follow_chance()
+        self.position: Optional[int] = None
+        self.street = 0
+        self.actor = 0
+        self.bets: Tuple[int, int] = tuple(self.game.initial_bets)
+        self.off_tree = False
+        # Latest abstract decision of each player on the street: (history, node)
+        self.latest: List[Optional[tuple]] = [None, None]
+        self.pending: Optional[str] = None
+        self.spot_node: Optional[PublicNode] = None
+        self.dead = HIDDEN
+        self.opponent_card = HIDDEN
+
+    # ---- Cards ----
+
+    def board(self, observation: dict) -> tuple:
+        """
+        The visible community cards, each street sorted as in the game.
+        """
+        cards = observation["community_cards"]
+        a, b, c = cards[0], cards[1], cards[2]
+        if a == HIDDEN:
+            return ()
+        board = self.flop_table[(a * NUM_CARDS + b) * NUM_CARDS + c]
+        for card in cards[3:]:
+            if card == HIDDEN:
+                break
+            board = board + self.card_tuples[card]
+        return board
+
+    def hand_index(self, observation: dict) -> int:
+        a, b = observation["my_cards"]
+        return self.hand_table[a][b]
+
+    def hand(self, observation: dict) -> tuple:
+        """
+        Our hole cards as the game's sorted hand tuple.
+        """
+        return self.game.hands[self.hand_index(observation)]
+
+    def opponent_range(self, observation: dict) -> np.ndarray:
+        """
+        Mask of the opponent hands consistent with what the engine shows: they
+        miss our cards, the board and the opponent's discard, and hold the
+        card it drew. The returned buffer is reused by the next call.
+        """
+        live = self._range
+        live[:] = True
+        for card in observation["my_cards"]:
+            np.logical_and(live, self.hands_without[card], out=live)
+        for card in observation["community_cards"]:
+            if card != HIDDEN:
+                np.logical_and(live, self.hands_without[card], out=live)
+        discarded = observation.get("opp_discarded_card", HIDDEN)
+        if discarded != HIDDEN:
+            np.logical_and(live, self.hands_without[discarded], out=live)
+        drawn = observation.get("opp_drawn_card", HIDDEN)
+        if drawn != HIDDEN:
+            np.logical_and(live, self.hands_with[drawn], out=live)
+        return live
+
+    # ---- Betting ----
+
+    def _follow_chance(self):
+        while self.node.kind == NodeKind.CHANCE:
+            self.history.append("/")
+            self.node = self.node.children[0]
+
+    def _apply(self, label: str):
+        node = self.node
+        self.history.append(label)
+        self.node = node.children[node.actions.index(label)]
+
+    def _raise_label(self, node: PublicNode, total: int, call: int) -> Optional[str]:
+        """
+        The abstract raise of node nearest to a real raise to total facing
+        call, by pot fraction; None if node has no raise.
+        """
+        raises = [a for a in node.actions if a.startswith(RAISE)]
+        if not raises:
+            return None
+        if total >= self.game.max_bet and raise_label(total) in raises:
+            return raise_label(total)
+        target = math.log((total - call) / (2 * call))
+        abstract_call = node.bets[1 - node.player]
+        return min(
+            raises,
+            key=lambda a: abs(
+                math.log((int(a[len(RAISE) :]) - abstract_call) / (2 * abstract_call))
+                - target
+            ),
+        )
+
+    def _closing_label(self) -> str:
+        return CALL if CALL in self.node.actions else CHECK
+
+    def _step(self, street: int, bets: Tuple[int, int]):
+        """
+        Translate the action between the previous observation and one at street
+        with bets (by player) into the abstract history.
+        """
+        node, actor = self.node, self.actor
+        on_street = node.kind == NodeKind.DECISION and node.street == self.street
+        if street > self.street:
+            # A check or call closed the street; off the tree, the tree's
+            # street may take more than one label to close
+            while self.node.kind == NodeKind.DECISION and self.node.street < street:
+                self._apply(self._closing_label())
+                self._follow_chance()
+            self._follow_chance()
+            self.off_tree = False
+            self.latest = [None, None]
+            return
+        if not on_street or self.off_tree or node.player != actor:
+            self.off_tree = True
+            return
+        if bets[actor] > bets[1 - actor]:
+            label = self.pending if self.pending in node.actions else None
+            if label is None or not label.startswith(RAISE):
+                label = self._raise_label(node, bets[actor], bets[1 - actor])
+            if label is None:
+                # More raises than the tree allows
+                self.off_tree = True
+                return
+        else:
+            label = self._closing_label()
+        child = node.children[node.actions.index(label)]
+        if child.kind != NodeKind.DECISION or child.street != street:
+            # The real street goes on where the tree's would end
+            self.off_tree = True
+            return
+        self._apply(label)
+
+    def update(self, observation: dict, acting: bool):
+        """
+        Advance the hand to observation.
+        :param acting: We are the player to act.
+        """
+        street = observation["street"]
+        my_bet, opp_bet = observation["my_bet"], observation["opp_bet"]
+        # Bets only grow during a hand
+        if street < self.street or my_bet + opp_bet < sum(self.bets):
+            self.start_hand()
+        if self.position is None:
+            # Only the small blind has put in less at the start of a hand
+            self.position = 0 if my_bet < opp_bet and street == 0 else 1
+        bets = (my_bet, opp_bet) if self.position == 0 else (opp_bet, my_bet)
+        actor = self.position if acting else 1 - self.position
+        if (street, actor, bets) != (self.street, self.actor, self.bets):
+            self._step(street, bets)
+            self.pending = None
+        self.street, self.actor, self.bets = street, actor, bets
+        self.dead = observation.get("opp_discarded_card", HIDDEN)
+        self.opponent_card = observation.get("opp_drawn_card", HIDDEN)
+        node = self.node
+        if not self.off_tree and node.kind == NodeKind.DECISION:
+            if node.player == actor and node.street == street:
+                self.latest[actor] = (tuple(self.history), node)
+
+    def decision(self, player: int) -> Optional[Tuple[tuple, PublicNode]]:
+        """
+        The abstract spot of player's current decision: the node reached, or
+        off the tree the latest one of player on the street.
+        """
+        return self.latest[player]
+
+    def spot(self, observation: dict) -> Optional[tuple]:
+        """
+        Our decision at observation as (history, board, hand, pot, stack) for
+        AgentServer.decide, with the real pot and effective stack; None when
+        there is nothing to decide (see default_action).
+        """
+        self.update(observation, acting=True)
+        valid = observation["valid_actions"]
+        found = self.decision(self.position)
+        if found is None or (valid[CHECK_ACTION] and not valid[RAISE_ACTION]):
+            self.spot_node = None
+            return None
+        history, self.spot_node = found
+        my_bet, opp_bet = observation["my_bet"], observation["opp_bet"]
+        pot = my_bet + opp_bet
+        stack = self.game.max_bet - max(my_bet, opp_bet)
+        return history, self.board(observation), self.hand(observation), pot, stack
+
+    def opponent_spot(self, observation: dict) -> Optional[Tuple[tuple, tuple]]:
+        """
+        (history, board) of the opponent's decision at observation, for
+        pondering; None off the tree.
+        """
+        self.update(observation, acting=False)
+        found = self.decision(1 - self.position)
+        if found is None or self.off_tree:
+            return None
+        return found[0], self.board(observation)
+
+    def infoset_key(self, observation: dict) -> Optional[tuple]:
+        """
+        Key of our information set at observation: the blueprint's public key
+        (node id, visible board) and the row of our hand.
+        """
+        found = self.decision(self.position)
+        if found is None:
+            return None
+        node = found[1]
+        board = self.board(observation)[: self.game.revealed(node.street)]
+        return (node.id, board), self.hand_index(observation)
+
+    def default_action(self, observation: dict) -> tuple:
+        """
+        The engine action when there is nothing to decide: check, else call.
+        """
+        if observation["valid_actions"][CHECK_ACTION]:
+            return CHECK_ACTION, 0, HIDDEN
+        return CALL_ACTION, 0, HIDDEN
+
+    def discard_action(self, observation: dict) -> Optional[tuple]:
+        """
+        The engine's DISCARD action when it is legal and replacing a card gains
+        equity by the solver's margin, else None. It only reads observation,
+        so it can run outside the event loop.
+        """
+        if self.discards is None or not observation["valid_actions"][DISCARD_ACTION]:
+            return None
+        board = self.board(observation)
+        if not self.discards.supports(board):
+            return None
+        discarded = observation.get("opp_discarded_card", HIDDEN)
+        drawn = observation.get("opp_drawn_card", HIDDEN)
+        card = self.discards.decide(
+            observation["my_cards"],
+            board,
+            dead=() if discarded == HIDDEN else (discarded,),
+            held=() if drawn == HIDDEN else (drawn,),
+        )
+        return None if card < 0 else (DISCARD_ACTION, 0, card)
+
+    def action(self, observation: dict, label: str) -> tuple:
+        """
+        The engine action (type, raise amount, card to discard) for an abstract
+        label of the latest spot(). Raises keep their pot fraction and are
+        clamped to the legal range; illegal actions become the closest legal
+        one, and folds become checks when checking is free.
+        """
+        valid = observation["valid_actions"]
+        self.pending = label
+        if label == FOLD and not valid[CHECK_ACTION]:
+            return FOLD_ACTION, 0, HIDDEN
+        node = self.spot_node
+        if label.startswith(RAISE) and valid[RAISE_ACTION] and node is not None:
+            total = int(label[len(RAISE) :])
+            low, high = observation["min_raise"], observation["max_raise"]
+            if total >= self.game.max_bet:
+                amount = high
+            else:
+                call = node.bets[1 - node.player]
+                fraction = (total - call) / (2 * call)
+                amount = round(fraction * 2 * observation["opp_bet"])
+            return RAISE_ACTION, min(high, max(low, amount)), HIDDEN
+        return self.default_action(observation)
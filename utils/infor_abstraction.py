@@ -2,8 +2,8 @@ import numpy as np
 import logging
 from collections import defaultdict
 
-# Setup logging for debugging purposes
-logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+# Configuring logging is left to the application, not done at import
+logger = logging.getLogger(__name__)
 
 # Hierarchical Information Abstraction Algorithm (Refined)
 # ---------------------------------------------------------
@@ -22,23 +22,23 @@ def InformationAbstraction(R, r_hat, C, B_r, A_r):
     # Stage 1: Precompute Abstractions for Early Rounds (1 to r_hat-1)
     for r in range(1, r_hat):
         AbstractInformationStates(r, A_r)
-        logging.info(f"Abstracted round {r} using A_r.")
+        logger.info(f"Abstracted round {r} using A_r.")
 
     # Stage 2: Public Information Clustering at Round r_hat
     public_states = GeneratePublicStates(r_hat)  # E.g., unique flop boards
-    logging.info(f"Generated {len(public_states)} public states for round {r_hat}.")
+    logger.info(f"Generated {len(public_states)} public states for round {r_hat}.")
 
     # Compute transition table T using the base abstraction A_r
     T = compute_transition_table(public_states, A_r)
-    logging.info("Computed transition table T for public states.")
+    logger.info("Computed transition table T for public states.")
 
     # Compute pairwise distances based on T
     distances = compute_public_distances(public_states, T, A_r)
-    logging.info("Computed pairwise distances between public states.")
+    logger.info("Computed pairwise distances between public states.")
 
     # Cluster public states into C clusters using an enhanced initialization
     public_clusters = cluster_public_states(public_states, distances, C)
-    logging.info(f"Public states clustered into {C} clusters.")
+    logger.info(f"Public states clustered into {C} clusters.")
 
     # Stage 3: Private Information Clustering within Each Public Cluster
     clusters = {}
@@ -52,7 +52,7 @@ def InformationAbstraction(R, r_hat, C, B_r, A_r):
                 private_states.extend(GeneratePrivateStatesForPublicState(r, ps))
             # Cluster the aggregated private states using A_r into B_r buckets.
             clusters[cluster_id][r] = A_r(private_states, B_r)
-            logging.info(
+            logger.info(
                 f"Clustered private states for public cluster {cluster_id} in round {r}."
             )
     return clusters
@@ -92,7 +92,7 @@ def cluster_public_states(public_states, distances, C, max_iter=100, tol=1e-4):
     clusters = initialize_clusters_indices(
         n, C
     )  # Enhanced k-means++ initialization can be inserted here
-    logging.info("Initialized clusters using enhanced k-means++ initialization.")
+    logger.info("Initialized clusters using enhanced k-means++ initialization.")
     for iteration in range(max_iter):
         new_clusters = {cid: [] for cid in range(C)}
         for i in range(n):
@@ -121,7 +121,7 @@ def cluster_public_states(public_states, distances, C, max_iter=100, tol=1e-4):
             - sum(len(clusters[cid]) for cid in clusters)
             < tol
         ):
-            logging.info(f"Converged after {iteration} iterations.")
+            logger.info(f"Converged after {iteration} iterations.")
             break
         clusters = new_clusters
     return clusters
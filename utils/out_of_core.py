@@ -0,0 +1,452 @@
+import numpy as np
+import math
+import os
+import pickle
+import shutil
+import sys
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable, Dict, Hashable, List, Optional
+
+from utils.regret_storage import RegretStorage, read_keys, stable_hash
+
+
+ENTRY_ARRAYS = ("regrets", "average", "strategy")
+
+# New keys are appended to the key stream in chunks of this many
+KEY_CHUNK = 4096
+
+
+def _deep_size(value) -> int:
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        size += sum(_deep_size(v) for v in value)
+    return size
+
+
+class DiskHashIndex:
+    """
+    Open-addressing hash table from stable 64-bit key hashes to rows, kept in
+    memory-mapped files so that indexing an infoset costs no Python object;
+    only the pages probed are read. Slots are probed linearly and the table
+    doubles once half full. As in loaded checkpoints, keys are told apart by
+    their hash alone.
+    - directory: where the table files are kept
+    - size: number of slots, a power of two
+    - count: number of hashes stored
+    """
+
+    def __init__(self, directory: str, size: int = 1024):
+        self.directory = directory
+        self.count = 0
+        self._allocate(size)
+
+    def _path(self, name: str, size: int) -> str:
+        return os.path.join(self.directory, f"{name}.{size}.npy")
+
+    def _allocate(self, size: int):
+        self.size = size
+        self.mask = size - 1
+        # Hash 0 marks an empty slot; a key hashing to 0 is stored as 1
+        self.slots = np.lib.format.open_memmap(
+            self._path("index_slots", size), mode="w+", dtype=np.uint64, shape=(size,)
+        )
+        self.rows = np.lib.format.open_memmap(
+            self._path("index_rows", size), mode="w+", dtype=np.int64, shape=(size,)
+        )
+
+    def find(self, h: int) -> Optional[int]:
+        """
+        :return: The row stored for hash h, or None.
+        """
+        h = h or 1
+        s = h & self.mask
+        slots = self.slots
+        while True:
+            stored = int(slots[s])
+            if stored == h:
+                return int(self.rows[s])
+            if stored == 0:
+                return None
+            s = (s + 1) & self.mask
+
+    def insert(self, h: int, row: int):
+        if 2 * (self.count + 1) > self.size:
+            self._resize(2 * self.size)
+        h = h or 1
+        s = h & self.mask
+        while self.slots[s] != 0:
+            s = (s + 1) & self.mask
+        self.slots[s] = h
+        self.rows[s] = row
+        self.count += 1
+
+    def insert_many(self, hashes: np.ndarray, rows: np.ndarray):
+        """
+        Insert new hashes in one vectorized pass.
+        """
+        size = self.size
+        while 2 * (self.count + len(hashes)) > size:
+            size *= 2
+        if size != self.size:
+            self._resize(size)
+        self._place(np.asarray(hashes, dtype=np.uint64), np.asarray(rows))
+        self.count += len(hashes)
+
+    def _place(self, hashes: np.ndarray, rows: np.ndarray):
+        hashes = np.where(hashes == 0, np.uint64(1), hashes)
+        positions = (hashes & np.uint64(self.mask)).astype(np.int64)
+        while len(hashes):
+            # One claimant takes each free slot; the others probe on
+            free = np.flatnonzero(self.slots[positions] == 0)
+            slots, first = np.unique(positions[free], return_index=True)
+            placed = free[first]
+            self.slots[slots] = hashes[placed]
+            self.rows[slots] = rows[placed]
+            left = np.ones(len(hashes), dtype=np.bool_)
+            left[placed] = False
+            hashes, rows = hashes[left], rows[left]
+            positions = (positions[left] + 1) & self.mask
+
+    def _resize(self, size: int, chunk: int = 1 << 20):
+        old_size, old_slots, old_rows = self.size, self.slots, self.rows
+        self._allocate(size)
+        for start in range(0, old_size, chunk):
+            slots = np.array(old_slots[start : start + chunk])
+            used = slots != 0
+            self._place(slots[used], np.array(old_rows[start : start + chunk])[used])
+        del old_slots, old_rows
+        for name in ("index_slots", "index_rows"):
+            os.remove(self._path(name, old_size))
+
+
+class OutOfCoreRegretStorage(RegretStorage):
+    """
+    Regret storage whose per-action tables live in memory-mapped files.
+    Up to cache_infosets rows are kept in an in-memory LRU cache; colder rows
+    are read from the files on demand and written back when evicted. Rows for
+    which pin(key) is true (e.g. preflop and flop infosets) are never evicted.
+    Discounting is applied lazily when a row is next touched, so an iteration
+    does not stream the whole table through memory.
+    The key index is on disk as well: a DiskHashIndex from key hashes to rows,
+    with the keys themselves appended to a key stream file and read back only
+    to export strategies. index only caches the most recently used keys.
+    - directory: where the backing files are kept
+    - cache_infosets: maximum number of unpinned rows held in memory
+    - cache_keys: maximum number of keys held in index, by default cache_infosets
+    - pin: optional predicate on infoset keys for rows that always stay in memory
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        cache_infosets: int = 1_000_000,
+        pin: Optional[Callable[[Hashable], bool]] = None,
+        capacity: int = 1024,
+        cache_keys: Optional[int] = None,
+        **kwargs,
+    ):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(capacity=capacity, **kwargs)
+        self._index_on_disk(cache_infosets if cache_keys is None else cache_keys)
+        open(self.keys_file, "wb").close()
+        self.cache_infosets = cache_infosets
+        self.pin = pin
+        self.cache: "OrderedDict[int, tuple]" = OrderedDict()
+        self.pinned: Dict[int, tuple] = {}
+        self.pin_checked = np.zeros(len(self.offsets), dtype=np.bool_)
+        self.pin_rows = np.zeros(len(self.offsets), dtype=np.bool_)
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        # Lazy discounting: cumulative log factors per discount step, and the
+        # step each row was last brought up to date with
+        self.log_pos = [0.0]
+        self.log_neg = [0.0]
+        self.log_avg = [0.0]
+        self.synced = np.zeros(len(self.offsets), dtype=np.uint32)
+        for name in ENTRY_ARRAYS:
+            array = getattr(self, name)
+            setattr(self, name, self._backing_file(name, array, len(array)))
+
+    def _backing_file(self, name: str, array: np.ndarray, size: int) -> np.memmap:
+        """
+        Copy array into a zero-padded memory-mapped file of size entries.
+        """
+        path = os.path.join(self.directory, f"{name}.npy")
+        tmp = path + ".tmp"
+        backing = np.lib.format.open_memmap(
+            tmp, mode="w+", dtype=array.dtype, shape=(size,)
+        )
+        chunk = 1 << 22
+        for start in range(0, len(array), chunk):
+            stop = min(start + chunk, len(array))
+            backing[start:stop] = array[start:stop]
+        backing.flush()
+        del backing
+        os.replace(tmp, path)
+        return np.load(path, mmap_mode="r+")
+
+    def _grow_entries(self, size: int):
+        for name in ENTRY_ARRAYS:
+            setattr(self, name, self._backing_file(name, getattr(self, name), size))
+
+    def _grow_infosets(self):
+        size = len(self.offsets)
+        if len(self.synced) < size:
+            self.synced = self._grow(self.synced, size)
+            self.pin_checked = self._grow(self.pin_checked, size)
+            self.pin_rows = self._grow(self.pin_rows, size)
+
+    def _index_on_disk(self, cache_keys: int):
+        self.cache_keys = cache_keys
+        self.index: "OrderedDict[Hashable, int]" = OrderedDict()
+        self.disk_index = DiskHashIndex(self.directory)
+        self.saved_hashes = self.saved_rows = None
+        self._keys = None
+        self.new_keys = []
+        self.keys_file = os.path.join(self.directory, "keys.pkl")
+
+    def _remember(self, key: Hashable, i: int):
+        self.index[key] = i
+        if len(self.index) > self.cache_keys:
+            self.index.popitem(last=False)
+
+    def _write_keys(self):
+        """
+        Append the keys added since the last call to the key stream.
+        """
+        if self.new_keys:
+            with open(self.keys_file, "ab") as f:
+                pickle.dump(self.new_keys, f)
+            self.new_keys = []
+
+    @property
+    def keys(self) -> List[Hashable]:
+        """
+        Infoset keys in row order, read from the key stream on every call.
+        """
+        self._write_keys()
+        return read_keys(self.keys_file)
+
+    def lookup(self, key: Hashable) -> Optional[int]:
+        i = self.index.get(key)
+        if i is not None:
+            self.index.move_to_end(key)
+        else:
+            i = self.disk_index.find(stable_hash(key))
+            if i is not None:
+                self._remember(key, i)
+        if i is not None and self.pin is not None and not self.pin_checked[i]:
+            self.pin_checked[i] = True
+            self.pin_rows[i] = self.pin(key)
+        return i
+
+    def add_infoset(self, key: Hashable, actions: list) -> int:
+        count = self.num_infosets
+        i = super().add_infoset(key, actions)
+        self._grow_infosets()
+        if self.num_infosets > count:
+            self.disk_index.insert(int(self.hashes[i]), i)
+            self._remember(key, i)
+            if len(self.new_keys) >= KEY_CHUNK:
+                self._write_keys()
+            self.synced[i] = len(self.log_pos) - 1
+            if self.pin is not None:
+                self.pin_checked[i] = True
+                self.pin_rows[i] = self.pin(key)
+        return i
+
+    def _rows(self, i: int):
+        rows = self.pinned.get(i)
+        if rows is None:
+            rows = self.cache.get(i)
+            if rows is not None:
+                self.cache.move_to_end(i)
+        if rows is not None:
+            self.hits += 1
+            self._sync(i, rows)
+            return rows
+        self.misses += 1
+        row = self.row(i)
+        rows = tuple(np.array(getattr(self, name)[row]) for name in ENTRY_ARRAYS)
+        self._sync(i, rows)
+        if self.pin_rows[i]:
+            self.pinned[i] = rows
+        else:
+            self.cache[i] = rows
+            if len(self.cache) > self.cache_infosets:
+                self._evict(*self.cache.popitem(last=False))
+        return rows
+
+    def _evict(self, i: int, rows: tuple):
+        row = self.row(i)
+        for name, values in zip(ENTRY_ARRAYS, rows):
+            getattr(self, name)[row] = values
+        self.evictions += 1
+
+    def _sync(self, i: int, rows: tuple):
+        """
+        Apply the discounting steps row i has missed since it was last touched.
+        """
+        step = len(self.log_pos) - 1
+        last = int(self.synced[i])
+        if last == step:
+            return
+        zeroed = self._scale(
+            rows[0],
+            rows[1],
+            math.exp(self.log_pos[step] - self.log_pos[last]),
+            math.exp(self.log_neg[step] - self.log_neg[last]),
+            math.exp(self.log_avg[step] - self.log_avg[last]),
+        )
+        self.synced[i] = step
+        if zeroed is not None and zeroed.any():
+            self.dirty[i] = True
+
+    def discount(self, pos_factor: float, neg_factor: float, avg_factor: float):
+        """
+        Record a DCFR discounting step; rows are scaled when next touched.
+        Rows only ever scale by positive factors between touches, so the sign
+        of each regret, and hence which factor applies, cannot change.
+        """
+        self.log_pos.append(self.log_pos[-1] + math.log(pos_factor))
+        self.log_neg.append(self.log_neg[-1] + math.log(neg_factor))
+        self.log_avg.append(self.log_avg[-1] + math.log(avg_factor))
+
+    def flush(self, chunk_infosets: int = 1 << 16):
+        """
+        Write every cached row back and bring all rows up to date with discounting.
+        Cached rows are synced before they are written, so the pass over the files
+        scales them by a factor of one.
+        """
+        for i, rows in list(self.cache.items()) + list(self.pinned.items()):
+            self._sync(i, rows)
+            row = self.row(i)
+            for name, values in zip(ENTRY_ARRAYS, rows):
+                getattr(self, name)[row] = values
+        step = len(self.log_pos) - 1
+        log_pos, log_neg, log_avg = (
+            np.array(self.log_pos),
+            np.array(self.log_neg),
+            np.array(self.log_avg),
+        )
+        for start in range(0, self.num_infosets, chunk_infosets):
+            stop = min(start + chunk_infosets, self.num_infosets)
+            synced = self.synced[start:stop].astype(np.int64)
+            stale = synced != step
+            if not stale.any():
+                continue
+            sizes = self.sizes[start:stop].astype(np.int64)
+            first = int(self.offsets[start])
+            last = int(self.offsets[stop - 1]) + int(sizes[-1])
+            zeroed = self._scale(
+                self.regrets[first:last],
+                self.average[first:last],
+                np.repeat(np.exp(log_pos[step] - log_pos[synced]), sizes),
+                np.repeat(np.exp(log_neg[step] - log_neg[synced]), sizes),
+                np.repeat(np.exp(log_avg[step] - log_avg[synced]), sizes),
+            )
+            if zeroed is not None:
+                self.dirty[self.infosets_of(first + np.flatnonzero(zeroed))] = True
+            self.synced[start:stop] = step
+        for name in ENTRY_ARRAYS:
+            getattr(self, name).flush()
+
+    def save(self, directory: str):
+        self.flush()
+        self._write_keys()
+        super().save(directory)
+
+    def mark_saved(self, directory: str):
+        """
+        Nothing to record: the key stream stays in the storage's own directory.
+        """
+
+    def stats(self) -> dict:
+        """
+        Cache counters: hits, misses, evictions, hit rate and resident rows.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cached_infosets": len(self.cache),
+            "pinned_infosets": len(self.pinned),
+        }
+
+    def nbytes(self) -> int:
+        """
+        Bytes held in memory: per-infoset arrays, cached and pinned rows, and
+        the cached keys and those not yet written, estimated from a sample.
+        """
+        per_infoset = sum(
+            getattr(self, name).itemsize
+            for name in (
+                "offsets",
+                "sizes",
+                "dirty",
+                "menu_ids",
+                "hashes",
+                "synced",
+                "pin_checked",
+                "pin_rows",
+            )
+        )
+        resident = sum(
+            values.nbytes
+            for rows in list(self.cache.values()) + list(self.pinned.values())
+            for values in rows
+        )
+        sample = list(islice(self.index, 64)) + self.new_keys[:64]
+        per_key = sum(map(_deep_size, sample)) / len(sample) if sample else 0.0
+        keys = sys.getsizeof(self.index) + sys.getsizeof(self.new_keys)
+        keys += int(per_key * (len(self.index) + len(self.new_keys)))
+        keys += len(self.index) * sys.getsizeof(self.num_infosets)
+        return self.num_infosets * per_infoset + resident + keys
+
+    @classmethod
+    def load(
+        cls,
+        checkpoint: str,
+        directory: str,
+        cache_infosets: int = 1_000_000,
+        pin: Optional[Callable[[Hashable], bool]] = None,
+        cache_keys: Optional[int] = None,
+    ) -> "OutOfCoreRegretStorage":
+        """
+        Resume out-of-core training from a checkpoint written by save().
+        The checkpoint's tables are copied into directory and mapped read-write there.
+        """
+        loaded = RegretStorage.load(checkpoint)
+        storage = cls.__new__(cls)
+        storage.__dict__.update(loaded.__dict__)
+        storage.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        storage._index_on_disk(cache_infosets if cache_keys is None else cache_keys)
+        n = storage.num_infosets
+        storage.disk_index.insert_many(np.array(loaded.hashes[:n]), np.arange(n))
+        shutil.copyfile(loaded.keys_file, storage.keys_file + ".tmp")
+        os.replace(storage.keys_file + ".tmp", storage.keys_file)
+        for name in ENTRY_ARRAYS:
+            path = os.path.join(directory, f"{name}.npy")
+            shutil.copyfile(os.path.join(checkpoint, f"{name}.npy"), path + ".tmp")
+            os.replace(path + ".tmp", path)
+            setattr(storage, name, np.load(path, mmap_mode="r+"))
+        # Per-infoset arrays are small and kept in memory
+        for name in ("offsets", "sizes", "dirty", "menu_ids", "hashes"):
+            setattr(storage, name, np.array(getattr(storage, name)))
+        storage.cache_infosets = cache_infosets
+        storage.pin = pin
+        storage.cache = OrderedDict()
+        storage.pinned = {}
+        size = len(storage.offsets)
+        storage.pin_checked = np.zeros(size, dtype=np.bool_)
+        storage.pin_rows = np.zeros(size, dtype=np.bool_)
+        storage.hits = storage.misses = storage.evictions = 0
+        storage.log_pos, storage.log_neg, storage.log_avg = [0.0], [0.0], [0.0]
+        storage.synced = np.zeros(size, dtype=np.uint32)
+        return storage
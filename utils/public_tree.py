@@ -0,0 +1,476 @@
+import numpy as np
+from enum import Enum
+from itertools import combinations, permutations
+from math import comb
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class NodeKind(Enum):
+    DECISION = "decision"
+    CHANCE = "chance"
+    FOLD = "fold"
+    SHOWDOWN = "showdown"
+
+
+FOLD = "f"
+CHECK = "k"
+CALL = "c"
+RAISE = "r"
+
+
+def raise_label(amount: int) -> str:
+    """
+    Label of a raise to a total bet of amount.
+    """
+    return f"{RAISE}{amount}"
+
+
+class PublicNode:
+    """
+    A node of the public betting tree, shared by every private deal.
+    - id: index of the node in PublicGame.nodes
+    - kind: decision, chance (board cards are dealt), fold or showdown
+    - player: player to act at a decision node, the folding player at a fold node
+    - street: betting round, 0 for the first
+    - bets: total chips put in by each player
+    - history: action labels from the root; chance nodes add "/"
+    - actions: action labels of a decision node, aligned with children
+    - children: child nodes (one for a chance node, none for terminals)
+    - min_raise: smallest legal raise increment at the node
+    - raises: number of raises made on the current street
+    - street_start: each player's bet when the street began
+    """
+
+    __slots__ = (
+        "id",
+        "kind",
+        "player",
+        "street",
+        "bets",
+        "history",
+        "actions",
+        "children",
+        "min_raise",
+        "raises",
+        "street_start",
+    )
+
+    def __init__(
+        self,
+        kind: NodeKind,
+        player: int,
+        street: int,
+        bets: Tuple[int, int],
+        history: tuple,
+        min_raise: int = 0,
+        raises: int = 0,
+        street_start: int = 0,
+    ):
+        self.id: int = -1
+        self.kind = kind
+        self.player = player
+        self.street = street
+        self.bets = bets
+        self.history = history
+        self.actions: List[str] = []
+        self.children: List["PublicNode"] = []
+        self.min_raise = min_raise
+        self.raises = raises
+        self.street_start = street_start
+
+    def is_terminal(self) -> bool:
+        return self.kind in (NodeKind.FOLD, NodeKind.SHOWDOWN)
+
+    def __repr__(self):
+        history = "".join(self.history)
+        return f"<PublicNode id={self.id} kind={self.kind.value} history={history}>"
+
+
+class PublicGame:
+    """
+    Two-player poker game over a small deck, described by its public betting tree.
+    Private hands are not part of the tree: solvers carry one value per hand in
+    vectors, so one walk of the tree covers every deal. Player 0 acts first on
+    every street. Cards are ints in [0, num_cards) and hands are sorted tuples.
+    Subclasses set the class attributes below and implement strength() and
+    raise_sizes().
+    - num_cards: deck size
+    - hole_cards: private cards per player
+    - board_cards: board cards dealt at the start of each street
+    - initial_bets: chips each player has in before the first action (blinds or antes)
+    - max_bet: total bet cap per player
+    - big_blind: unit of mbb/hand
+    - max_raises: raises allowed per street
+    - num_suits: suits of the deck, for board isomorphism; see card_suit()
+    """
+
+    num_cards: int = 0
+    hole_cards: int = 1
+    board_cards: Sequence[int] = (0,)
+    initial_bets: Tuple[int, int] = (1, 1)
+    max_bet: int = 1
+    big_blind: int = 1
+    max_raises: int = 1
+    num_suits: int = 1
+
+    def __init__(self):
+        self.hands: List[tuple] = list(
+            combinations(range(self.num_cards), self.hole_cards)
+        )
+        self.hand_index: Dict[tuple, int] = {h: i for i, h in enumerate(self.hands)}
+        self.hand_masks = np.array(
+            [sum(1 << c for c in hand) for hand in self.hands], dtype=np.int64
+        )
+        # disjoint[h, o]: hands h and o can be dealt together
+        self.disjoint = (self.hand_masks[:, None] & self.hand_masks[None, :]) == 0
+        self.num_hands: int = len(self.hands)
+        self.num_pairs: int = int(self.disjoint.sum())
+        # hand_cards[h]: the cards of hand h; card_hands[c, h]: hand h holds card c
+        self.hand_cards = np.array(self.hands, dtype=np.int64)
+        self.card_hands = np.zeros((self.num_cards, self.num_hands))
+        for i in range(self.hole_cards):
+            self.card_hands[self.hand_cards[:, i], np.arange(self.num_hands)] = 1.0
+
+        # Board cards are sampled from the deck without regard to the hands, and
+        # deals they block score zero; scaling street s by 1 / P(board misses both
+        # hands) keeps the values of every street on the same footing
+        self.street_weights: List[float] = []
+        revealed = 0
+        for cards in self.board_cards:
+            revealed += cards
+            self.street_weights.append(
+                comb(self.num_cards, revealed)
+                / comb(self.num_cards - 2 * self.hole_cards, revealed)
+            )
+
+        self.nodes: List[PublicNode] = []
+        self.root: PublicNode = self._build()
+        # Action slots per street in features(): checks or calls and raises
+        self.history_slots: int = self.max_raises + 2
+        num_streets = len(self.board_cards)
+        self.feature_size: int = (
+            2 * self.num_cards + num_streets + 4 + 3 * num_streets * self.history_slots
+        )
+        self._strength_cache: Dict[tuple, tuple] = {}
+        # suit_maps[i][c]: card c with its suit relabeled by the i-th permutation
+        deck = range(self.num_cards)
+        self.suit_maps: List[np.ndarray] = [
+            np.array([self.with_suit(c, perm[self.card_suit(c)]) for c in deck])
+            for perm in permutations(range(self.num_suits))
+        ]
+
+    # ---- Rules to override ----
+
+    def strength(self, hand: tuple, board: tuple) -> int:
+        """
+        Showdown strength of hand on the full board; higher wins.
+        """
+        raise NotImplementedError
+
+    def raise_sizes(self, node: PublicNode) -> List[int]:
+        """
+        Total bets the player to act at node may raise to.
+        """
+        raise NotImplementedError
+
+    def next_min_raise(self, node: PublicNode, total: int) -> int:
+        """
+        Smallest raise increment after the player at node raises to total.
+        """
+        return max(node.min_raise, total - node.bets[1 - node.player])
+
+    def card_suit(self, card: int) -> int:
+        """
+        Suit of card, in [0, num_suits). Suits must not matter to strength().
+        """
+        return 0
+
+    def with_suit(self, card: int, suit: int) -> int:
+        """
+        The card of the same rank as card in suit.
+        """
+        return card
+
+    # ---- Public tree ----
+
+    def _add(self, node: PublicNode) -> PublicNode:
+        node.id = len(self.nodes)
+        self.nodes.append(node)
+        return node
+
+    def _build(self) -> PublicNode:
+        bets = tuple(self.initial_bets)
+        if self.board_cards[0] > 0:
+            root = self._add(PublicNode(NodeKind.CHANCE, -1, 0, bets, ()))
+            root.children.append(self._street(0, bets, ("/",)))
+            return root
+        return self._street(0, bets, ())
+
+    def _street(self, street: int, bets: tuple, history: tuple) -> PublicNode:
+        if max(bets) >= self.max_bet:
+            # Nobody can bet any more: deal the rest of the board
+            return self._next_street(street, bets, history)
+        start = PublicNode(
+            NodeKind.DECISION,
+            0,
+            street,
+            bets,
+            history,
+            min_raise=self.big_blind,
+            # Blinds do not count as the first street's bets
+            street_start=bets[0] if street > 0 else 0,
+        )
+        return self._decision(start, acted=(False, False))
+
+    def _next_street(self, street: int, bets: tuple, history: tuple) -> PublicNode:
+        if street + 1 == len(self.board_cards):
+            return self._add(PublicNode(NodeKind.SHOWDOWN, -1, street, bets, history))
+        chance = self._add(PublicNode(NodeKind.CHANCE, -1, street, bets, history))
+        chance.children.append(self._street(street + 1, bets, history + ("/",)))
+        return chance
+
+    def _decision(self, node: PublicNode, acted: tuple) -> PublicNode:
+        self._add(node)
+        p, bets = node.player, node.bets
+        acted = tuple(True if q == p else acted[q] for q in (0, 1))
+        to_call = bets[1 - p] - bets[p]
+
+        def child(label: str, kind: NodeKind, new_bets: tuple, **state) -> PublicNode:
+            history = node.history + (label,)
+            if kind == NodeKind.FOLD:
+                terminal = PublicNode(kind, p, node.street, new_bets, history)
+                return self._add(terminal)
+            if all(acted) and new_bets[0] == new_bets[1]:
+                return self._next_street(node.street, new_bets, history)
+            nxt = PublicNode(
+                NodeKind.DECISION,
+                1 - p,
+                node.street,
+                new_bets,
+                history,
+                min_raise=state.get("min_raise", node.min_raise),
+                raises=state.get("raises", node.raises),
+                street_start=node.street_start,
+            )
+            return self._decision(nxt, acted)
+
+        if to_call > 0:
+            node.actions.append(FOLD)
+            node.children.append(child(FOLD, NodeKind.FOLD, bets))
+            node.actions.append(CALL)
+            called = tuple(bets[1 - p] for _ in (0, 1))
+            node.children.append(child(CALL, NodeKind.DECISION, called))
+        else:
+            node.actions.append(CHECK)
+            node.children.append(child(CHECK, NodeKind.DECISION, bets))
+        if node.raises < self.max_raises and max(bets) < self.max_bet:
+            for total in self.raise_sizes(node):
+                label = raise_label(total)
+                new_bets = tuple(total if q == p else bets[q] for q in (0, 1))
+                node.actions.append(label)
+                node.children.append(
+                    child(
+                        label,
+                        NodeKind.DECISION,
+                        new_bets,
+                        min_raise=self.next_min_raise(node, total),
+                        raises=node.raises + 1,
+                    )
+                )
+        return node
+
+    def locate(self, history: Sequence[str]) -> PublicNode:
+        """
+        The decision node reached by a public history of action labels, with
+        "/" where board cards are dealt, as in PublicNode.history.
+        """
+        node = self.root
+        for label in history:
+            if node.kind == NodeKind.CHANCE and label == "/":
+                node = node.children[0]
+            elif node.kind == NodeKind.DECISION and label in node.actions:
+                node = node.children[node.actions.index(label)]
+            else:
+                raise ValueError(f"Illegal action {label!r} at {node}")
+        if node.kind != NodeKind.DECISION:
+            raise ValueError(f"No decision to make at {node}")
+        return node
+
+    # ---- Features ----
+
+    def features(self, node: PublicNode, hand: tuple, board: tuple) -> np.ndarray:
+        """
+        Fixed-size encoding of a decision node seen with hand, for function
+        approximation: hand and board cards, street, bets, acting player, and
+        each street's actions as (check or call, raise, raise total) slots.
+        """
+        x = np.zeros(self.feature_size, dtype=np.float32)
+        x[list(hand)] = 1.0
+        x[[self.num_cards + c for c in board]] = 1.0
+        offset = 2 * self.num_cards
+        x[offset + node.street] = 1.0
+        offset += len(self.board_cards)
+        x[offset : offset + 2] = np.array(node.bets) / self.max_bet
+        x[offset + 2 + node.player] = 1.0
+        offset += 4
+        # A board dealt before the first street also starts with "/"
+        street = -1 if self.board_cards[0] > 0 else 0
+        slot = 0
+        for label in node.history:
+            if label == "/":
+                street += 1
+                slot = 0
+                continue
+            if slot < self.history_slots:
+                i = offset + 3 * (street * self.history_slots + slot)
+                if label.startswith(RAISE):
+                    x[i + 1] = 1.0
+                    x[i + 2] = int(label[len(RAISE) :]) / self.max_bet
+                else:
+                    x[i] = 1.0
+            slot += 1
+        return x
+
+    # ---- Boards ----
+
+    def revealed(self, street: int) -> int:
+        """
+        Number of board cards visible on street.
+        """
+        return sum(self.board_cards[: street + 1])
+
+    def sample_board(self, rng: np.random.Generator, prefix: tuple = ()) -> tuple:
+        """
+        A full board, drawn from the whole deck, with each street's cards sorted.
+        :param prefix: Board cards already dealt, whole streets only; the rest
+            of the board is drawn from the remaining deck.
+        """
+        total = self.revealed(len(self.board_cards) - 1)
+        if prefix:
+            used = set(prefix)
+            deck = np.array([c for c in range(self.num_cards) if c not in used])
+        else:
+            deck = np.arange(self.num_cards)
+        cards = rng.permutation(deck)[: total - len(prefix)]
+        board, revealed = list(prefix), 0
+        for n in self.board_cards:
+            start = revealed - len(prefix)
+            if start >= 0:
+                board.extend(sorted(int(c) for c in cards[start : start + n]))
+            revealed += n
+        return tuple(board)
+
+    def canonical_board(self, board: tuple) -> Tuple[tuple, np.ndarray]:
+        """
+        Representative of the isomorphism class of board under suit
+        relabeling: the smallest relabeled board, each street sorted.
+        :return: (canonical board, map of every card to its relabeled card).
+        """
+        best = None
+        for cards in self.suit_maps:
+            relabeled, revealed = [], 0
+            for n in self.board_cards:
+                street = board[revealed : revealed + n]
+                relabeled.extend(sorted(int(cards[c]) for c in street))
+                revealed += n
+            candidate = tuple(relabeled)
+            if best is None or candidate < best[0]:
+                best = (candidate, cards)
+        return best
+
+    def hand_permutation(self, cards: np.ndarray) -> np.ndarray:
+        """
+        For every hand, the index of the hand holding its cards mapped by cards.
+        """
+        mapped = np.sort(cards[self.hand_cards], axis=1)
+        return np.array([self.hand_index[tuple(int(c) for c in h)] for h in mapped])
+
+    def street_outcomes(self, board: tuple, street: int):
+        """
+        Every way to deal the cards of street on top of board.
+        """
+        used = set(board)
+        deck = [c for c in range(self.num_cards) if c not in used]
+        return [board + cards for cards in combinations(deck, self.board_cards[street])]
+
+    def _live(self, board: tuple) -> np.ndarray:
+        """
+        Hands that do not hold a card of board.
+        """
+        board_mask = sum(1 << c for c in board)
+        return (self.hand_masks & board_mask) == 0
+
+    def _showdown_order(self, board: tuple) -> tuple:
+        """
+        (order, lower, upper) of a full board, cached for the latest boards:
+        hands sorted by strength, and for every hand the range of positions in
+        that order holding hands of equal strength.
+        """
+        cached = self._strength_cache.get(board)
+        if cached is not None:
+            return cached
+        strengths = self.strengths(board, self._live(board))
+        order = np.argsort(strengths, kind="stable")
+        ranked = strengths[order]
+        lower = np.searchsorted(ranked, strengths, side="left")
+        upper = np.searchsorted(ranked, strengths, side="right")
+        if len(self._strength_cache) >= 4096:
+            self._strength_cache.clear()
+        self._strength_cache[board] = cached = (order, lower, upper)
+        return cached
+
+    def strengths(self, board: tuple, live: np.ndarray) -> np.ndarray:
+        """
+        Showdown strength of every hand on a full board (0 for blocked hands).
+        """
+        strengths = np.zeros(self.num_hands, dtype=np.int64)
+        for h in np.flatnonzero(live):
+            strengths[h] = self.strength(self.hands[h], board)
+        return strengths
+
+    def _blocked(self, card_sums: np.ndarray) -> np.ndarray:
+        """
+        For every hand, the sum over its cards of per-card sums of shape
+        (cards, ...), i.e. the mass of opponent hands sharing one of its cards.
+        """
+        return card_sums[self.hand_cards].sum(axis=1)
+
+    def terminal_values(
+        self, node: PublicNode, p: int, opp_reach: np.ndarray, board: tuple
+    ) -> np.ndarray:
+        """
+        Counterfactual value of each of player p's hands at a terminal node:
+        the payoff against each compatible opponent hand weighted by its reach.
+        The winner takes the smaller of the two bets.
+        Opponent hands sharing a card are removed by inclusion-exclusion over the
+        hand's cards (exact for one or two hole cards), so a terminal costs
+        O(cards * hands) instead of a hands x hands product.
+        """
+        # Cards of later streets may already be sampled; they must not block hands
+        board = board[: self.revealed(node.street)]
+        live = self._live(board)
+        reach = opp_reach * live
+        stake = min(node.bets) * self.street_weights[node.street]
+        total = reach.sum()
+        if node.kind == NodeKind.FOLD:
+            # Hand h shares all its cards with itself and is subtracted once per card
+            overlap = (self.hole_cards - 1) * reach
+            compatible = total - self._blocked(self.card_hands @ reach) + overlap
+            sign = -1.0 if node.player == p else 1.0
+            return sign * stake * compatible * live
+
+        order, lower, upper = self._showdown_order(board)
+        # Prefix sums of opponent reach in strength order, overall and per card;
+        # hand h ties with itself so it is never counted as beaten or beating
+        ranked = reach[order]
+        cumulative = np.concatenate(([0.0], np.cumsum(ranked)))
+        card_cumulative = np.zeros((self.num_cards, self.num_hands + 1))
+        card_ranked = self.card_hands[:, order] * ranked
+        np.cumsum(card_ranked, axis=1, out=card_cumulative[:, 1:])
+        cards = self.hand_cards
+        weaker = cumulative[lower] - card_cumulative[cards, lower[:, None]].sum(axis=1)
+        stronger_by_card = card_cumulative[:, -1:] - card_cumulative
+        stronger = (total - cumulative[upper]) - stronger_by_card[
+            cards, upper[:, None]
+        ].sum(axis=1)
+        return stake * (weaker - stronger) * live
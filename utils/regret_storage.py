@@ -0,0 +1,459 @@
+import numpy as np
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from typing import Dict, List, Hashable, Optional
+
+
+REGRET_DTYPES = ("float64", "float32", "float16", "int32")
+AVERAGE_DTYPES = ("float64", "float32", "float16", "uint16")
+
+# Pluribus floored its int32 regrets at -310,000,000 so that actions can recover
+DEFAULT_INT_REGRET_FLOOR = -310_000_000
+
+STORAGE_ARRAYS = (
+    "regrets",
+    "average",
+    "strategy",
+    "offsets",
+    "sizes",
+    "dirty",
+    "menu_ids",
+    "hashes",
+)
+
+
+def stable_hash(key: Hashable) -> int:
+    """
+    64-bit hash of an infoset key that is stable across processes.
+    Keys must have a deterministic repr (tuples of ints, strings, cards, ...).
+    """
+    digest = hashlib.blake2b(repr(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def read_keys(path: str) -> List[Hashable]:
+    """
+    Keys of a key stream: pickled lists of keys appended one after another.
+    """
+    keys: List[Hashable] = []
+    with open(path, "rb") as f:
+        while True:
+            try:
+                keys.extend(pickle.load(f))
+            except EOFError:
+                return keys
+
+
+class RegretStorage:
+    """
+    Array-backed regret and average-strategy tables for tabular CFR.
+    Every infoset owns a contiguous row of its actions in flat arrays and is
+    addressed by its infoset index, so a table costs a few bytes per
+    infoset-action instead of a dict of Python floats.
+    - regret_dtype: float64, float32, float16, or int32 (saturating, floored)
+    - average_dtype: float64, float32, float16, or uint16 (rows rescaled on overflow)
+    - regret_floor: regrets never go below this value, in regret units
+    - regret_scale: int32 units per unit of regret
+    - average_scale: uint16 units per unit of average-strategy mass
+    """
+
+    def __init__(
+        self,
+        regret_dtype: str = "float64",
+        average_dtype: str = "float64",
+        regret_floor: Optional[float] = None,
+        regret_scale: float = 1000.0,
+        average_scale: float = 256.0,
+        capacity: int = 1024,
+        seed: Optional[int] = None,
+    ):
+        if regret_dtype not in REGRET_DTYPES:
+            raise ValueError(f"Unsupported regret dtype {regret_dtype}")
+        if average_dtype not in AVERAGE_DTYPES:
+            raise ValueError(f"Unsupported average strategy dtype {average_dtype}")
+        self.regret_dtype = np.dtype(regret_dtype)
+        self.average_dtype = np.dtype(average_dtype)
+        self.quantized_regrets: bool = self.regret_dtype.kind == "i"
+        self.quantized_average: bool = self.average_dtype.kind == "u"
+        self.floored: bool = self.quantized_regrets or regret_floor is not None
+        self.regret_scale: float = regret_scale if self.quantized_regrets else 1.0
+        self.average_scale: float = average_scale if self.quantized_average else 1.0
+
+        # Bounds of a stored regret, in storage units
+        if self.quantized_regrets:
+            info = np.iinfo(self.regret_dtype)
+            floor = DEFAULT_INT_REGRET_FLOOR
+            if regret_floor is not None:
+                floor = int(regret_floor * self.regret_scale)
+            self.regret_min = max(floor, int(info.min))
+            self.regret_max = int(info.max)
+        else:
+            info = np.finfo(self.regret_dtype)
+            self.regret_min = float(info.min)
+            if regret_floor is not None:
+                self.regret_min = max(float(regret_floor), self.regret_min)
+            self.regret_max = float(info.max)
+        if self.quantized_average:
+            self.average_max = float(np.iinfo(self.average_dtype).max)
+        else:
+            self.average_max = float(np.finfo(self.average_dtype).max)
+
+        # The cached current strategy only needs full precision when regrets have it
+        self.strategy_dtype = np.dtype(
+            np.float64 if self.regret_dtype == np.float64 else np.float32
+        )
+        self.rng = np.random.default_rng(seed)
+
+        # Infoset index: key -> row, plus the row layout in the flat arrays
+        self.index: Dict[Hashable, int] = {}
+        self.num_infosets: int = 0
+        self.num_entries: int = 0
+        self.offsets = np.zeros(capacity, dtype=np.int64)
+        self.sizes = np.zeros(capacity, dtype=np.uint8)
+        # Dirty bit per infoset: regrets changed since the strategy was cached
+        self.dirty = np.zeros(capacity, dtype=np.bool_)
+        # Action menus are shared between infosets and stored once
+        self.menus: List[list] = []
+        self.menu_index: Dict[tuple, int] = {}
+        self.menu_ids = np.zeros(capacity, dtype=np.uint32)
+        # Stable key hashes let a loaded checkpoint find rows without a Python index
+        self.hashes = np.zeros(capacity, dtype=np.uint64)
+        self.saved_hashes: Optional[np.ndarray] = None
+        self.saved_rows: Optional[np.ndarray] = None
+        # Keys are only needed to export strategies, so a loaded checkpoint reads them lazily
+        self._keys: Optional[List[Hashable]] = []
+        self.new_keys: List[Hashable] = []
+        self.keys_file: Optional[str] = None
+
+        entry_capacity = capacity * 4
+        self.regrets = np.zeros(entry_capacity, dtype=self.regret_dtype)
+        self.average = np.zeros(entry_capacity, dtype=self.average_dtype)
+        self.strategy = np.zeros(entry_capacity, dtype=self.strategy_dtype)
+
+    def __len__(self):
+        return self.num_infosets
+
+    def __contains__(self, key):
+        return self.lookup(key) is not None
+
+    @property
+    def keys(self) -> List[Hashable]:
+        """
+        Infoset keys in row order.
+        """
+        if self._keys is None:
+            self._keys = read_keys(self.keys_file)
+            self._keys.extend(self.new_keys)
+            self.new_keys = []
+        return self._keys
+
+    def lookup(self, key: Hashable) -> Optional[int]:
+        """
+        :return: The infoset index of key, or None if it has no row.
+        """
+        i = self.index.get(key)
+        if i is None and self.saved_hashes is not None:
+            h = np.uint64(stable_hash(key))
+            pos = int(np.searchsorted(self.saved_hashes, h))
+            if pos < len(self.saved_hashes) and self.saved_hashes[pos] == h:
+                i = int(self.saved_rows[pos])
+                self.index[key] = i
+        return i
+
+    def actions_of(self, i: int) -> list:
+        return self.menus[self.menu_ids[i]]
+
+    def add_infoset(self, key: Hashable, actions: list) -> int:
+        """
+        Allocate a row for a new infoset with a uniform current strategy.
+        :return: The infoset index.
+        """
+        i = self.lookup(key)
+        if i is not None:
+            return i
+        n = len(actions)
+        if n == 0 or n > 255:
+            raise ValueError(f"Infoset must have between 1 and 255 actions, got {n}")
+        i = self.num_infosets
+        if i == len(self.offsets):
+            self.offsets = self._grow(self.offsets, 2 * i)
+            self.sizes = self._grow(self.sizes, 2 * i)
+            self.dirty = self._grow(self.dirty, 2 * i)
+            self.menu_ids = self._grow(self.menu_ids, 2 * i)
+            self.hashes = self._grow(self.hashes, 2 * i)
+        o = self.num_entries
+        if o + n > len(self.regrets):
+            self._grow_entries(max(2 * len(self.regrets), o + n))
+        self.offsets[i] = o
+        self.sizes[i] = n
+        self.dirty[i] = False
+        self.strategy[o : o + n] = 1.0 / n
+        menu = tuple(actions)
+        if menu not in self.menu_index:
+            self.menu_index[menu] = len(self.menus)
+            self.menus.append(list(actions))
+        self.menu_ids[i] = self.menu_index[menu]
+        self.hashes[i] = stable_hash(key)
+        self.index[key] = i
+        if self._keys is None:
+            self.new_keys.append(key)
+        else:
+            self._keys.append(key)
+        self.num_infosets += 1
+        self.num_entries += n
+        return i
+
+    @staticmethod
+    def _grow(array: np.ndarray, size: int) -> np.ndarray:
+        grown = np.zeros(size, dtype=array.dtype)
+        grown[: len(array)] = array
+        return grown
+
+    def _grow_entries(self, size: int):
+        self.regrets = self._grow(self.regrets, size)
+        self.average = self._grow(self.average, size)
+        self.strategy = self._grow(self.strategy, size)
+
+    def row(self, i: int) -> slice:
+        o = int(self.offsets[i])
+        return slice(o, o + int(self.sizes[i]))
+
+    def _rows(self, i: int):
+        """
+        Writable (regrets, average, strategy) views of infoset i.
+        """
+        row = self.row(i)
+        return self.regrets[row], self.average[row], self.strategy[row]
+
+    def current_strategy(self, i: int) -> np.ndarray:
+        """
+        Regret-matching strategy of infoset i, recomputed only when its regrets are dirty.
+        """
+        regrets, _, strategy = self._rows(i)
+        if self.dirty[i]:
+            positive = np.maximum(regrets, 0).astype(np.float64)
+            total = positive.sum()
+            if total > 0:
+                strategy[:] = positive / total
+            else:
+                # If all regrets ≤ 0, use uniform strategy
+                strategy[:] = 1.0 / len(strategy)
+            self.dirty[i] = False
+        return strategy
+
+    def regret_row(self, i: int) -> np.ndarray:
+        """
+        Regrets of infoset i in regret units.
+        """
+        regrets = self._rows(i)[0].astype(np.float64)
+        if self.quantized_regrets:
+            regrets /= self.regret_scale
+        return regrets
+
+    def average_row(self, i: int) -> np.ndarray:
+        """
+        Unnormalized average-strategy mass of infoset i in probability units.
+        """
+        average = self._rows(i)[1].astype(np.float64)
+        if self.quantized_average:
+            average /= self.average_scale
+        return average
+
+    def add_regrets(self, i: int, deltas: np.ndarray):
+        """
+        Add regret deltas to infoset i, saturating at the floor and the dtype range.
+        """
+        regrets = self._rows(i)[0]
+        if self.regret_dtype == np.float64 and not self.floored:
+            regrets += deltas
+        elif self.quantized_regrets:
+            total = regrets.astype(np.int64)
+            total += np.rint(deltas * self.regret_scale).astype(np.int64)
+            regrets[:] = np.clip(total, self.regret_min, self.regret_max)
+        else:
+            total = regrets.astype(np.float64) + deltas
+            regrets[:] = np.clip(total, self.regret_min, self.regret_max)
+        self.dirty[i] = True
+
+    def add_average(self, i: int, deltas: np.ndarray):
+        """
+        Add average-strategy contributions to infoset i.
+        Quantized rows use stochastic rounding and are halved on overflow,
+        which keeps the normalized average strategy of the row.
+        """
+        average = self._rows(i)[1]
+        if self.average_dtype == np.float64:
+            average += deltas
+            return
+        total = average.astype(np.float64)
+        if self.quantized_average:
+            units = deltas * self.average_scale
+            total += np.floor(units + self.rng.random(len(units)))
+        else:
+            total += deltas
+        while total.max() > self.average_max:
+            total *= 0.5
+            if self.quantized_average:
+                total = np.floor(total)
+        average[:] = total
+
+    def average_strategy(self, i: int) -> np.ndarray:
+        """
+        Normalized average strategy of infoset i, uniform if it has no mass.
+        """
+        average = self._rows(i)[1].astype(np.float64)
+        total = average.sum()
+        if total > 0:
+            return average / total
+        return np.full(len(average), 1.0 / len(average))
+
+    def discount(self, pos_factor: float, neg_factor: float, avg_factor: float):
+        """
+        Apply DCFR discounting to every stored regret and average-strategy entry.
+        """
+        n = self.num_entries
+        zeroed = self._scale(
+            self.regrets[:n], self.average[:n], pos_factor, neg_factor, avg_factor
+        )
+        if zeroed is not None:
+            self.dirty[self.infosets_of(np.flatnonzero(zeroed))] = True
+
+    def infosets_of(self, entries: np.ndarray) -> np.ndarray:
+        """
+        Infoset index of each entry of the flat arrays; rows are laid out in
+        infoset order.
+        """
+        offsets = self.offsets[: self.num_infosets]
+        return np.searchsorted(offsets, entries, side="right") - 1
+
+    def _scale(self, regrets, average, pos_factor, neg_factor, avg_factor):
+        """
+        Scale positive and negative regrets and the average strategy in place.
+        The factors are scalars or arrays aligned with the entries.
+        Scaling keeps the ratios of positive regrets, so cached strategies stay
+        valid. Quantized regrets drift by at most a rounding unit, which is
+        accepted, but a positive regret rounded to zero leaves the strategy's
+        support.
+        :return: With quantized regrets, the mask of those entries, else None.
+        """
+        zeroed = None
+        if self.quantized_regrets:
+            scaled = regrets.astype(np.float64)
+            positive = scaled > 0
+            scaled *= np.where(positive, pos_factor, neg_factor)
+            regrets[:] = np.clip(np.rint(scaled), self.regret_min, self.regret_max)
+            zeroed = positive & (regrets <= 0)
+        else:
+            regrets *= np.where(regrets > 0, pos_factor, neg_factor).astype(
+                self.regret_dtype
+            )
+        if self.quantized_average:
+            scaled = average * avg_factor
+            average[:] = np.floor(scaled + self.rng.random(len(average)))
+        else:
+            average *= np.asarray(avg_factor, dtype=self.average_dtype)
+        return zeroed
+
+    def flush(self):
+        """
+        Bring the flat arrays up to date before they are read directly;
+        in-memory tables always are.
+        """
+
+    def nbytes(self) -> int:
+        """
+        Bytes used by the arrays of the stored infosets (excluding the Python key index).
+        """
+        i, n = self.num_infosets, self.num_entries
+        per_infoset = self.offsets.itemsize + self.sizes.itemsize + self.dirty.itemsize
+        per_entry = (
+            self.regrets.itemsize + self.average.itemsize + self.strategy.itemsize
+        )
+        return i * per_infoset + n * per_entry
+
+    def save(self, directory: str):
+        """
+        Write the tables to a directory of .npy files that load() can memory-map.
+        """
+        for name in STORAGE_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        # Sorted key hashes, for lookups without a Python index
+        order = np.argsort(self.hashes[: self.num_infosets], kind="stable")
+        np.save(os.path.join(directory, "hash_order.npy"), order)
+        np.save(
+            os.path.join(directory, "sorted_hashes.npy"),
+            self.hashes[: self.num_infosets][order],
+        )
+        with open(os.path.join(directory, "menus.pkl"), "wb") as f:
+            pickle.dump(self.menus, f)
+        keys_path = os.path.join(directory, "keys.pkl")
+        if self._keys is None:
+            # Append the new keys to the loaded key stream instead of reading it back
+            shutil.copyfile(self.keys_file, keys_path)
+            with open(keys_path, "ab") as f:
+                pickle.dump(self.new_keys, f)
+        else:
+            with open(keys_path, "wb") as f:
+                pickle.dump(self._keys, f)
+        meta = {
+            "regret_dtype": self.regret_dtype.name,
+            "average_dtype": self.average_dtype.name,
+            "floored": self.floored,
+            "regret_scale": self.regret_scale,
+            "average_scale": self.average_scale,
+            "regret_min": self.regret_min,
+            "regret_max": self.regret_max,
+            "num_infosets": self.num_infosets,
+            "num_entries": self.num_entries,
+            "rng_state": self.rng.bit_generator.state,
+        }
+        with open(os.path.join(directory, "storage.json"), "w") as f:
+            json.dump(meta, f)
+
+    def mark_saved(self, directory: str):
+        """
+        Record that a save() finished in directory, so later saves extend its key stream.
+        """
+        if self._keys is None:
+            self.keys_file = os.path.join(directory, "keys.pkl")
+            self.new_keys = []
+
+    @classmethod
+    def load(cls, directory: str) -> "RegretStorage":
+        """
+        Memory-map tables written by save(). Arrays are copy-on-write: pages are read
+        from disk on first touch and updates never modify the checkpoint files.
+        """
+        with open(os.path.join(directory, "storage.json")) as f:
+            meta = json.load(f)
+        storage = cls(
+            regret_dtype=meta["regret_dtype"],
+            average_dtype=meta["average_dtype"],
+            capacity=1,
+        )
+        storage.floored = meta["floored"]
+        storage.regret_scale = meta["regret_scale"]
+        storage.average_scale = meta["average_scale"]
+        storage.regret_min = meta["regret_min"]
+        storage.regret_max = meta["regret_max"]
+        storage.num_infosets = meta["num_infosets"]
+        storage.num_entries = meta["num_entries"]
+        storage.rng.bit_generator.state = meta["rng_state"]
+        for name in STORAGE_ARRAYS:
+            path = os.path.join(directory, f"{name}.npy")
+            setattr(storage, name, np.load(path, mmap_mode="c"))
+        storage.saved_rows = np.load(
+            os.path.join(directory, "hash_order.npy"), mmap_mode="r"
+        )
+        storage.saved_hashes = np.load(
+            os.path.join(directory, "sorted_hashes.npy"), mmap_mode="r"
+        )
+        with open(os.path.join(directory, "menus.pkl"), "rb") as f:
+            storage.menus = pickle.load(f)
+        storage.menu_index = {tuple(menu): m for m, menu in enumerate(storage.menus)}
+        storage._keys = None
+        storage.keys_file = os.path.join(directory, "keys.pkl")
+        return storage
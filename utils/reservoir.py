@@ -0,0 +1,87 @@
+import os
+from typing import Optional
+
+import numpy as np
+
+
+class ReservoirBuffer:
+    """
+    Fixed-size uniform sample of a stream of training examples (reservoir
+    sampling), stored in memory-mapped .npy files so memory is bounded by the
+    capacity, not by how many examples training produces.
+    - features: float32 array of shape (capacity, feature_size)
+    - targets: float32 array of shape (capacity, num_actions)
+    - masks: bool array of shape (capacity, num_actions), legal action slots
+    - weights: float32 array of shape (capacity,), e.g. the CFR iteration
+    - size: number of filled rows
+    - seen: number of examples offered so far
+    """
+
+    ARRAYS = ("features", "targets", "masks", "weights")
+
+    def __init__(
+        self,
+        directory: str,
+        capacity: int,
+        feature_size: int,
+        num_actions: int,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param directory: Directory of the backing files, created if missing.
+        :param capacity: Maximum number of examples kept.
+        """
+        self.directory = directory
+        self.capacity = capacity
+        self.size = 0
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+        os.makedirs(directory, exist_ok=True)
+        shapes = {
+            "features": ((capacity, feature_size), np.float32),
+            "targets": ((capacity, num_actions), np.float32),
+            "masks": ((capacity, num_actions), np.bool_),
+            "weights": ((capacity,), np.float32),
+        }
+        for name, (shape, dtype) in shapes.items():
+            path = os.path.join(directory, f"{name}.npy")
+            array = np.lib.format.open_memmap(
+                path, mode="w+", dtype=dtype, shape=shape
+            )
+            setattr(self, name, array)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, features: np.ndarray, target: np.ndarray, weight: float):
+        """
+        Offer one example; targets of illegal actions are NaN and masked out.
+        Once full, it replaces a random row with probability capacity / seen.
+        """
+        self.seen += 1
+        if self.size < self.capacity:
+            i = self.size
+            self.size += 1
+        else:
+            i = int(self.rng.integers(self.seen))
+            if i >= self.capacity:
+                return
+        mask = ~np.isnan(target)
+        self.features[i] = features
+        self.targets[i] = np.where(mask, target, 0.0)
+        self.masks[i] = mask
+        self.weights[i] = weight
+
+    def sample(self, batch_size: int) -> tuple:
+        """
+        :return: (features, targets, masks, weights) of a uniform random batch.
+        """
+        rows = np.sort(self.rng.integers(self.size, size=batch_size))
+        return tuple(getattr(self, name)[rows] for name in self.ARRAYS)
+
+    def flush(self):
+        for name in self.ARRAYS:
+            getattr(self, name).flush()
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
@@ -0,0 +1,181 @@
+import fcntl
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from typing import Callable, Dict, Iterable
+
+import numpy as np
+
+SEGMENT_MAGIC = b"PLSHARED"
+SEGMENT_VERSION = 1
+
+# magic, layout version, reserved, fingerprint of the contents, and the length
+# of the JSON directory of arrays that follows
+HEADER = struct.Struct("<8sII32sQ")
+
+# Arrays start on cache-line boundaries
+ALIGNMENT = 64
+
+# tmpfs, so segments live in memory and outlast the processes that built them
+SHARED_DIRECTORY = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) & ~(ALIGNMENT - 1)
+
+
+def fingerprint(version: str, paths: Iterable[str] = ()) -> bytes:
+    """
+    Identity of the contents of a segment: a version string chosen by the
+    caller (table format, abstraction, build parameters) and the path, size
+    and modification time of every file the tables were built from. Rebuilding
+    any of them changes the fingerprint.
+    """
+    digest = hashlib.sha256(f"{SEGMENT_VERSION}:{version}".encode())
+    for path in paths:
+        stat = os.stat(path)
+        source = f"{os.path.realpath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        digest.update(b"\0" + source.encode())
+    return digest.digest()
+
+
+def segment_path(name: str, digest: bytes, directory: str = SHARED_DIRECTORY) -> str:
+    return os.path.join(directory, f"{name}-{digest.hex()[:16]}.seg")
+
+
+def write_segment(path: str, arrays: Dict[str, np.ndarray], digest: bytes) -> str:
+    """
+    Write arrays to the segment file path, under a temporary name renamed
+    into place once complete, so no reader ever maps a partial segment.
+    :return: path.
+    """
+    entries = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        entries[name] = {
+            "dtype": np.asarray(array).dtype.str,
+            "shape": list(np.shape(array)),
+            "offset": offset,
+        }
+        offset += np.asarray(array).nbytes
+    directory = json.dumps(entries).encode()
+    start = _align(HEADER.size + len(directory))
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, 0, digest, len(directory)))
+        f.write(directory)
+        for name, array in arrays.items():
+            f.seek(start + entries[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(max(start + offset, f.tell()))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+class SharedTables:
+    """
+    Read-only arrays in a segment file mapped by every process that uses
+    them: bots and search workers on one host share a single physical copy,
+    however many of them attach. A segment is only attached if its
+    fingerprint matches the one expected, so tables built from other
+    artifacts or by another version of the code are never used.
+    - path: the segment file
+    - arrays: read-only view of each table, by name
+    """
+
+    def __init__(self, path: str, digest: bytes):
+        """
+        :param digest: The expected fingerprint, see fingerprint().
+        :raises ValueError: If the segment is not one or is stale.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._check(digest)
+        except ValueError:
+            self.buffer.close()
+            raise
+
+    def _check(self, digest: bytes):
+        if len(self.buffer) < HEADER.size:
+            raise ValueError(f"{self.path} is not a shared table segment")
+        magic, version, _, stored, length = HEADER.unpack_from(self.buffer, 0)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f"{self.path} is not a shared table segment")
+        if version != SEGMENT_VERSION:
+            raise ValueError(
+                f"Segment version {version} is not supported "
+                f"(expected {SEGMENT_VERSION})"
+            )
+        if stored != digest:
+            raise ValueError(f"{self.path} is stale: its fingerprint does not match")
+        entries = json.loads(self.buffer[HEADER.size : HEADER.size + length])
+        start = _align(HEADER.size + length)
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, entry in entries.items():
+            dtype = np.dtype(entry["dtype"])
+            shape = tuple(entry["shape"])
+            count = int(np.prod(shape, dtype=np.int64))
+            self.arrays[name] = np.frombuffer(
+                self.buffer, dtype, count, start + entry["offset"]
+            ).reshape(shape)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.arrays
+
+    def close(self):
+        """
+        Unmap the segment; views of its arrays must be dropped first.
+        """
+        self.arrays = {}
+        self.buffer.close()
+
+
+def attach(
+    name: str,
+    digest: bytes,
+    build: Callable[[], Dict[str, np.ndarray]],
+    directory: str = SHARED_DIRECTORY,
+) -> SharedTables:
+    """
+    Attach the segment name with fingerprint digest, building and publishing
+    it first if no process on the host has. Concurrent callers build it once:
+    the others wait and attach the result. Segments of the same name with any
+    other fingerprint are stale and removed; processes still mapping them keep
+    their copy until they unmap it.
+    :param build: Computes the tables, by name.
+    """
+    path = segment_path(name, digest, directory)
+    try:
+        return SharedTables(path, digest)
+    except FileNotFoundError:
+        pass
+    with open(os.path.join(directory, f"{name}.lock"), "wb") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not os.path.exists(path):
+            write_segment(path, build(), digest)
+            for stale in glob.glob(os.path.join(directory, f"{name}-*.seg")):
+                if stale != path:
+                    remove(stale)
+    return SharedTables(path, digest)
+
+
+def remove(path: str):
+    """
+    Delete a segment, freeing its memory once no process maps it.
+    """
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
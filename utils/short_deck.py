@@ -0,0 +1,234 @@
+from functools import lru_cache
+from itertools import combinations_with_replacement
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from utils.public_tree import PublicGame, PublicNode
+
+
+# The tournament deck: 27 cards, ranks 2-9 and A in three suits. Card c has
+# rank RANKS[c % 9] and suit SUITS[c // 9], as in the tournament engine.
+RANKS = "23456789A"
+SUITS = "dhs"
+NUM_RANKS = len(RANKS)
+NUM_SUITS = len(SUITS)
+NUM_CARDS = len(RANKS) * len(SUITS)
+
+# With three suits no rank has more than three cards, so the rank counts of a
+# hand are the digits of a base-4 number
+COUNT_BASE = 4
+
+HIGH_CARD = 0
+PAIR = 1
+TWO_PAIR = 2
+THREE_OF_KIND = 3
+STRAIGHT = 4
+FLUSH = 5
+FULL_HOUSE = 6
+FOUR_OF_KIND = 7
+STRAIGHT_FLUSH = 8
+
+# Straights as (rank bitmask, top rank), best first. The engine scores hands
+# with standard 52-card rules, so 6-7-8-9-A is not a straight but A-2-3-4-5 is.
+STRAIGHTS = [(0b11111 << low, low + 4) for low in range(NUM_RANKS - 6, -1, -1)]
+STRAIGHTS.append(((1 << (NUM_RANKS - 1)) | 0b1111, 3))
+
+
+def card_rank(card: int) -> int:
+    return card % NUM_RANKS
+
+
+def card_suit(card: int) -> int:
+    return card // NUM_RANKS
+
+
+def card_str(card: int) -> str:
+    return RANKS[card_rank(card)] + SUITS[card_suit(card)]
+
+
+def _straight_top(rank_mask: int) -> int:
+    for mask, top in STRAIGHTS:
+        if rank_mask & mask == mask:
+            return top
+    return -1
+
+
+def _score(category: int, ranks: Sequence[int]) -> int:
+    score = category
+    for i in range(5):
+        score = score * 16 + (ranks[i] if i < len(ranks) else 0)
+    return score
+
+
+def flush_strength(suit_mask: int) -> int:
+    """
+    Strength of the best five-card hand among five or more cards of one
+    suit, given as the bitmask of their ranks.
+    """
+    top = _straight_top(suit_mask)
+    if top >= 0:
+        return _score(STRAIGHT_FLUSH, [top])
+    flush = [r for r in range(NUM_RANKS - 1, -1, -1) if suit_mask >> r & 1]
+    return _score(FLUSH, flush[:5])
+
+
+def rank_strength(counts: Sequence[int]) -> int:
+    """
+    Strength of the best five-card hand without a flush among cards with
+    counts[r] cards of rank r.
+    """
+    # Ranks by multiplicity, then rank
+    groups = sorted(((n, r) for r, n in enumerate(counts) if n), reverse=True)
+    if groups[0][0] == 4:
+        kicker = max(r for n, r in groups[1:])
+        return _score(FOUR_OF_KIND, [groups[0][1], kicker])
+    if groups[0][0] == 3 and len(groups) > 1 and groups[1][0] >= 2:
+        return _score(FULL_HOUSE, [groups[0][1], groups[1][1]])
+    rank_mask = sum(1 << r for n, r in groups)
+    top = _straight_top(rank_mask)
+    if top >= 0:
+        return _score(STRAIGHT, [top])
+    singles = sorted((r for n, r in groups if n == 1), reverse=True)
+    if groups[0][0] == 3:
+        return _score(THREE_OF_KIND, [groups[0][1]] + singles[:2])
+    if groups[0][0] == 2 and len(groups) > 1 and groups[1][0] == 2:
+        # A third pair can play as the kicker
+        kicker = max(r for n, r in groups[2:])
+        return _score(TWO_PAIR, [groups[0][1], groups[1][1], kicker])
+    if groups[0][0] == 2:
+        return _score(PAIR, [groups[0][1]] + singles[:3])
+    return _score(HIGH_CARD, singles[:5])
+
+
+def hand_strength(cards: Sequence[int]) -> int:
+    """
+    Strength of the best five-card hand among 5 to 7 cards; higher is better
+    and equal strengths tie.
+    """
+    counts = [0] * NUM_RANKS
+    suit_masks = [0, 0, 0]
+    for c in cards:
+        r = card_rank(c)
+        counts[r] += 1
+        suit_masks[card_suit(c)] |= 1 << r
+
+    for mask in suit_masks:
+        if bin(mask).count("1") >= 5:
+            return flush_strength(mask)
+    return rank_strength(counts)
+
+
+@lru_cache(maxsize=None)
+def _strength_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (rank_strengths, flush_strengths): rank_strength of every rank count code
+    of 5 to 7 cards, and flush_strength of every suit rank mask (0 below five
+    cards).
+    """
+    rank_strengths = np.zeros(COUNT_BASE**NUM_RANKS, dtype=np.int64)
+    for n in (5, 6, 7):
+        for ranks in combinations_with_replacement(range(NUM_RANKS), n):
+            counts = [ranks.count(r) for r in range(NUM_RANKS)]
+            if max(counts) < COUNT_BASE:
+                code = sum(c * COUNT_BASE**r for r, c in enumerate(counts))
+                rank_strengths[code] = rank_strength(counts)
+    flush_strengths = np.zeros(1 << NUM_RANKS, dtype=np.int64)
+    for mask in range(1 << NUM_RANKS):
+        if bin(mask).count("1") >= 5:
+            flush_strengths[mask] = flush_strength(mask)
+    return rank_strengths, flush_strengths
+
+
+def evaluate(cards: np.ndarray) -> np.ndarray:
+    """
+    hand_strength of many hands at once.
+    :param cards: Shape (..., n) for hands of n = 5 to 7 distinct cards.
+    :return: Shape (...).
+    """
+    cards = np.asarray(cards, dtype=np.int64)
+    ranks = cards % NUM_RANKS
+    suits = cards // NUM_RANKS
+    rank_strengths, flush_strengths = _strength_tables()
+    strengths = rank_strengths[(COUNT_BASE**ranks).sum(axis=-1)]
+    bits = 1 << ranks
+    for suit in range(NUM_SUITS):
+        mask = np.where(suits == suit, bits, 0).sum(axis=-1)
+        # A flush is never beaten by the same cards without it: no full house
+        # or four of a kind fits beside five suited cards in this deck
+        np.maximum(strengths, flush_strengths[mask], out=strengths)
+    return strengths
+
+
+class ShortDeckGame(PublicGame):
+    """
+    The heads-up tournament game without discards: 27-card deck, two hole cards,
+    blinds 1/2, a 100-chip bet cap and the engine's raise rules. Player 0 is the
+    small blind and acts first on every street. Raises are abstracted to pot
+    fractions plus all-in.
+    - raise_fractions: raise increments as fractions of the pot after calling
+    - evaluator: direct-lookup evaluator for showdowns (see
+      utils.short_deck_tables), or None to evaluate hands as they come
+    """
+
+    num_cards = NUM_CARDS
+    hole_cards = 2
+    board_cards = (0, 3, 1, 1)
+    initial_bets = (1, 2)
+    max_bet = 100
+    big_blind = 2
+    num_suits = len(SUITS)
+
+    def __init__(
+        self,
+        raise_fractions: Sequence[float] = (1.0,),
+        max_raises: int = 2,
+        all_in: bool = True,
+        evaluator=None,
+    ):
+        self.raise_fractions = tuple(raise_fractions)
+        self.max_raises = max_raises
+        self.all_in = all_in
+        self.evaluator = evaluator
+        super().__init__()
+
+    def strength(self, hand: tuple, board: tuple) -> int:
+        return hand_strength(hand + board)
+
+    def strengths(self, board: tuple, live: np.ndarray) -> np.ndarray:
+        if self.evaluator is not None:
+            ranks = self.evaluator.hand_ranks(np.array([board]))[0]
+            return ranks.astype(np.int64) * live
+        hands = self.hand_cards[live]
+        cards = np.empty((len(hands), self.hole_cards + len(board)), np.int64)
+        cards[:, : self.hole_cards] = hands
+        cards[:, self.hole_cards :] = board
+        strengths = np.zeros(self.num_hands, dtype=np.int64)
+        strengths[live] = evaluate(cards)
+        return strengths
+
+    def raise_sizes(self, node: PublicNode) -> List[int]:
+        p, bets = node.player, node.bets
+        call = bets[1 - p]
+        largest = self.max_bet - call
+        smallest = min(node.min_raise, largest)
+        pot = 2 * call
+        totals = {
+            call + max(smallest, min(largest, round(f * pot)))
+            for f in self.raise_fractions
+        }
+        if self.all_in:
+            totals.add(self.max_bet)
+        return sorted(t for t in totals if t > call)
+
+    def next_min_raise(self, node: PublicNode, total: int) -> int:
+        # The engine adds the street's earlier raises to the last raise
+        call = node.bets[1 - node.player]
+        raised_so_far = call - node.street_start
+        return min(raised_so_far + total - call, self.max_bet - total)
+
+    def card_suit(self, card: int) -> int:
+        return card_suit(card)
+
+    def with_suit(self, card: int, suit: int) -> int:
+        return suit * NUM_RANKS + card_rank(card)
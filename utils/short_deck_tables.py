@@ -0,0 +1,287 @@
+from itertools import chain, combinations
+from math import comb
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.short_deck import NUM_CARDS, ShortDeckGame, evaluate
+
+NUM_SEVEN_CARD_HANDS = comb(NUM_CARDS, 7)
+
+# BINOMIAL[n, k] = C(n, k); a sorted card set c_0 < ... < c_k-1 has the
+# colexicographic index sum of C(c_i, i + 1)
+BINOMIAL = np.array(
+    [[comb(n, k) for k in range(8)] for n in range(NUM_CARDS + 1)], dtype=np.int64
+)
+
+# Artifact names of the tables (see utils.artifacts)
+RANK_TABLE = "short_deck_ranks.npy"
+FLOPS = "short_deck_flops.npy"
+FLOP_EQUITY = "short_deck_flop_equity.npy"
+PREFLOP_EQUITY = "short_deck_preflop_equity.npy"
+FLOP_BUCKETS = "short_deck_flop_buckets.npy"
+PREFLOP_BUCKETS = "short_deck_preflop_buckets.npy"
+TABLES = (RANK_TABLE, FLOPS, FLOP_EQUITY, PREFLOP_EQUITY, FLOP_BUCKETS, PREFLOP_BUCKETS)
+
+
+def colex_index(cards: np.ndarray) -> np.ndarray:
+    """
+    Colexicographic index of sorted card sets of shape (..., k).
+    """
+    positions = np.arange(1, cards.shape[-1] + 1)
+    return BINOMIAL[cards, positions].sum(axis=-1)
+
+
+def build_rank_table(chunk: int = 1 << 17) -> np.ndarray:
+    """
+    Dense rank of every 7-card hand of the deck by colex index, from 1 for
+    the weakest: C(27, 7) = 888,030 uint16 entries.
+    """
+    hands = np.fromiter(
+        chain.from_iterable(combinations(range(NUM_CARDS), 7)),
+        dtype=np.int8,
+        count=7 * NUM_SEVEN_CARD_HANDS,
+    ).reshape(-1, 7)
+    strengths = np.empty(NUM_SEVEN_CARD_HANDS, dtype=np.int64)
+    index = np.empty(NUM_SEVEN_CARD_HANDS, dtype=np.int64)
+    for start in range(0, NUM_SEVEN_CARD_HANDS, chunk):
+        cards = hands[start : start + chunk].astype(np.int64)
+        strengths[start : start + chunk] = evaluate(cards)
+        index[start : start + chunk] = colex_index(cards)
+    _, dense = np.unique(strengths, return_inverse=True)
+    table = np.zeros(NUM_SEVEN_CARD_HANDS, dtype=np.uint16)
+    table[index] = dense + 1
+    return table
+
+
+def _below_and_equal(
+    groups: np.ndarray, width: int, values: np.ndarray, rows: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For each value, the entries of groups[row] below it and equal to it, from
+    one sort of every row.
+    :param groups: Shape (rows, n), entries in [0, width).
+    :param values: Looked up in the rows of rows, which broadcasts with it.
+    """
+    offsets = width * np.arange(len(groups))[:, None]
+    ordered = np.sort(groups + offsets, axis=None)
+    keys = values + width * rows
+    first = rows * groups.shape[1]
+    below = np.searchsorted(ordered, keys, "left") - first
+    equal = np.searchsorted(ordered, keys, "right") - first - below
+    return below, equal
+
+
+class ShortDeckEvaluator:
+    """
+    Direct-lookup evaluator of the 27-card deck: one table read per 7-card
+    hand, with no sorting of ranks or suits. Ranks order hands like
+    hand_strength, which scores them with the engine's standard rules.
+    Hands are those of ShortDeckGame, in its order.
+    - ranks: rank of each 7-card hand by colex index (see build_rank_table),
+      e.g. mapped from artifacts
+    - hand_cards: the cards of each two-card hand
+    - card_hands[c]: the hands holding card c
+    """
+
+    def __init__(self, ranks: Optional[np.ndarray] = None):
+        self.ranks = ranks if ranks is not None else build_rank_table()
+        self.hand_cards = np.array(list(combinations(range(NUM_CARDS), 2)))
+        self.num_hands = len(self.hand_cards)
+        holds = (self.hand_cards[None, :, :] == np.arange(NUM_CARDS)[:, None, None])
+        self.card_hands = np.array([np.flatnonzero(h.any(axis=1)) for h in holds])
+
+    def rank(self, cards: np.ndarray) -> np.ndarray:
+        """
+        Ranks of 7-card hands of shape (..., 7), in any order.
+        """
+        return self.ranks[colex_index(np.sort(np.asarray(cards), axis=-1))]
+
+    def hand_ranks(self, boards: np.ndarray, hand_cards=None) -> np.ndarray:
+        """
+        Rank of every hand on every full board, 0 for hands holding a board
+        card.
+        :param boards: Shape (boards, 5).
+        :param hand_cards: Shape (hands, 2), by default every hand.
+        :return: Shape (boards, hands).
+        """
+        hand_cards = self.hand_cards if hand_cards is None else hand_cards
+        boards = np.asarray(boards, dtype=np.int64)
+        cards = np.empty((len(boards), len(hand_cards), 7), dtype=np.int64)
+        cards[:, :, :2] = hand_cards
+        cards[:, :, 2:] = boards[:, None, :]
+        cards.sort(axis=-1)
+        # A repeated card shows up next to itself once sorted
+        blocked = (cards[..., 1:] == cards[..., :-1]).any(axis=-1)
+        ranks = self.ranks[np.where(blocked, 0, colex_index(cards))]
+        ranks[blocked] = 0
+        return ranks
+
+    def equity(self, ranks: np.ndarray) -> np.ndarray:
+        """
+        Showdown equity of every hand against a uniformly random opponent
+        hand, (wins + ties / 2) / opponents, on each board. Hands are counted
+        by sorting ranks once per board and per board card group, and hands
+        sharing a card with the hand are removed by inclusion-exclusion over
+        its two cards, so no hands x hands comparison is made.
+        :param ranks: hand_ranks() of every hand, shape (boards, hands).
+        :return: Shape (boards, hands), 0 for blocked hands.
+        """
+        ranks = ranks.astype(np.int64)
+        live = ranks > 0
+        boards = np.arange(len(ranks))[:, None]
+        width = int(ranks.max()) + 1
+        # Blocked hands rank 0, below every live hand
+        wins, ties = _below_and_equal(ranks, width, ranks, boards)
+        wins = wins - (~live).sum(axis=1, keepdims=True)
+        opponents = live.sum(axis=1, keepdims=True)
+        held = ranks[:, self.card_hands]
+        blocked = (held == 0).sum(axis=-1)
+        groups = held.reshape(-1, held.shape[-1])
+        for i in range(2):
+            card = self.hand_cards[:, i]
+            below, equal = _below_and_equal(
+                groups, width, ranks, boards * NUM_CARDS + card
+            )
+            wins = wins - (below - blocked[:, card])
+            ties = ties - equal
+            opponents = opponents - (held.shape[-1] - blocked[:, card])
+        # The hand itself holds both its cards and was removed twice
+        ties = ties + 1
+        opponents = opponents + 1
+        equity = (wins + ties / 2) / np.maximum(opponents, 1)
+        return np.where(live, equity, 0.0)
+
+    def runout_equity(self, board: tuple, chunk: int = 512) -> np.ndarray:
+        """
+        Equity of every hand on a board of 3 to 5 cards, averaged over every
+        way to complete it that misses the hand, in batches of chunk boards.
+        :return: Shape (hands,), 0 for blocked hands.
+        """
+        rest = [c for c in range(NUM_CARDS) if c not in board]
+        boards = np.array(
+            [board + cards for cards in combinations(rest, 5 - len(board))]
+        )
+        total = np.zeros(self.num_hands)
+        live = np.zeros(self.num_hands)
+        for start in range(0, len(boards), chunk):
+            ranks = self.hand_ranks(boards[start : start + chunk])
+            total += self.equity(ranks).sum(0)
+            live += (ranks > 0).sum(0)
+        return total / np.maximum(live, 1)
+
+
+def canonical_flops(game: ShortDeckGame) -> Tuple[np.ndarray, Dict[tuple, int]]:
+    """
+    One flop per class of suit-isomorphic flops.
+    :return: (flops of shape (classes, 3), class of every flop by sorted cards).
+    """
+    classes: Dict[tuple, int] = {}
+    flops: List[tuple] = []
+    of_flop: Dict[tuple, int] = {}
+    for flop in combinations(range(NUM_CARDS), 3):
+        canonical, _ = game.canonical_board(flop)
+        if canonical not in classes:
+            classes[canonical] = len(flops)
+            flops.append(canonical)
+        of_flop[flop] = classes[canonical]
+    return np.array(flops, dtype=np.int8), of_flop
+
+
+def equity_buckets(equity: np.ndarray, valid: np.ndarray, k: int) -> np.ndarray:
+    """
+    Bucket of every entry of equity among k of equal mass over the valid
+    entries; -1 where invalid.
+    """
+    edges = np.quantile(equity[valid], np.arange(1, k) / k)
+    buckets = np.searchsorted(edges, equity, side="right").astype(np.int16)
+    return np.where(valid, buckets, -1).astype(np.int16)
+
+
+def build_tables(
+    game: ShortDeckGame,
+    evaluator: ShortDeckEvaluator,
+    flop_buckets: int = 50,
+    preflop_buckets: int = 8,
+) -> Dict[str, np.ndarray]:
+    """
+    Equity and bucket tables of the deck, by artifact name: equity against a
+    random hand at showdown of every hand on every canonical flop, averaged
+    over the turn and river, and preflop over every flop; and equal-mass
+    equity buckets of both.
+    """
+    flops, of_flop = canonical_flops(game)
+    flop_equity = np.stack(
+        [evaluator.runout_equity(tuple(int(c) for c in flop)) for flop in flops]
+    ).astype(np.float32)
+    total = np.zeros(game.num_hands)
+    count = np.zeros(game.num_hands)
+    for flop, c in of_flop.items():
+        _, cards = game.canonical_board(flop)
+        live = game._live(flop)
+        total += np.where(live, flop_equity[c][game.hand_permutation(cards)], 0.0)
+        count += live
+    preflop_equity = (total / count).astype(np.float32)
+    on_flop = np.stack([game._live(tuple(int(c) for c in flop)) for flop in flops])
+    return {
+        FLOPS: flops,
+        FLOP_EQUITY: flop_equity,
+        PREFLOP_EQUITY: preflop_equity,
+        FLOP_BUCKETS: equity_buckets(flop_equity, on_flop, flop_buckets),
+        PREFLOP_BUCKETS: equity_buckets(
+            preflop_equity, np.ones(game.num_hands, bool), preflop_buckets
+        ),
+    }
+
+
+class ShortDeckTables:
+    """
+    Lookups of the equity and bucket tables built by build_tables: preflop
+    and flop entries are read from the tables through the flop's suit
+    isomorphism class; turn and river equities are computed on the spot by
+    the evaluator, which takes milliseconds.
+    - game: the game whose hands index the tables
+    - classes: class of each canonical flop
+    """
+
+    def __init__(
+        self,
+        game: ShortDeckGame,
+        evaluator: ShortDeckEvaluator,
+        tables: Dict[str, np.ndarray],
+    ):
+        self.game = game
+        self.evaluator = evaluator
+        self.tables = tables
+        self.classes = {
+            tuple(int(c) for c in flop): i for i, flop in enumerate(tables[FLOPS])
+        }
+
+    def _flop_entry(self, hand: tuple, flop: tuple) -> Tuple[int, int]:
+        canonical, cards = self.game.canonical_board(flop)
+        mapped = tuple(sorted(int(cards[c]) for c in hand))
+        return self.classes[canonical], self.game.hand_index[mapped]
+
+    def equity(self, hand: tuple, board: tuple = ()) -> float:
+        """
+        Equity of hand against a random hand at showdown on board (0 to 5
+        cards).
+        """
+        if not board:
+            return float(self.tables[PREFLOP_EQUITY][self.game.hand_index[hand]])
+        if len(board) == 3:
+            c, h = self._flop_entry(hand, board)
+            return float(self.tables[FLOP_EQUITY][c, h])
+        equity = self.evaluator.runout_equity(tuple(board))
+        return float(equity[self.game.hand_index[hand]])
+
+    def bucket(self, hand: tuple, board: tuple = ()) -> int:
+        """
+        Equity bucket of hand preflop or on a flop.
+        """
+        if not board:
+            return int(self.tables[PREFLOP_BUCKETS][self.game.hand_index[hand]])
+        if len(board) != 3:
+            raise ValueError("Bucket tables cover the preflop and the flop only")
+        c, h = self._flop_entry(hand, board)
+        return int(self.tables[FLOP_BUCKETS][c, h])
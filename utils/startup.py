@@ -0,0 +1,65 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Standard library only: this module is imported before the startup clock
+# has anything heavy to measure
+
+logger = logging.getLogger(__name__)
+
+
+def process_age() -> Optional[float]:
+    """
+    Seconds since this process started, from /proc; None where unavailable.
+    Covers the interpreter's own start-up, which no in-process timer sees.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; fields resume after ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        started = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return max(0.0, uptime - started)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Startup:
+    """
+    Wall time of each phase of a bot's start-up, reported once it is ready
+    to serve.
+    - phases: seconds spent in each named phase, in order
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        # Time the process spent before this object existed
+        age = process_age()
+        self._before = age if age is not None else 0.0
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def total(self) -> float:
+        """
+        Seconds from process start (when known) until now.
+        """
+        return self._before + time.perf_counter() - self._start
+
+    def report(self) -> dict:
+        """
+        Log and return the start-up times.
+        """
+        record = {"total": self.total(), "before": self._before, **self.phases}
+        details = ", ".join(f"{name} {s:.3f}" for name, s in self.phases.items())
+        logger.info(f"Started in {record['total']:.3f} s ({details})")
+        return record
@@ -0,0 +1,129 @@
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.public_tree import PublicGame, PublicNode
+
+
+def amount_bucket(amount: int, ratio: float = 1.25) -> int:
+    """
+    Geometric bucket of a chip amount: amounts within a factor of ratio share
+    a bucket. Zero has its own bucket.
+    """
+    if amount <= 0:
+        return -1
+    return int(math.log(amount, ratio))
+
+
+def public_state_key(
+    game: PublicGame,
+    node: PublicNode,
+    board: tuple,
+    pot: Optional[int] = None,
+    stack: Optional[int] = None,
+    ratio: float = 1.25,
+) -> Tuple[tuple, np.ndarray]:
+    """
+    Canonical key of a public state: the isomorphism class of the board, the
+    betting sequence, and buckets of the pot and of the effective stack. Pot
+    and stack default to what the node's bets imply; engines whose amounts the
+    action abstraction only approximates pass their own.
+    :return: (key, card map from board to its canonical board), see
+        PublicGame.canonical_board.
+    """
+    canonical, cards = game.canonical_board(board)
+    if pot is None:
+        pot = sum(node.bets)
+    if stack is None:
+        stack = game.max_bet - max(node.bets)
+    key = (
+        canonical,
+        tuple(node.history),
+        amount_bucket(pot, ratio),
+        amount_bucket(stack, ratio),
+    )
+    return key, cards
+
+
+def _tuples(value):
+    # JSON turns the tuples of keys into lists
+    if isinstance(value, list):
+        return tuple(_tuples(v) for v in value)
+    return value
+
+
+class SubgameCache:
+    """
+    Least-recently-used cache of solved subgame strategies (hands x actions
+    arrays in canonical suits), so spots that recur within and across matches
+    reuse an earlier search. Entries are only valid for the blueprint and
+    abstraction they were solved with.
+    - capacity: maximum number of entries kept in memory
+    - path: .npz file the cache is loaded from and saved to, or None
+    - hits / misses: lookup counts
+    Lookups and insertions are thread-safe, so a pondering thread can fill
+    the cache while the main thread reads it.
+    """
+
+    def __init__(self, capacity: int = 10_000, path: Optional[str] = None):
+        self.capacity = capacity
+        self.path = path
+        self.entries: "OrderedDict[Hashable, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            strategy = self.entries.get(key)
+            if strategy is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return strategy
+
+    def put(self, key: Hashable, strategy: np.ndarray):
+        with self._lock:
+            self.entries[key] = strategy
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def save(self, path: Optional[str] = None):
+        """
+        Atomically write the entries, least recently used first, to path (by
+        default the cache's own).
+        """
+        path = path if path is not None else self.path
+        with self._lock:
+            keys = json.dumps(list(self.entries))
+            arrays = {f"s{i}": s for i, s in enumerate(self.entries.values())}
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, keys=np.array(keys), **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def load(self, path: str):
+        """
+        Add the entries saved at path, as most recently used.
+        """
+        with np.load(path) as data:
+            keys: Sequence = json.loads(str(data["keys"]))
+            for i, key in enumerate(keys):
+                self.put(_tuples(key), data[f"s{i}"])
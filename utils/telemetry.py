@@ -0,0 +1,170 @@
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, TextIO
+
+
+# Hot-path sections timed while telemetry is enabled
+CHANCE_SAMPLING = "chance_sampling"
+INFOSET_KEYING = "infoset_keying"
+REGRET_MATCHING = "regret_matching"
+NEXT_STATE = "next_state"
+TERMINAL = "terminal"
+
+
+def rss_bytes() -> int:
+    """
+    Resident set size of this process, or its peak where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class Telemetry:
+    """
+    Opt-in training instrumentation. Counters and per-section times accumulate
+    between reports; every `every` iterations one JSON object is appended to
+    the log with rates over the interval since the previous report.
+    Trainers only touch it once per iteration when it is disabled (None), and
+    route the hot path through ProfiledNode and timed() when it is enabled.
+    - path: JSON-lines log file, appended to
+    - every: iterations between reports
+    """
+
+    def __init__(self, path: str, every: int = 100):
+        self.path = path
+        self.every = every
+        self.counters: Dict[str, int] = {}
+        self.seconds: Dict[str, float] = {}
+        self._file: Optional[TextIO] = None
+        self._last_time = time.perf_counter()
+        self._last_iteration = 0
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_time(self, section: str, seconds: float):
+        self.seconds[section] = self.seconds.get(section, 0.0) + seconds
+
+    def timed(self, section: str, fn: Callable) -> Callable:
+        """
+        Wrap fn so that its wall time is added to section.
+        """
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add_time(section, time.perf_counter() - start)
+
+        return wrapper
+
+    @contextmanager
+    def patch(self, obj, method: str, section: str):
+        """
+        Time obj.method under section for the duration of the block.
+        """
+        setattr(obj, method, self.timed(section, getattr(obj, method)))
+        try:
+            yield
+        finally:
+            delattr(obj, method)
+
+    def start(self, iteration: int):
+        """
+        Begin a reporting interval at iteration (the last finished one).
+        """
+        self._last_iteration = iteration
+        self._last_time = time.perf_counter()
+        self.counters.clear()
+        self.seconds.clear()
+
+    def iteration_done(self, iteration: int, storage=None) -> Optional[dict]:
+        """
+        Record that iteration finished and report if one is due.
+        :param storage: The trainer's regret storage, for table size.
+        :return: The report written, if any.
+        """
+        if iteration % self.every != 0:
+            return None
+        now = time.perf_counter()
+        elapsed = now - self._last_time
+        iterations = iteration - self._last_iteration
+        record = {
+            "time": time.time(),
+            "iteration": iteration,
+            "iterations_per_sec": iterations / elapsed if elapsed > 0 else None,
+            "nodes_per_iteration": self.counters.get("nodes", 0) / iterations,
+            "terminal_evaluations": self.counters.get("terminals", 0),
+            "rss_bytes": rss_bytes(),
+            "seconds": dict(self.seconds),
+        }
+        record["seconds"]["total"] = elapsed
+        if storage is not None:
+            record["infosets"] = len(storage)
+            record["table_bytes"] = storage.nbytes()
+        self.write(record)
+        self.start(iteration)
+        return record
+
+    def write(self, record: dict):
+        if self._file is None:
+            self._file = open(self.path, "a")
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ProfiledNode:
+    """
+    Proxy of a game node that times chance sampling, infoset keying, payoffs
+    and next_state, and counts visited nodes and terminal evaluations.
+    Children are wrapped too, so wrapping the root profiles a whole traversal.
+    """
+
+    __slots__ = ("node", "telemetry")
+
+    def __init__(self, node, telemetry: Telemetry):
+        self.node = node
+        self.telemetry = telemetry
+
+    def __getattr__(self, name):
+        return getattr(self.node, name)
+
+    def sample_action(self):
+        start = time.perf_counter()
+        action = self.node.sample_action()
+        self.telemetry.add_time(CHANCE_SAMPLING, time.perf_counter() - start)
+        return action
+
+    def next_state(self, action) -> "ProfiledNode":
+        start = time.perf_counter()
+        child = self.node.next_state(action)
+        self.telemetry.add_time(NEXT_STATE, time.perf_counter() - start)
+        self.telemetry.count("nodes")
+        return ProfiledNode(child, self.telemetry)
+
+    def infoset(self, player):
+        start = time.perf_counter()
+        key = self.node.infoset(player)
+        self.telemetry.add_time(INFOSET_KEYING, time.perf_counter() - start)
+        return key
+
+    def payoff(self, p):
+        start = time.perf_counter()
+        value = self.node.payoff(p)
+        self.telemetry.add_time(TERMINAL, time.perf_counter() - start)
+        self.telemetry.count("terminals")
+        return value
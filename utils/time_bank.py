@@ -0,0 +1,114 @@
+import math
+from typing import Sequence
+
+import numpy as np
+
+
+def spot_difficulty(probs: Sequence[float]) -> float:
+    """
+    Normalized entropy of the blueprint's action distribution at a spot: 0
+    when the blueprint is certain (a preflop fold of a weak hand), 1 when it
+    is indifferent between every action.
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    if len(probs) < 2:
+        return 0.0
+    positive = probs[probs > 0]
+    entropy = -float((positive * np.log(positive)).sum())
+    return entropy / math.log(len(probs))
+
+
+class TimeBank:
+    """
+    Schedules think time against the match's time bank, which the harness
+    (TIME_LIMIT_SECONDS in aipoker's match.py) charges for every get_action
+    and whose exhaustion forfeits the match. What is left, minus a reserve,
+    is spread evenly over the hands left. Within a hand each decision gets a
+    share weighted by its street, pot and difficulty, relative to the total
+    weight a hand has needed so far. Decisions whose share is too small to
+    search are answered from the blueprint.
+    - total: seconds of the whole match
+    - num_hands: hands in the match
+    - used: seconds charged so far
+    - hand_number: index of the current hand
+    - weight_per_hand: running average of the decision weight of a hand
+    """
+
+    def __init__(
+        self,
+        total: float = 500.0,
+        num_hands: int = 1000,
+        reserve: float = 0.1,
+        overhead: float = 0.01,
+        min_search: float = 0.02,
+        max_budget: float = 3.0,
+        street_weights: Sequence[float] = (0.25, 1.0, 1.5, 1.25),
+        pot_scale: float = 40.0,
+        decay: float = 0.05,
+    ):
+        """
+        :param reserve: Fraction of the bank never scheduled, for network delays.
+        :param overhead: Seconds charged per decision beyond our own computation.
+        :param min_search: Smallest budget worth a search; lower ones become 0.
+        :param max_budget: Upper bound of any decision, below the harness's
+            5 s request timeout.
+        :param street_weights: Weight of a decision on each street.
+        :param pot_scale: Pot at which a decision weighs double.
+        :param decay: Weight of the latest hand in weight_per_hand.
+        """
+        self.total = total
+        self.num_hands = num_hands
+        self.reserve = reserve
+        self.overhead = overhead
+        self.min_search = min_search
+        self.max_budget = max_budget
+        self.street_weights = tuple(street_weights)
+        self.pot_scale = pot_scale
+        self.decay = decay
+        self.used = 0.0
+        self.hand_number = 0
+        # Two mid-weight decisions per hand until hands have been observed
+        self.weight_per_hand = 2.0
+        self._hand_weight = 0.0
+
+    @property
+    def remaining(self) -> float:
+        """
+        Seconds left to schedule, after the reserve.
+        """
+        return self.total * (1.0 - self.reserve) - self.used
+
+    def start_hand(self, hand_number: int):
+        """
+        Begin hand hand_number, folding the finished hand's weight into the average.
+        """
+        if self._hand_weight > 0:
+            self.weight_per_hand += self.decay * (
+                self._hand_weight - self.weight_per_hand
+            )
+        self._hand_weight = 0.0
+        self.hand_number = hand_number
+
+    def weight(self, street: int, pot: int, difficulty: float = 1.0) -> float:
+        return self.street_weights[street] * (1.0 + pot / self.pot_scale) * difficulty
+
+    def budget(self, street: int, pot: int, difficulty: float = 1.0) -> float:
+        """
+        Seconds of search for a decision, 0 when it should come from lookup.
+        :param pot: Chips in the pot.
+        :param difficulty: From 0 for a clear-cut spot to 1, see spot_difficulty.
+        """
+        weight = self.weight(street, pot, difficulty)
+        self._hand_weight += weight
+        hands_left = max(1, self.num_hands - self.hand_number)
+        per_hand = max(0.0, self.remaining) / hands_left
+        budget = per_hand * weight / self.weight_per_hand - self.overhead
+        # Never bet more than a tenth of what is left on one decision
+        budget = min(budget, self.max_budget, 0.1 * self.remaining)
+        return budget if budget >= self.min_search else 0.0
+
+    def charge(self, seconds: float):
+        """
+        Record a decision that took seconds of our own time.
+        """
+        self.used += seconds + self.overhead
@@ -0,0 +1,191 @@
+import random
+from typing import Callable, Dict, Hashable, List
+
+import numpy as np
+
+from utils.poker_tree import Stage
+from utils.public_tree import NodeKind, PublicGame, PublicNode
+
+
+class KuhnGame(PublicGame):
+    """
+    Kuhn poker: three cards, one card each, antes of 1 and a single bet of 1.
+    Player 0 wins 1/18 less than player 1 per hand at equilibrium.
+    """
+
+    num_cards = 3
+    hole_cards = 1
+    board_cards = (0,)
+    initial_bets = (1, 1)
+    max_bet = 2
+    big_blind = 1
+    max_raises = 1
+
+    def strength(self, hand: tuple, board: tuple) -> int:
+        return hand[0]
+
+    def raise_sizes(self, node: PublicNode) -> List[int]:
+        return [node.bets[1 - node.player] + 1]
+
+
+class LeducGame(PublicGame):
+    """
+    Leduc hold'em: two suits of three ranks, one private card each and one
+    board card, antes of 1, two raises per round of 2 and then 4 chips.
+    A pair with the board wins, otherwise the higher card.
+    """
+
+    num_cards = 6
+    hole_cards = 1
+    board_cards = (0, 1)
+    initial_bets = (1, 1)
+    max_bet = 13
+    big_blind = 1
+    max_raises = 2
+    raise_amounts = (2, 4)
+    num_suits = 2
+
+    def strength(self, hand: tuple, board: tuple) -> int:
+        rank = hand[0] // 2
+        if rank == board[0] // 2:
+            return 3 + rank
+        return rank
+
+    def raise_sizes(self, node: PublicNode) -> List[int]:
+        return [node.bets[1 - node.player] + self.raise_amounts[node.street]]
+
+    def card_suit(self, card: int) -> int:
+        return card % 2
+
+    def with_suit(self, card: int, suit: int) -> int:
+        return card - card % 2 + suit
+
+
+class ToyState:
+    """
+    A history of a PublicGame for one deal, with the node interface that
+    dcfr_traversal expects, so the tabular solvers run on small games.
+    States are immutable: next_state returns a new one.
+    - game: the game being played
+    - node: the public node, None before the private cards are dealt
+    - hands: each player's private hand
+    - board: board cards dealt so far
+    """
+
+    __slots__ = ("game", "node", "hands", "board")
+
+    def __init__(self, game: PublicGame, node, hands: tuple = (), board: tuple = ()):
+        self.game = game
+        self.node = node
+        self.hands = hands
+        self.board = board
+
+    @classmethod
+    def root(cls, game: PublicGame) -> "ToyState":
+        return cls(game, None)
+
+    def __repr__(self):
+        return f"<ToyState hands={self.hands} board={self.board} node={self.node}>"
+
+    def is_terminal(self) -> bool:
+        return self.node is not None and self.node.is_terminal()
+
+    def check_if_terminal(self) -> bool:
+        return self.is_terminal()
+
+    def is_chance_node(self) -> bool:
+        return self.node is None or self.node.kind == NodeKind.CHANCE
+
+    def sample_action(self) -> tuple:
+        """
+        Deal the cards of the next chance event: both hands, then each street's board.
+        """
+        game = self.game
+        deck = set(range(game.num_cards)) - set(self.board)
+        for hand in self.hands:
+            deck -= set(hand)
+        if self.node is None:
+            cards = random.sample(sorted(deck), 2 * game.hole_cards)
+            n = game.hole_cards
+            return tuple(sorted(cards[:n])), tuple(sorted(cards[n:]))
+        street = self.node.children[0].street
+        return tuple(sorted(random.sample(sorted(deck), game.board_cards[street])))
+
+    def next_state(self, action) -> "ToyState":
+        node = self.node
+        if node is None:
+            return ToyState(self.game, self.game.root, action)
+        if node.kind == NodeKind.CHANCE:
+            child = node.children[0]
+            return ToyState(self.game, child, self.hands, self.board + action)
+        child = node.children[node.actions.index(action)]
+        return ToyState(self.game, child, self.hands, self.board)
+
+    def is_terminal_action(self, action) -> bool:
+        """
+        Whether a betting action ends the hand, without building the next state.
+        """
+        node = self.node
+        return node.children[node.actions.index(action)].is_terminal()
+
+    def current_player(self) -> int:
+        return self.node.player
+
+    def legal_actions(self) -> List[str]:
+        return list(self.node.actions)
+
+    def get_stage(self) -> Stage:
+        # The last betting round plays the role of the river
+        if self.node.street == len(self.game.board_cards) - 1:
+            return Stage.RIVER
+        return (Stage.PRE_FLOP, Stage.FLOP, Stage.TURN)[self.node.street]
+
+    def infoset(self, player: int) -> tuple:
+        return self.hands[player], self.board, self.node.history
+
+    def features(self, player: int) -> np.ndarray:
+        return self.game.features(self.node, self.hands[player], self.board)
+
+    def payoff(self, p: int) -> float:
+        node = self.node
+        stake = min(node.bets)
+        if node.kind == NodeKind.FOLD:
+            return -stake if node.player == p else stake
+        mine = self.game.strength(self.hands[p], self.board)
+        theirs = self.game.strength(self.hands[1 - p], self.board)
+        return stake * ((mine > theirs) - (mine < theirs))
+
+
+def tabular_strategy(game: PublicGame, strategy: Dict[Hashable, Dict[str, float]]):
+    """
+    Wrap a strategy over ToyState infosets, as returned by the tabular solvers'
+    compute_blueprint_strategy, for the vectorized best response in exploitability.py.
+    Infosets missing from strategy play uniformly.
+    """
+
+    def probabilities(node: PublicNode, board: tuple) -> np.ndarray:
+        probs = np.full((game.num_hands, len(node.actions)), 1.0 / len(node.actions))
+        for h, hand in enumerate(game.hands):
+            entry = strategy.get((hand, board, node.history))
+            if entry is not None:
+                probs[h] = [entry[a] for a in node.actions]
+        return probs
+
+    return probabilities
+
+
+def state_strategy(game: PublicGame, strategy: Callable[[ToyState], Dict[str, float]]):
+    """
+    Wrap a strategy computed per state, such as DeepCFR.strategy, for the
+    vectorized best response in exploitability.py.
+    """
+
+    def probabilities(node: PublicNode, board: tuple) -> np.ndarray:
+        probs = np.empty((game.num_hands, len(node.actions)))
+        for h, hand in enumerate(game.hands):
+            # Only the acting player's hand is seen by the strategy
+            entry = strategy(ToyState(game, node, (hand, hand), board))
+            probs[h] = [entry[a] for a in node.actions]
+        return probs
+
+    return probabilities
@@ -0,0 +1,185 @@
+from utils.public_tree import NodeKind, PublicGame, PublicNode
+from typing import Callable, Dict, Hashable, List, Optional
+import numpy as np
+import math
+
+
+class VectorTable:
+    """
+    Regrets and average strategy of one public state, one row per private hand.
+    - regrets / average: arrays of shape (hands, actions)
+    - synced: number of discounting steps already applied
+    """
+
+    __slots__ = ("regrets", "average", "synced")
+
+    def __init__(self, num_hands: int, num_actions: int, synced: int):
+        self.regrets = np.zeros((num_hands, num_actions))
+        self.average = np.zeros((num_hands, num_actions))
+        self.synced = synced
+
+
+def regret_matching(regrets: np.ndarray) -> np.ndarray:
+    """
+    Current strategy of every hand of a table; uniform where no regret is positive.
+    """
+    positive = np.maximum(regrets, 0.0)
+    totals = positive.sum(axis=1, keepdims=True)
+    uniform = 1.0 / regrets.shape[1]
+    return np.where(totals > 0, positive / np.where(totals > 0, totals, 1.0), uniform)
+
+
+class VectorCFR:
+    """
+    Discounted CFR in vector form: every iteration walks the public tree of a
+    PublicGame once per player, carrying reach probabilities for every private
+    hand, so all deals are updated together instead of one sampled deal per
+    traversal. Board cards are sampled once per iteration (public chance
+    sampling). Terminal values come from prefix sums of opponent reach over
+    hands sorted by strength, with card blockers removed by inclusion-exclusion,
+    so no hands x hands matrix is formed (see PublicGame.terminal_values).
+    Tables are keyed by (public node id, visible board) and created on first visit;
+    a board abstraction can map many boards to one table to bound memory.
+    """
+
+    def __init__(
+        self,
+        game: PublicGame,
+        alpha: float = 1.5,
+        beta: float = 0,
+        gamma: float = 2,
+        seed: Optional[int] = None,
+        board_abstraction: Optional[Callable[[int, tuple], Hashable]] = None,
+    ):
+        """
+        :param game: The game to solve.
+        :param alpha: Exponent for discounting positive regrets.
+        :param beta:  Exponent for discounting negative regrets.
+        :param gamma: Exponent for discounting average-strategy contributions.
+        :param seed: Seed of the board sampler.
+        :param board_abstraction: Maps (street, visible board) to the key of its
+            tables, or None to keep separate tables for every board.
+        """
+        self.game = game
+        self.alpha: float = alpha
+        self.beta: float = beta
+        self.gamma: float = gamma
+        self.rng = np.random.default_rng(seed)
+        self.board_abstraction = board_abstraction
+        self.tables: Dict[tuple, VectorTable] = {}
+        self.iteration: int = 0
+        # Discounting is applied to a table when it is next visited, from the
+        # cumulative log factors of every step since it was last synced
+        self.log_pos: List[float] = [0.0]
+        self.log_neg: List[float] = [0.0]
+        self.log_avg: List[float] = [0.0]
+
+    def public_key(self, node: PublicNode, board: tuple) -> tuple:
+        visible = board[: self.game.revealed(node.street)]
+        if self.board_abstraction is not None:
+            return node.id, self.board_abstraction(node.street, visible)
+        return node.id, visible
+
+    def table(self, node: PublicNode, board: tuple) -> VectorTable:
+        """
+        The table of node on board, allocated on first visit and brought up to
+        date with discounting.
+        """
+        return self.keyed_table(self.public_key(node, board), len(node.actions))
+
+    def keyed_table(self, key: Hashable, num_actions: int) -> VectorTable:
+        """
+        The table stored under key, see table().
+        """
+        table = self.tables.get(key)
+        step = len(self.log_pos) - 1
+        if table is None:
+            table = VectorTable(self.game.num_hands, num_actions, step)
+            self.tables[key] = table
+        elif table.synced != step:
+            last = table.synced
+            pos = math.exp(self.log_pos[step] - self.log_pos[last])
+            neg = math.exp(self.log_neg[step] - self.log_neg[last])
+            table.regrets *= np.where(table.regrets > 0, pos, neg)
+            table.average *= math.exp(self.log_avg[step] - self.log_avg[last])
+            table.synced = step
+        return table
+
+    def compute_blueprint_strategy(self, T: int):
+        """
+        Run T more iterations, discounting after each one.
+        :return: The average strategy as a function of (node, board), see average_strategy.
+        """
+        for t in range(self.iteration + 1, T + 1):
+            for p in (0, 1):
+                board = self.game.sample_board(self.rng)
+                reach = [np.ones(self.game.num_hands), np.ones(self.game.num_hands)]
+                self.traverse(self.game.root, p, reach, board)
+            self.discount(t)
+        return self.average_strategy
+
+    def discount(self, t: int):
+        """
+        Finish iteration t: record its discount factors, applied lazily by table().
+        """
+        pos_factor = (t**self.alpha) / (t**self.alpha + 1.0)
+        neg_factor = (t**self.beta) / (t**self.beta + 1.0)
+        avg_factor = (t / (t + 1.0)) ** self.gamma
+        self.log_pos.append(self.log_pos[-1] + math.log(pos_factor))
+        self.log_neg.append(self.log_neg[-1] + math.log(neg_factor))
+        self.log_avg.append(self.log_avg[-1] + math.log(avg_factor))
+        self.iteration = t
+
+    def traverse(
+        self, node: PublicNode, p: int, reach: List[np.ndarray], board: tuple
+    ) -> np.ndarray:
+        """
+        Update player p's regrets and average strategy below node.
+        :param reach: Reach probability of every hand of each player.
+        :return: Counterfactual value of each of player p's hands.
+        """
+        if node.is_terminal():
+            return self.game.terminal_values(node, p, reach[1 - p], board)
+        if node.kind == NodeKind.CHANCE:
+            # The sampled board already holds the next street's cards
+            return self.traverse(node.children[0], p, reach, board)
+
+        q = node.player
+        table = self.table(node, board)
+        strategy = regret_matching(table.regrets)
+        if q != p:
+            value = np.zeros(self.game.num_hands)
+            for a, child in enumerate(node.children):
+                child_reach = [reach[0], reach[1]]
+                child_reach[q] = reach[q] * strategy[:, a]
+                value += self.traverse(child, p, child_reach, board)
+            return value
+
+        action_values = np.empty((self.game.num_hands, len(node.children)))
+        for a, child in enumerate(node.children):
+            child_reach = [reach[0], reach[1]]
+            child_reach[p] = reach[p] * strategy[:, a]
+            action_values[:, a] = self.traverse(child, p, child_reach, board)
+        value = (strategy * action_values).sum(axis=1)
+        table.regrets += action_values - value[:, None]
+        table.average += reach[p][:, None] * strategy
+        return value
+
+    def average_strategy(self, node: PublicNode, board: tuple) -> np.ndarray:
+        """
+        Average strategy of every hand at a decision node, uniform for hands
+        and boards without mass.
+        """
+        table = self.tables.get(self.public_key(node, board))
+        uniform = 1.0 / len(node.actions)
+        if table is None:
+            return np.full((self.game.num_hands, len(node.actions)), uniform)
+        totals = table.average.sum(axis=1, keepdims=True)
+        safe = np.where(totals > 0, totals, 1.0)
+        return np.where(totals > 0, table.average / safe, uniform)
+
+    def nbytes(self) -> int:
+        """
+        Bytes held by the regret and average-strategy tables.
+        """
+        return sum(t.regrets.nbytes + t.average.nbytes for t in self.tables.values())